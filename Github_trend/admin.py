@@ -1,3 +1,12 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Repository
+
+
+@admin.register(Repository)
+class RepositoryAdmin(admin.ModelAdmin):
+    list_display = ('full_name', 'language', 'stars', 'star_velocity', 'created_at', 'last_snapshot_at')
+    list_filter = ('language_key',)
+    search_fields = ('full_name', 'description')
+    ordering = ('-stars',)
+    readonly_fields = ('first_seen', 'last_snapshot_at')
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Repository',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full_name', models.CharField(max_length=200, unique=True, verbose_name='仓库')),
+                ('name', models.CharField(max_length=100, verbose_name='名称')),
+                ('description', models.TextField(blank=True, verbose_name='描述')),
+                ('language', models.CharField(blank=True, max_length=50, verbose_name='语言')),
+                ('language_key', models.CharField(blank=True, max_length=50, verbose_name='语言 (小写)')),
+                ('url', models.URLField(max_length=300, verbose_name='链接')),
+                ('avatar', models.URLField(blank=True, max_length=300, verbose_name='作者头像')),
+                ('created_at', models.DateTimeField(verbose_name='仓库创建时间')),
+                ('updated_at', models.DateField(blank=True, null=True, verbose_name='最近更新')),
+                ('stars', models.PositiveIntegerField(default=0, verbose_name='星标数')),
+                ('star_velocity', models.FloatField(default=0, verbose_name='星标增速 (个/天)')),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='首次抓取')),
+                ('last_snapshot_at', models.DateTimeField(blank=True, null=True, verbose_name='最近快照')),
+            ],
+            options={
+                'verbose_name': 'GitHub 仓库',
+                'verbose_name_plural': 'GitHub 仓库',
+                'indexes': [models.Index(fields=['language_key', '-stars'], name='repo_lang_stars_idx'), models.Index(fields=['language_key', '-star_velocity'], name='repo_lang_velocity_idx'), models.Index(fields=['-stars'], name='repo_stars_idx'), models.Index(fields=['-star_velocity'], name='repo_velocity_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RepoSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stars', models.PositiveIntegerField(verbose_name='星标数')),
+                ('captured_at', models.DateTimeField(db_index=True, verbose_name='抓取时间')),
+                ('repository', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='Github_trend.repository')),
+            ],
+            options={
+                'verbose_name': '星标快照',
+                'verbose_name_plural': '星标快照',
+                'indexes': [models.Index(fields=['repository', 'captured_at'], name='snapshot_repo_time_idx')],
+            },
+        ),
+    ]
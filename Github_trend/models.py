@@ -1,3 +1,49 @@
 from django.db import models
 
-# Create your models here.
+
+# 👇👇👇 趋势数据本地化：定时抓取的仓库及其星标快照，页面只查本地库 👇👇👇
+class Repository(models.Model):
+    full_name = models.CharField('仓库', max_length=200, unique=True)  # owner/name
+    name = models.CharField('名称', max_length=100)
+    description = models.TextField('描述', blank=True)
+    language = models.CharField('语言', max_length=50, blank=True)  # GitHub 原始写法，用于展示
+    language_key = models.CharField('语言 (小写)', max_length=50, blank=True)  # 与下拉菜单的值一致，用于筛选
+    url = models.URLField('链接', max_length=300)
+    avatar = models.URLField('作者头像', max_length=300, blank=True)
+    created_at = models.DateTimeField('仓库创建时间')  # 今日 / 本周 / 本月热门按它筛选
+    updated_at = models.DateField('最近更新', null=True, blank=True)
+    stars = models.PositiveIntegerField('星标数', default=0)
+    star_velocity = models.FloatField('星标增速 (个/天)', default=0)  # TrendRankingService 定期计算
+    first_seen = models.DateTimeField('首次抓取', auto_now_add=True)
+    last_snapshot_at = models.DateTimeField('最近快照', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'GitHub 仓库'
+        verbose_name_plural = verbose_name
+        indexes = [
+            # 趋势页：按语言筛选后按星标 / 增速排序 (排序次键 id 即 SQLite rowid，整个排序走索引)
+            models.Index(fields=['language_key', '-stars'], name='repo_lang_stars_idx'),
+            models.Index(fields=['language_key', '-star_velocity'], name='repo_lang_velocity_idx'),
+            # 语言选 all
+            models.Index(fields=['-stars'], name='repo_stars_idx'),
+            models.Index(fields=['-star_velocity'], name='repo_velocity_idx'),
+        ]
+
+    def __str__(self):
+        return self.full_name
+
+
+class RepoSnapshot(models.Model):
+    repository = models.ForeignKey(Repository, on_delete=models.CASCADE, related_name='snapshots')
+    stars = models.PositiveIntegerField('星标数')
+    captured_at = models.DateTimeField('抓取时间', db_index=True)  # 增速窗口查询 / 过期清理
+
+    class Meta:
+        verbose_name = '星标快照'
+        verbose_name_plural = verbose_name
+        indexes = [
+            models.Index(fields=['repository', 'captured_at'], name='snapshot_repo_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.repository_id} ⭐{self.stars} @ {self.captured_at:%Y-%m-%d %H:%M}"
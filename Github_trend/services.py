@@ -1,12 +1,66 @@
 import requests
 import os
 import datetime
+import logging
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .models import Repository, RepoSnapshot
+
+logger = logging.getLogger(__name__)
+
+# 下拉菜单中的语言 / 时间范围，也是后台预抓取的组合
+LANGUAGE_OPTIONS = [
+    'python', 'javascript', 'go', 'java', 'c++',
+    'rust', 'typescript', 'html', 'css', 'all'
+]
+PERIODS = ['daily', 'weekly', 'monthly']
+PERIOD_DAYS = {
+    'daily': 1,
+    'weekly': 7,
+    'monthly': 30,
+    'yearly': 365
+}
+
+# not_modified=True 时 repos 为 None (服务端返回 304，沿用本地数据)
+FetchResult = namedtuple('FetchResult', ['repos', 'etag', 'not_modified'])
+
+
+class RateLimited(requests.RequestException):
+    """GitHub 搜索接口限流 (未登录 10 次 / 分钟，带 token 30 次 / 分钟)"""
+
 
 class GitHubService:
     API_URL = "https://api.github.com/search/repositories"
-    
+
     def __init__(self):
         self.token = os.getenv('GITHUB_TOKEN')
+        self._session = None
+
+    @property
+    def api_url(self):
+        # 测试时指向本地桩服务器
+        return getattr(settings, 'GITHUB_API_URL', self.API_URL)
+
+    @property
+    def session(self):
+        """复用 TCP / TLS 连接的 Session；网关错误和连接失败自动退避重试"""
+        if self._session is None:
+            retry = Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504], allowed_methods=['GET'])
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=10, max_retries=retry)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update(self.get_headers())
+            self._session = session
+        return self._session
 
     def get_headers(self):
         headers = {
@@ -16,23 +70,11 @@ class GitHubService:
             headers["Authorization"] = f"token {self.token}"
         return headers
 
-    def fetch_trends(self, language='python', time_range='weekly', page=1):
-        """
-        支持分页和时间筛选的抓取函数
-        :param language: 编程语言
-        :param time_range: daily, weekly, monthly
-        :param page: 页码
-        """
+    def build_params(self, language, time_range, page):
         # 1. 计算日期范围
-        days_map = {
-            'daily': 1,
-            'weekly': 7,
-            'monthly': 30,
-            'yearly': 365
-        }
-        days = days_map.get(time_range, 7) # 默认一周
+        days = PERIOD_DAYS.get(time_range, 7) # 默认一周
         start_date = (datetime.date.today() - datetime.timedelta(days=days)).isoformat()
-        
+
         # 2. 构造查询语句
         # 如果 language 是 'all'，就不加 language 筛选
         if language == 'all':
@@ -40,7 +82,7 @@ class GitHubService:
         else:
             query = f"created:>{start_date} language:{language}"
 
-        params = {
+        return {
             "q": query,
             "sort": "stars",
             "order": "desc",
@@ -48,36 +90,243 @@ class GitHubService:
             "page": page     # 动态页码
         }
 
+    def fetch_page(self, language='python', time_range='weekly', page=1, etag=None):
+        """
+        条件请求：带上次的 ETag，未变化时 GitHub 返回 304 (不计入限流次数)
+        :return: FetchResult
+        :raise: requests.RequestException (含 RateLimited)
+        """
+        headers = {'If-None-Match': etag} if etag else {}
+        response = self.session.get(
+            self.api_url,
+            headers=headers,
+            params=self.build_params(language, time_range, page),
+            timeout=10
+        )
+        if response.status_code == 304:
+            return FetchResult(None, etag, True)
+        if response.status_code in (403, 429) and response.headers.get('X-RateLimit-Remaining') == '0':
+            raise RateLimited(f"GitHub rate limit exceeded, reset at {response.headers.get('X-RateLimit-Reset')}")
+        response.raise_for_status()
+
+        clean_data = []
+        for item in response.json().get('items', []):
+            clean_data.append({
+                'name': item['name'],
+                'full_name': item['full_name'],
+                'description': item['description'],
+                'stars': item['stargazers_count'],
+                'url': item['html_url'],
+                'language': item['language'],
+                'avatar': item['owner']['avatar_url'],
+                'created_at': item['created_at'],
+                'updated_at': item['updated_at'][:10] # 截取日期部分
+            })
+        return FetchResult(clean_data, response.headers.get('ETag'), False)
+
+    def fetch_trends(self, language='python', time_range='weekly', page=1):
+        """
+        支持分页和时间筛选的抓取函数
+        :param language: 编程语言
+        :param time_range: daily, weekly, monthly
+        :param page: 页码
+        """
         try:
             print(f"📡 API请求: Lang={language}, Time={time_range}, Page={page}")
-            response = requests.get(
-                self.API_URL, 
-                headers=self.get_headers(), 
-                params=params, 
-                timeout=10
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            items = data.get('items', [])
-            
-            clean_data = []
-            for item in items:
-                clean_data.append({
-                    'name': item['name'],
-                    'full_name': item['full_name'],
-                    'description': item['description'],
-                    'stars': item['stargazers_count'],
-                    'url': item['html_url'],
-                    'language': item['language'],
-                    'avatar': item['owner']['avatar_url'],
-                    'updated_at': item['updated_at'][:10] # 截取日期部分
-                })
-            
-            return clean_data
-            
+            return self.fetch_page(language, time_range, page).repos
         except requests.RequestException as e:
             print(f"❌ API 请求失败: {e}")
             return []
 
-github_service = GitHubService()
\ No newline at end of file
+
+class TrendSnapshotService:
+    """抓取结果写入本地库：仓库信息 upsert，星标数按 TRENDS_SNAPSHOT_INTERVAL 最多记一次快照"""
+
+    FIELDS = ['name', 'description', 'language', 'language_key', 'url', 'avatar', 'created_at', 'updated_at', 'stars']
+
+    def record(self, repos, now=None):
+        """:param repos: GitHubService.fetch_page 返回的仓库列表；:return: 新增快照数"""
+        if not repos:
+            return 0
+        now = now or timezone.now()
+        interval = datetime.timedelta(seconds=getattr(settings, 'TRENDS_SNAPSHOT_INTERVAL', 3600))
+        by_name = {data['full_name']: data for data in repos}
+
+        # 1. 新仓库先插入 (并发抓取同一仓库时忽略冲突)，再统一按名字取回
+        existing = set(Repository.objects.filter(full_name__in=by_name).values_list('full_name', flat=True))
+        Repository.objects.bulk_create(
+            [Repository(full_name=name, **self.fields(data)) for name, data in by_name.items() if name not in existing],
+            ignore_conflicts=True,
+        )
+
+        # 2. 刷新展示字段和星标数，到间隔的追加快照
+        to_update, snapshots = [], []
+        for repo in Repository.objects.filter(full_name__in=by_name):
+            for field, value in self.fields(by_name[repo.full_name]).items():
+                setattr(repo, field, value)
+            if repo.last_snapshot_at is None or now - repo.last_snapshot_at >= interval:
+                repo.last_snapshot_at = now
+                snapshots.append(RepoSnapshot(repository=repo, stars=repo.stars, captured_at=now))
+            to_update.append(repo)
+        Repository.objects.bulk_update(to_update, self.FIELDS + ['last_snapshot_at'])
+        RepoSnapshot.objects.bulk_create(snapshots)
+        return len(snapshots)
+
+    def fields(self, data):
+        language = data['language'] or ''
+        return {
+            'name': data['name'],
+            'description': data['description'] or '',
+            'language': language,
+            'language_key': language.lower(),
+            'url': data['url'],
+            'avatar': data['avatar'] or '',
+            'created_at': parse_datetime(data['created_at']),
+            'updated_at': parse_date(data['updated_at']),
+            'stars': data['stars'],
+        }
+
+    def prune(self):
+        """删除超过 TRENDS_SNAPSHOT_RETENTION_DAYS 的快照"""
+        cutoff = timezone.now() - datetime.timedelta(days=getattr(settings, 'TRENDS_SNAPSHOT_RETENTION_DAYS', 30))
+        deleted, _ = RepoSnapshot.objects.filter(captured_at__lt=cutoff).delete()
+        return deleted
+
+
+class TrendRankingService:
+    """
+    星标增速排行：窗口 (TRENDS_VELOCITY_WINDOW_HOURS) 内每个仓库
+    (最后一次快照星数 - 最早一次快照星数) / 间隔天数，写回 Repository.star_velocity，页面按索引排序
+    """
+
+    PAGE_SIZE = 12
+    MIN_SPAN_SECONDS = 3600  # 两次快照间隔太短时增速噪声太大，记为 0
+
+    def update_velocity(self, now=None):
+        """:return: 更新的仓库数"""
+        now = now or timezone.now()
+        since = now - datetime.timedelta(hours=getattr(settings, 'TRENDS_VELOCITY_WINDOW_HOURS', 24))
+
+        first, last = {}, {}
+        rows = RepoSnapshot.objects.filter(captured_at__gte=since).order_by('captured_at')
+        for repo_id, stars, captured_at in rows.values_list('repository_id', 'stars', 'captured_at').iterator():
+            first.setdefault(repo_id, (stars, captured_at))
+            last[repo_id] = (stars, captured_at)
+
+        updates = []
+        for repo_id, (start_stars, start_at) in first.items():
+            end_stars, end_at = last[repo_id]
+            span = (end_at - start_at).total_seconds()
+            velocity = round((end_stars - start_stars) / span * 86400, 2) if span >= self.MIN_SPAN_SECONDS else 0
+            updates.append(Repository(pk=repo_id, star_velocity=velocity))
+        Repository.objects.bulk_update(updates, ['star_velocity'], batch_size=500)
+
+        # 窗口内没有快照 (不再出现在搜索结果中) 的仓库清零
+        Repository.objects.filter(last_snapshot_at__lt=since).exclude(star_velocity=0).update(star_velocity=0)
+        return len(updates)
+
+    def ranked_queryset(self, language, period, sort='stars'):
+        """仓库创建时间在 period 内，按星标数 (stars) 或增速 (rising) 排序，排序走 Repository 上的索引"""
+        since = timezone.now() - datetime.timedelta(days=PERIOD_DAYS.get(period, 7))
+        queryset = Repository.objects.filter(created_at__gte=since)
+        if language != 'all':
+            queryset = queryset.filter(language_key=language.lower())
+        return queryset.order_by('-star_velocity' if sort == 'rising' else '-stars', 'id')
+
+    def ranked(self, language, period, page=1, sort='stars'):
+        """
+        趋势页数据 (只查本地库，多取一条判断是否有下一页，不做 COUNT)
+        :return: (当前页仓库列表, 是否还有下一页)
+        """
+        offset = (page - 1) * self.PAGE_SIZE
+        rows = list(self.ranked_queryset(language, period, sort)[offset:offset + self.PAGE_SIZE + 1])
+        return rows[:self.PAGE_SIZE], len(rows) > self.PAGE_SIZE
+
+
+class TrendCacheService:
+    """
+    趋势抓取的调度 (stale-while-revalidate)
+
+    - trends_meta_{语言}_{时间}_{页码}：{'etag', 'fetched_at'}，存在共享缓存中，
+      超过 TRENDS_FRESH_SECONDS 或从没抓过时，页面照常展示本地数据并投递后台刷新；
+    - 刷新带 ETag 条件请求，有变化时写入 Repository / RepoSnapshot (TrendSnapshotService)；
+    - beat 定时预抓取 LANGUAGE_OPTIONS × PERIODS，抓完重新计算星标增速。
+    """
+
+    def __init__(self, client, snapshots):
+        self.client = client
+        self.snapshots = snapshots
+
+    def _meta_key(self, language, period, page):
+        return f"trends_meta_{language}_{period}_{page}"
+
+    @property
+    def fresh_seconds(self):
+        return getattr(settings, 'TRENDS_FRESH_SECONDS', 600)
+
+    @property
+    def stale_seconds(self):
+        return getattr(settings, 'TRENDS_STALE_SECONDS', 86400)
+
+    def needs_refresh(self, language, period, page):
+        meta = cache.get(self._meta_key(language, period, page))
+        return meta is None or time.time() - meta['fetched_at'] > self.fresh_seconds
+
+    def refresh(self, language, period, page):
+        """
+        请求 GitHub，有变化时写入本地库
+        :return: 本次拿到的仓库数 (304 未变化为 0)，失败返回 None
+        :raise: RateLimited (由调用方决定是否中止后续请求)
+        """
+        meta_key = self._meta_key(language, period, page)
+        meta = cache.get(meta_key) or {}
+
+        try:
+            result = self.client.fetch_page(language, period, page, etag=meta.get('etag'))
+        except RateLimited:
+            raise
+        except requests.RequestException as e:
+            logger.warning(f"GitHub trends refresh failed ({language}/{period}/{page}): {e}")
+            return None
+
+        if not result.not_modified:
+            self.snapshots.record(result.repos)
+        cache.set(meta_key, {'etag': result.etag, 'fetched_at': time.time()}, self.stale_seconds)
+        return 0 if result.not_modified else len(result.repos)
+
+    def schedule_refresh(self, language, period, page):
+        """投递后台刷新；同一组合 60 秒内只投递一次"""
+        from .tasks import refresh_trend_page
+
+        if not cache.add(f"trends_lock_{language}_{period}_{page}", 1, 60):
+            return False
+        try:
+            refresh_trend_page.apply_async(args=[language, period, page], retry=False)
+        except Exception as e:
+            # Broker 不可用：继续展示本地数据，等下一轮定时预抓取
+            logger.warning(f"Trends refresh queue unavailable: {e}")
+        return True
+
+    def prefetch_all(self, pages=None):
+        """按 LANGUAGE_OPTIONS × PERIODS 逐个刷新；遇到限流立即停止，剩下的下一轮再抓"""
+        pages = pages or getattr(settings, 'TRENDS_PREFETCH_PAGES', 1)
+        interval = getattr(settings, 'TRENDS_REQUEST_INTERVAL', 0)
+        report = {'refreshed': 0, 'failed': 0, 'skipped': 0}
+        combos = [(lang, period, page) for lang in LANGUAGE_OPTIONS for period in PERIODS for page in range(1, pages + 1)]
+        for i, combo in enumerate(combos):
+            if i and interval:
+                time.sleep(interval)
+            try:
+                count = self.refresh(*combo)
+            except RateLimited as e:
+                logger.warning(f"Trends prefetch stopped: {e}")
+                report['skipped'] = len(combos) - i
+                break
+            report['refreshed' if count is not None else 'failed'] += 1
+        return report
+
+
+github_service = GitHubService()
+snapshot_service = TrendSnapshotService()
+ranking_service = TrendRankingService()
+trend_cache = TrendCacheService(github_service, snapshot_service)
@@ -0,0 +1,21 @@
+from celery import shared_task
+
+from .services import ranking_service, snapshot_service, trend_cache
+
+
+@shared_task(ignore_result=True)
+def refresh_trend_page(language, period, page):
+    """页面读到过期数据时投递：刷新单个组合，写入快照后重新计算增速"""
+    count = trend_cache.refresh(language, period, page)
+    if count:
+        ranking_service.update_velocity()
+    return count
+
+
+@shared_task
+def prefetch_trends():
+    """定时预抓取所有 语言 × 时间范围 写入本地库，再重新计算星标增速并清理过期快照"""
+    report = trend_cache.prefetch_all()
+    report['velocity_updated'] = ranking_service.update_velocity()
+    report['snapshots_pruned'] = snapshot_service.prune()
+    return report
@@ -1,3 +1,172 @@
-from django.test import TestCase
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Repository, RepoSnapshot
+from .services import (
+    LANGUAGE_OPTIONS, PERIODS, GitHubService, TrendCacheService, TrendRankingService, TrendSnapshotService,
+)
+
+
+def repo_data(full_name, stars, language='Python', days_old=2):
+    """GitHubService.fetch_page 返回的单个仓库"""
+    return {
+        'name': full_name.split('/')[1], 'full_name': full_name, 'description': '', 'stars': stars,
+        'url': f'https://github.com/{full_name}', 'language': language, 'avatar': '',
+        'created_at': (timezone.now() - datetime.timedelta(days=days_old)).isoformat(),
+        'updated_at': '2026-01-01',
+    }
+
+
+class StubGitHubHandler(BaseHTTPRequestHandler):
+    """模拟 GitHub 搜索接口：固定 ETag，If-None-Match 命中时返回 304"""
+    protocol_version = 'HTTP/1.1'  # 支持 keep-alive，用来验证连接复用
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get('If-None-Match'))
+        if server.status != 200:
+            self.send_response(server.status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == server.etag:
+            self.send_response(304)
+            self.send_header('ETag', server.etag)
+            self.end_headers()
+            return
+        body = json.dumps({'items': [{
+            'name': 'demo', 'full_name': 'lab/demo', 'description': '示例', 'stargazers_count': server.stars,
+            'html_url': 'https://github.com/lab/demo', 'language': 'Python',
+            'owner': {'avatar_url': ''}, 'created_at': server.created_at, 'updated_at': '2026-01-01T00:00:00Z',
+        }]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', server.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+
+class TrendCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubGitHubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.api_url = f'http://127.0.0.1:{cls.server.server_port}/search/repositories'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.server.requests, self.server.connections = [], 0
+        self.server.status, self.server.etag, self.server.stars = 200, '"v1"', 10
+        self.server.created_at = (timezone.now() - datetime.timedelta(hours=12)).isoformat()
+        override = override_settings(GITHUB_API_URL=self.api_url, TRENDS_REQUEST_INTERVAL=0)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.trends = TrendCacheService(GitHubService(), TrendSnapshotService())
+
+    def test_conditional_refresh_over_pooled_connection(self):
+        """测试：第二次刷新带 ETag，304 时不改本地数据，两次请求复用同一个连接"""
+        self.assertEqual(self.trends.refresh('python', 'weekly', 1), 1)
+        self.server.stars = 99  # 304 时不会读到新内容
+        self.assertEqual(self.trends.refresh('python', 'weekly', 1), 0)
+
+        self.assertEqual(Repository.objects.get(full_name='lab/demo').stars, 10)
+        self.assertEqual(self.server.requests, [None, '"v1"'])
+        self.assertEqual(self.server.connections, 1)
+
+    def test_page_served_from_local_data(self):
+        """测试：页面只查本地库，抓取过期时只投递一次后台刷新；刷新失败保留本地数据"""
+        self.trends.refresh('python', 'weekly', 1)
+        cache.set('trends_meta_python_weekly_1', {'etag': '"v1"', 'fetched_at': time.time() - 3600})
+        self.server.status = 500
+
+        with mock.patch('Github_trend.tasks.refresh_trend_page.apply_async') as apply_async:
+            response = self.client.get(reverse('Github_trend:index'), {'lang': 'python', 'period': 'weekly'})
+            self.client.get(reverse('Github_trend:index'), {'lang': 'python', 'period': 'weekly'})
+        self.assertEqual([repo.full_name for repo in response.context['repos']], ['lab/demo'])
+        self.assertIsNone(response.context['next_page'])
+        apply_async.assert_called_once_with(args=['python', 'weekly', 1], retry=False)
+        self.assertEqual(len(self.server.requests), 1)  # 请求内没有访问 GitHub
+
+        self.assertIsNone(self.trends.refresh('python', 'weekly', 1))
+        self.assertEqual(Repository.objects.get(full_name='lab/demo').stars, 10)
+
+    def test_prefetch_matrix(self):
+        """测试：预抓取覆盖 语言 × 时间范围 的全部组合，同一仓库只存一份"""
+        report = self.trends.prefetch_all()
+        self.assertEqual(report['refreshed'], len(LANGUAGE_OPTIONS) * len(PERIODS))
+        self.assertEqual(len(self.server.requests), len(LANGUAGE_OPTIONS) * len(PERIODS))
+        for language in LANGUAGE_OPTIONS:
+            for period in PERIODS:
+                self.assertFalse(self.trends.needs_refresh(language, period, 1))
+        self.assertEqual(Repository.objects.count(), 1)
+        self.assertEqual(RepoSnapshot.objects.count(), 1)
+
+
+class TrendRankingTest(TestCase):
+    def setUp(self):
+        self.snapshots = TrendSnapshotService()
+        self.ranking = TrendRankingService()
+
+    def test_snapshot_interval_and_velocity(self):
+        """测试：快照按间隔记录；增速 = 窗口内首末快照星标差 / 天数，窗口外的仓库清零"""
+        now = timezone.now()
+        start = now - datetime.timedelta(hours=12)
+        self.snapshots.record([repo_data('lab/big', 5000), repo_data('lab/rising', 100)], now=start)
+        # 间隔内重复抓取：更新星标数但不追加快照
+        self.snapshots.record([repo_data('lab/big', 5010)], now=start + datetime.timedelta(minutes=10))
+        self.snapshots.record([repo_data('lab/big', 5050), repo_data('lab/rising', 400)], now=now)
+        self.assertEqual(RepoSnapshot.objects.count(), 4)
+        self.assertEqual(Repository.objects.get(full_name='lab/big').stars, 5050)
+
+        Repository.objects.create(
+            full_name='lab/old', name='old', url='https://github.com/lab/old', created_at=now,
+            stars=1, star_velocity=99, last_snapshot_at=now - datetime.timedelta(days=3),
+        )
+        self.assertEqual(self.ranking.update_velocity(now=now), 2)
+
+        velocity = dict(Repository.objects.values_list('full_name', 'star_velocity'))
+        self.assertEqual(velocity, {'lab/big': 100.0, 'lab/rising': 600.0, 'lab/old': 0})
+
+        by_stars, _ = self.ranking.ranked('python', 'weekly', sort='stars')
+        by_velocity, _ = self.ranking.ranked('python', 'weekly', sort='rising')
+        self.assertEqual([repo.full_name for repo in by_stars], ['lab/big', 'lab/rising'])
+        self.assertEqual([repo.full_name for repo in by_velocity], ['lab/rising', 'lab/big'])
+
+    def test_ranked_filters_and_pagination(self):
+        """测试：按语言 (不区分大小写) 和仓库创建时间筛选，多取一条判断下一页"""
+        repos = [repo_data(f'lab/py{i}', 100 - i) for i in range(13)]
+        repos += [repo_data('lab/go', 1000, language='Go'), repo_data('lab/old', 9999, days_old=20)]
+        self.snapshots.record(repos)
+
+        page1, has_next = self.ranking.ranked('python', 'weekly', 1)
+        self.assertEqual((len(page1), has_next), (12, True))
+        page2, has_next = self.ranking.ranked('python', 'weekly', 2)
+        self.assertEqual(([repo.full_name for repo in page2], has_next), (['lab/py12'], False))
+
+        self.assertEqual(self.ranking.ranked('go', 'weekly')[0][0].full_name, 'lab/go')
+        self.assertEqual(self.ranking.ranked('all', 'monthly')[0][0].full_name, 'lab/old')
+        self.assertNotIn('lab/old', [repo.full_name for repo in self.ranking.ranked('all', 'weekly')[0]])
@@ -1,45 +1,40 @@
 from django.shortcuts import render
-from django.core.cache import cache
-from .services import github_service
+from .services import LANGUAGE_OPTIONS, ranking_service, trend_cache
+
+SORT_OPTIONS = ['stars', 'rising']
 
 def index(request):
     # 1. 获取筛选参数 (设置默认值)
     language = request.GET.get('lang', 'python')
     period = request.GET.get('period', 'weekly') # daily, weekly, monthly
-    page = int(request.GET.get('page', 1))
-    
-    # 2. 生成唯一的缓存 Key
-    # 例如: trends_python_weekly_1
-    cache_key = f"trends_{language}_{period}_{page}"
-    
-    # 3. 查缓存
-    repos = cache.get(cache_key)
-    
-    if repos:
-        print(f"✅ 命中缓存: {cache_key}")
-    else:
-        print(f"⚡ 缓存未命中，请求 API...")
-        repos = github_service.fetch_trends(language, period, page)
-        # 存缓存，5分钟有效
-        if repos:
-            cache.set(cache_key, repos, 300)
-    
-    # 4. 定义预设的语言列表 (用于下拉菜单)
-    # 你可以在这里随意添加你喜欢的语言
-    language_options = [
-        'python', 'javascript', 'go', 'java', 'c++', 
-        'rust', 'typescript', 'html', 'css', 'all'
-    ]
+    sort = request.GET.get('sort', 'stars') # stars: 星标最多, rising: 增速最快
+    if sort not in SORT_OPTIONS:
+        sort = 'stars'
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    # 2. 只查本地库 (定时预抓取写入的仓库和快照)，请求内不访问 GitHub API
+    repos, has_next = ranking_service.ranked(language, period, page, sort)
+
+    # 3. 这一组合的抓取过期 / 从没抓过：投递后台刷新，下次访问看到新数据
+    refreshing = trend_cache.needs_refresh(language, period, page)
+    if refreshing:
+        trend_cache.schedule_refresh(language, period, page)
 
     context = {
         'repos': repos,
+        'refreshing': refreshing,
         # 把当前的筛选状态传回前端，用于回显
         'current_lang': language,
         'current_period': period,
+        'current_sort': sort,
         'current_page': page,
-        'language_options': language_options,
+        # 预设的语言列表 (用于下拉菜单)，也是后台预抓取的范围
+        'language_options': LANGUAGE_OPTIONS,
         # 计算下一页和上一页
-        'next_page': page + 1,
+        'next_page': page + 1 if has_next else None,
         'prev_page': page - 1 if page > 1 else None,
     }
-    return render(request, 'Github_trend/index.html', context)
\ No newline at end of file
+    return render(request, 'Github_trend/index.html', context)
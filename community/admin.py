@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Post, Comment, Tag
+from .models import Post, Comment, Tag, UploadedImage
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -19,4 +19,9 @@ class PostAdmin(admin.ModelAdmin):
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('author', 'post', 'created_at')
-    list_filter = ('created_at',)
\ No newline at end of file
+    list_filter = ('created_at',)
+
+@admin.register(UploadedImage)
+class UploadedImageAdmin(admin.ModelAdmin):
+    list_display = ('file', 'width', 'height', 'uploader', 'created_at')
+    readonly_fields = ('sha256', 'variants', 'created_at')
@@ -0,0 +1,86 @@
+"""
+全文索引的中文分析器 (Whoosh)
+
+Haystack 默认的 StemmingAnalyzer 按 \\w+ 切词，一整段没有空格的中文会变成一个超长词，
+搜“机器学习”无法命中“本周讨论机器学习论文”。这里复用 FTS5 后端的 CJK 二元切分，
+索引端与查询端 (Whoosh QueryParser 会用同一个字段分析器处理查询词) 规则一致；
+索引端额外保存单字，单个汉字的查询也能命中。
+
+分析器可插拔：settings.SEARCH_TEXT_ANALYZER 指向一个返回 Whoosh 分析器的可调用对象，
+例如装了 jieba 后可改为 'jieba.analyse.ChineseAnalyzer' 做词典分词。
+修改后需要 python manage.py rebuild_index。
+"""
+from django.conf import settings
+from django.utils.module_loading import import_string
+from whoosh.analysis import StemFilter, StopFilter, Token, Tokenizer
+
+from .tokenizers import is_cjk, tokenize as cjk_tokenize
+
+DEFAULT_TEXT_ANALYZER = 'community.analyzers.ChineseAnalyzer'
+
+
+def with_unigrams(tokens):
+    """
+    索引端在二元切分之外再为每个汉字产出单字 token (与所在的 bigram 同一位置，短语查询不受影响)
+    查询端只切 bigram，只有单独一个汉字的查询才会用到单字：搜“猫”也能命中“小猫咪”
+    """
+    tokens = list(tokens)
+    for i, (text, start, end) in enumerate(tokens):
+        yield i, (text, start, end)
+        if len(text) != 2 or not is_cjk(text):
+            continue
+        yield i, (text[0], start, start + 1)
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        # 一段中文的最后一个 bigram：第二个字不会再作为下一个 bigram 的首字出现
+        if following is None or following[1] != start + 1 or not is_cjk(following[0]):
+            yield i, (text[1], start + 1, end)
+
+
+class CJKBigramTokenizer(Tokenizer):
+    """中文按相邻两字切分 (索引端附带单字)，英文/数字按单词切分 (规则见 community.tokenizers)"""
+
+    def __call__(self, value, positions=False, chars=False, keeporiginal=False,
+                 removestops=True, start_pos=0, start_char=0, tokenize=True,
+                 mode='', **kwargs):
+        token = Token(positions, chars, removestops=removestops, mode=mode, **kwargs)
+
+        if not tokenize:
+            token.original = token.text = value
+            token.boost = 1.0
+            if positions:
+                token.pos = start_pos
+            if chars:
+                token.startchar = start_char
+                token.endchar = start_char + len(value)
+            yield token
+            return
+
+        # 查询端只切 bigram，索引端附带单字 (二者位置相同)
+        tokens = enumerate(cjk_tokenize(value)) if mode == 'query' else with_unigrams(cjk_tokenize(value))
+        for i, (text, start, end) in tokens:
+            pos = start_pos + i
+            token.text = text
+            token.boost = 1.0
+            token.stopped = False
+            if keeporiginal:
+                token.original = text
+            if positions:
+                token.pos = pos
+            if chars:
+                token.startchar = start_char + start
+                token.endchar = start_char + end
+            yield token
+
+
+def ChineseAnalyzer():
+    """
+    CJK 二元切分 + 英文停用词 + 英文词干化
+    (StopFilter 的 minsize 设为 1，避免单个汉字被当作过短的词丢弃)
+    """
+    return CJKBigramTokenizer() | StopFilter(minsize=1) | StemFilter()
+
+
+def get_text_analyzer():
+    """返回 settings.SEARCH_TEXT_ANALYZER 配置的分析器实例，供各 SearchIndex 的 text 字段使用"""
+    path = getattr(settings, 'SEARCH_TEXT_ANALYZER', DEFAULT_TEXT_ANALYZER)
+    return import_string(path)()
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CommunityConfig(AppConfig):
     name = 'community'
+
+    def ready(self):
+        # 注册 FTS5 索引同步、关注动态同步信号
+        from . import fts, signals  # noqa: F401
@@ -0,0 +1,197 @@
+"""
+SQLite FTS5 全文检索 (Whoosh 的零依赖替代方案)
+
+- community_post_fts: 公开帖子的标题 + 正文，rowid = Post.id
+- community_comment_fts: 评论正文，rowid = Comment.id，post_id 仅存储不分词
+虚拟表由迁移 0006 创建；写入前先用 tokenizers.segment() 做 CJK 二元切分，
+FTS5 内置的 unicode61 分词器只需按空格切开。保存/删除 Post、Comment 时通过信号同步，
+查询按 bm25() 排序 (标题权重高于正文)。非 SQLite 数据库下所有函数为空操作。
+"""
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Comment, Post
+from .tokenizers import is_cjk, segment, tokenize
+
+POST_TABLE = 'community_post_fts'
+COMMENT_TABLE = 'community_comment_fts'
+
+# bm25 列权重：标题命中比正文命中更相关
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+# 影响帖子索引内容的字段：save(update_fields=['views']) 之类直接跳过
+POST_INDEXED_FIELDS = {'title', 'content', 'visibility'}
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(query):
+    """
+    把用户输入转换为 FTS5 MATCH 表达式 (与索引端相同的切分规则)
+    空格分隔的每个词切分后作为一个短语 (要求 bigram 相邻)，多个词之间为 AND；
+    单个汉字无法构成 bigram，改用前缀查询匹配以它开头的词。
+    所有 token 都只含字母/数字，用双引号包裹即可避免 FTS5 语法注入。
+    """
+    clauses = []
+    for term in (query or '').split():
+        tokens = [token for token, _, _ in tokenize(term)]
+        if not tokens:
+            continue
+        if len(tokens) == 1 and len(tokens[0]) == 1 and is_cjk(tokens[0]):
+            clauses.append(f'"{tokens[0]}"*')
+        else:
+            clauses.append('"{}"'.format(' '.join(tokens)))
+    return ' AND '.join(clauses)
+
+
+# ==================================
+# 索引写入
+# ==================================
+
+def index_posts(rows):
+    """
+    写入 / 覆盖帖子索引
+    :param rows: [(id, title, content), ...]
+    """
+    rows = list(rows)
+    if not rows or not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {POST_TABLE} WHERE rowid = %s', [(pk,) for pk, _, _ in rows])
+        cursor.executemany(
+            f'INSERT INTO {POST_TABLE} (rowid, title, content) VALUES (%s, %s, %s)',
+            [(pk, segment(title), segment(content)) for pk, title, content in rows]
+        )
+    return len(rows)
+
+
+def index_comments(rows):
+    """
+    写入 / 覆盖评论索引
+    :param rows: [(id, post_id, content), ...]
+    """
+    rows = list(rows)
+    if not rows or not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {COMMENT_TABLE} WHERE rowid = %s', [(pk,) for pk, _, _ in rows])
+        cursor.executemany(
+            f'INSERT INTO {COMMENT_TABLE} (rowid, post_id, content) VALUES (%s, %s, %s)',
+            [(pk, post_id, segment(content)) for pk, post_id, content in rows]
+        )
+    return len(rows)
+
+
+def remove_post(pk):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {POST_TABLE} WHERE rowid = %s', [pk])
+
+
+def remove_comment(pk):
+    if is_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {COMMENT_TABLE} WHERE rowid = %s', [pk])
+
+
+def rebuild(batch_size=500):
+    """清空并重建两张索引表，返回 (帖子数, 评论数)"""
+    if not is_available():
+        return 0, 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {POST_TABLE}')
+        cursor.execute(f'DELETE FROM {COMMENT_TABLE}')
+
+    posts = Post.objects.filter(visibility='public').values_list('id', 'title', 'content')
+    comments = Comment.objects.values_list('id', 'post_id', 'content')
+    post_count = sum(index_posts(chunk) for chunk in _chunked(posts, batch_size))
+    comment_count = sum(index_comments(chunk) for chunk in _chunked(comments, batch_size))
+    return post_count, comment_count
+
+
+def _chunked(queryset, size):
+    chunk = []
+    for row in queryset.iterator(chunk_size=size):
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ==================================
+# 查询
+# ==================================
+
+def search_posts(query, limit=500):
+    """按 bm25 相关度返回公开帖子 ID 列表 (最相关的在前)"""
+    match = build_match_query(query)
+    if not match or not is_available():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {POST_TABLE} WHERE {POST_TABLE} MATCH %s '
+            f'ORDER BY bm25({POST_TABLE}, %s, %s) LIMIT %s',
+            [match, TITLE_WEIGHT, CONTENT_WEIGHT, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_comments(query, limit=500):
+    """
+    按 bm25 相关度返回评论 [(comment_id, post_id), ...]
+    评论索引不区分帖子可见性，查询时关联帖子表过滤掉私密帖子下的评论
+    """
+    match = build_match_query(query)
+    if not match or not is_available():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT f.rowid, f.post_id FROM {COMMENT_TABLE} AS f '
+            f'JOIN {Post._meta.db_table} AS p ON p.id = f.post_id '
+            f"WHERE {COMMENT_TABLE} MATCH %s AND p.visibility = 'public' "
+            f'ORDER BY bm25({COMMENT_TABLE}) LIMIT %s',
+            [match, limit]
+        )
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+# ==================================
+# 信号同步
+# ==================================
+
+@receiver(post_save, sender=Post, dispatch_uid='fts_sync_post')
+def sync_post(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields and not set(update_fields) & POST_INDEXED_FIELDS:
+        return
+    if instance.visibility == 'public':
+        index_posts([(instance.pk, instance.title, instance.content)])
+    else:
+        remove_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post, dispatch_uid='fts_remove_post')
+def delete_post(sender, instance, **kwargs):
+    # 评论随帖子级联删除，会各自触发 delete_comment
+    remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment, dispatch_uid='fts_sync_comment')
+def sync_comment(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields and 'content' not in update_fields:
+        return
+    index_comments([(instance.pk, instance.post_id, instance.content)])
+
+
+@receiver(post_delete, sender=Comment, dispatch_uid='fts_remove_comment')
+def delete_comment(sender, instance, **kwargs):
+    remove_comment(instance.pk)
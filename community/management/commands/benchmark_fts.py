@@ -0,0 +1,118 @@
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from haystack import connections
+from haystack.inputs import AutoQuery
+from haystack.query import SearchQuerySet
+
+from community import fts
+from community.models import Post
+
+User = get_user_model()
+
+# 合成语料用的词表 (中文正文不带空格，贴近真实帖子)
+WORDS = [
+    '机器学习', '深度学习', '神经网络', '数据集', '实验室', '论文', '模型', '训练', '推理',
+    '显卡', '服务器', '组会', '导师', '答辩', '算法', '优化', '代码', '复现', '开源',
+    '图像分割', '目标检测', '自然语言处理', '大模型', '强化学习', 'Python', 'PyTorch', 'GPU',
+]
+QUERIES = ['机器学习', '神经网络', '图像分割', '论文', '显卡 服务器', '学习', 'PyTorch', '大模型 训练']
+
+
+class Command(BaseCommand):
+    help = '对比 SQLite FTS5 与 Whoosh 的索引吞吐量和查询延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=2000, help='合成帖子数量')
+        parser.add_argument('--repeat', type=int, default=20, help='每个查询重复次数')
+
+    def handle(self, *args, **options):
+        if not fts.is_available():
+            raise CommandError('当前数据库不是 SQLite，无法测试 FTS5')
+        count, repeat = options['posts'], options['repeat']
+
+        # Whoosh 使用临时索引目录，不污染线上 whoosh_index
+        tmp_dir = tempfile.mkdtemp(prefix='bench_whoosh_')
+        original_path = connections.connections_info['default'].get('PATH')
+        connections.connections_info['default']['PATH'] = tmp_dir
+        connections.reload('default')
+        backend = connections['default'].get_backend()
+        backend.setup()
+        index = connections['default'].get_unified_index().get_index(Post)
+
+        global_processor = apps.get_app_config('haystack').signal_processor
+        global_processor.teardown()
+
+        author, _ = User.objects.get_or_create(
+            username='bench_fts_author',
+            defaults={'email': 'bench_fts_author@example.com'}
+        )
+        rng = random.Random(218)
+        # bulk_create 不触发信号，两边的索引都由下面显式写入
+        posts = Post.objects.bulk_create([
+            Post(title=self.sentence(rng, 3), content=self.sentence(rng, 20), author=author)
+            for _ in range(count)
+        ])
+
+        try:
+            # 1. 索引吞吐量
+            start = time.perf_counter()
+            fts.index_posts((p.pk, p.title, p.content) for p in posts)
+            fts_index_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            backend.update(index, posts)
+            whoosh_index_time = time.perf_counter() - start
+
+            # 2. 查询延迟 + 命中数
+            rows = []
+            for query in QUERIES:
+                fts_timings, whoosh_timings = [], []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    fts_hits = fts.search_posts(query)
+                    fts_timings.append((time.perf_counter() - start) * 1000)
+
+                    start = time.perf_counter()
+                    whoosh_hits = list(
+                        SearchQuerySet().models(Post).filter(content=AutoQuery(query)).values_list('pk', flat=True)[:500]
+                    )
+                    whoosh_timings.append((time.perf_counter() - start) * 1000)
+                rows.append((query, fts_timings, len(fts_hits), whoosh_timings, len(whoosh_hits)))
+        finally:
+            Post.objects.filter(author=author).delete()
+            author.delete()
+            global_processor.setup()
+            connections.connections_info['default']['PATH'] = original_path
+            connections.reload('default')
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.stdout.write(self.style.SUCCESS(f'📊 {count} 篇合成中文帖子'))
+        self.stdout.write(f"索引吞吐量  FTS5: {count / fts_index_time:>10.0f} 篇/秒   "
+                          f"Whoosh: {count / whoosh_index_time:>10.0f} 篇/秒")
+        self.stdout.write(f"\n{'查询':<16}{'FTS5 p50':>10}{'p95':>8}{'命中':>6}{'Whoosh p50':>12}{'p95':>8}{'命中':>6}")
+        for query, fts_timings, fts_hits, whoosh_timings, whoosh_hits in rows:
+            fts_stat, whoosh_stat = self.summarize(fts_timings), self.summarize(whoosh_timings)
+            self.stdout.write(
+                f"{query:<16}{fts_stat['p50']:>10.2f}{fts_stat['p95']:>8.2f}{fts_hits:>6}"
+                f"{whoosh_stat['p50']:>12.2f}{whoosh_stat['p95']:>8.2f}{whoosh_hits:>6}"
+            )
+        self.stdout.write('(延迟单位 ms；命中数上限 500)')
+
+    def sentence(self, rng, length):
+        words = rng.choices(WORDS, k=length)
+        # 每 8 个词插入一个标点，模拟中文断句
+        return ''.join(w + ('，' if i % 8 == 7 else '') for i, w in enumerate(words)) + '。'
+
+    def summarize(self, timings):
+        timings = sorted(timings)
+        return {
+            'p50': statistics.median(timings),
+            'p95': timings[max(int(len(timings) * 0.95) - 1, 0)],
+        }
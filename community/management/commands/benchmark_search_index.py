@@ -0,0 +1,113 @@
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from haystack import connection_router, connections
+from haystack.signals import RealtimeSignalProcessor
+
+from community.models import Post
+from community.signals import QueuedSignalProcessor
+from community.tasks import update_search_index
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = '对比 Realtime / Queued 两种索引信号处理器下 Post.save() 的耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=200, help='参与测试的帖子数量')
+
+    def handle(self, *args, **options):
+        count = options['posts']
+
+        # 使用临时索引目录，不污染线上 whoosh_index
+        tmp_dir = tempfile.mkdtemp(prefix='bench_whoosh_')
+        original_path = connections.connections_info['default'].get('PATH')
+        connections.connections_info['default']['PATH'] = tmp_dir
+        connections.reload('default')
+        connections['default'].get_backend().setup()
+
+        # 暂停全局信号处理器，由本命令自行挂载
+        global_processor = apps.get_app_config('haystack').signal_processor
+        global_processor.teardown()
+
+        author, _ = User.objects.get_or_create(
+            username='bench_search_author',
+            defaults={'email': 'bench_search_author@example.com'}
+        )
+        posts = [
+            Post(title=f'性能测试帖子 {i}', content='全文检索 索引 性能 ' * 20, author=author)
+            for i in range(count)
+        ]
+        posts = Post.objects.bulk_create(posts)
+
+        try:
+            realtime = self.run_mode(RealtimeSignalProcessor, posts)
+            queued, flush_time = self.run_mode(QueuedSignalProcessor, posts, queued=True)
+        finally:
+            Post.objects.filter(author=author).delete()
+            author.delete()
+            global_processor.setup()
+            connections.connections_info['default']['PATH'] = original_path
+            connections.reload('default')
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.stdout.write(self.style.SUCCESS(f'📊 {count} 篇帖子，单次 save() 耗时 (ms)'))
+        self.stdout.write(f"{'场景':<24}{'Realtime':>12}{'Queued':>12}")
+        for scenario in ('content', 'views'):
+            self.stdout.write(
+                f"{scenario + ' p50':<24}{realtime[scenario]['p50']:>12.2f}{queued[scenario]['p50']:>12.2f}"
+            )
+            self.stdout.write(
+                f"{scenario + ' p95':<24}{realtime[scenario]['p95']:>12.2f}{queued[scenario]['p95']:>12.2f}"
+            )
+        self.stdout.write(f'Queued 模式后台批量提交耗时: {flush_time:.1f} ms (不计入请求)')
+
+    def run_mode(self, processor_class, posts, queued=False):
+        processor = processor_class(connections, connection_router)
+        dispatched = []
+        if queued:
+            # 只记录投递内容，不依赖 Celery broker；随后在本进程内执行一次批量任务
+            processor.dispatch = dispatched.extend
+
+        results = {}
+        try:
+            # 场景 1：修改了索引字段 (标题/正文)
+            timings = []
+            for post in posts:
+                post.title = post.title + ' *'
+                start = time.perf_counter()
+                post.save()
+                timings.append((time.perf_counter() - start) * 1000)
+            results['content'] = self.summarize(timings)
+
+            # 场景 2：只更新浏览量 (post_detail 中的 views += 1)
+            timings = []
+            for post in posts:
+                post.views += 1
+                start = time.perf_counter()
+                post.save(update_fields=['views'])
+                timings.append((time.perf_counter() - start) * 1000)
+            results['views'] = self.summarize(timings)
+        finally:
+            processor.teardown()
+
+        if not queued:
+            return results
+
+        start = time.perf_counter()
+        update_search_index(dispatched)
+        flush_time = (time.perf_counter() - start) * 1000
+        return results, flush_time
+
+    def summarize(self, timings):
+        timings = sorted(timings)
+        return {
+            'p50': statistics.median(timings),
+            'p95': timings[int(len(timings) * 0.95) - 1],
+        }
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from community.search_eval import evaluate, load_corpus
+
+# 参与对比的分析器：Haystack 默认 vs 中文二元切分
+ANALYZERS = [
+    ('StemmingAnalyzer', 'whoosh.analysis.StemmingAnalyzer'),
+    ('ChineseAnalyzer', 'community.analyzers.ChineseAnalyzer'),
+]
+
+
+class Command(BaseCommand):
+    help = '在中文评估语料上对比不同分析器的召回率和查询延迟'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyzer', action='append', default=[],
+                            help='额外参与对比的分析器路径，如 jieba.analyse.ChineseAnalyzer')
+        parser.add_argument('--top-k', type=int, default=10, help='召回率统计的结果条数')
+
+    def handle(self, *args, **options):
+        corpus = load_corpus()
+        analyzers = ANALYZERS + [(path.rsplit('.', 1)[-1], path) for path in options['analyzer']]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"📊 {len(corpus['documents'])} 篇文档，{len(corpus['queries'])} 个查询，召回率@{options['top_k']}"
+        ))
+        self.stdout.write(f"{'分析器':<20}{'召回率':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'建索引(ms)':>12}")
+        for name, path in analyzers:
+            result = evaluate(import_string(path)(), corpus, top_k=options['top_k'])
+            self.stdout.write(
+                f"{name:<20}{result['recall']:>8.2%}{result['p50']:>10.3f}{result['p95']:>10.3f}{result['index_ms']:>12.1f}"
+            )
+            if result['misses']:
+                self.stdout.write(f"    未完全召回: {', '.join(result['misses'])}")
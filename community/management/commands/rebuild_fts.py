@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from community import fts
+
+
+class Command(BaseCommand):
+    help = '重建 SQLite FTS5 全文索引 (帖子 + 评论)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批写入的记录数')
+
+    def handle(self, *args, **options):
+        if not fts.is_available():
+            self.stdout.write(self.style.WARNING('当前数据库不是 SQLite，FTS5 索引不可用'))
+            return
+        post_count, comment_count = fts.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'✅ 已重建索引：{post_count} 篇帖子，{comment_count} 条评论'))
@@ -0,0 +1,54 @@
+from django.db import migrations
+
+from community.tokenizers import segment
+
+
+def create_fts_tables(apps, schema_editor):
+    """创建 FTS5 虚拟表并导入现有数据 (仅 SQLite)"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('community', 'Post')
+    Comment = apps.get_model('community', 'Comment')
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS community_post_fts "
+            "USING fts5(title, content, tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS community_comment_fts "
+            "USING fts5(post_id UNINDEXED, content, tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.executemany(
+            'INSERT INTO community_post_fts (rowid, title, content) VALUES (%s, %s, %s)',
+            [
+                (pk, segment(title), segment(content))
+                for pk, title, content in Post.objects.filter(visibility='public').values_list('id', 'title', 'content')
+            ]
+        )
+        cursor.executemany(
+            'INSERT INTO community_comment_fts (rowid, post_id, content) VALUES (%s, %s, %s)',
+            [
+                (pk, post_id, segment(content))
+                for pk, post_id, content in Comment.objects.values_list('id', 'post_id', 'content')
+            ]
+        )
+
+
+def drop_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS community_post_fts')
+        cursor.execute('DROP TABLE IF EXISTS community_comment_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0005_post_visibility_collection'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_tables, drop_fts_tables),
+    ]
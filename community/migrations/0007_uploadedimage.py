@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0006_post_comment_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadedImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='内容哈希')),
+                ('file', models.FileField(max_length=255, upload_to='posts/', verbose_name='原图')),
+                ('width', models.PositiveIntegerField(default=0, verbose_name='宽度')),
+                ('height', models.PositiveIntegerField(default=0, verbose_name='高度')),
+                ('variants', models.JSONField(blank=True, default=list, verbose_name='尺寸变体')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='上传时间')),
+                ('uploader', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploaded_images', to=settings.AUTH_USER_MODEL, verbose_name='上传者')),
+            ],
+            options={
+                'verbose_name': '上传图片',
+                'verbose_name_plural': '上传图片',
+            },
+        ),
+    ]
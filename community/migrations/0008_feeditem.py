@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0007_uploadedimage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='发布时间')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='作者')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL, verbose_name='接收者')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='community.post', verbose_name='帖子')),
+            ],
+            options={
+                'verbose_name': '关注动态',
+                'verbose_name_plural': '关注动态',
+                'indexes': [models.Index(fields=['owner', '-created_at', '-post'], name='feed_owner_time_idx'), models.Index(fields=['owner', 'author'], name='feed_owner_author_idx')],
+                'unique_together': {('owner', 'post')},
+            },
+        ),
+    ]
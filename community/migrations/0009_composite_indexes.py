@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0008_feeditem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['visibility', '-created_at'], name='post_visibility_time_idx'),
+        ),
+    ]
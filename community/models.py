@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.core.files.storage import default_storage
 
 class Tag(models.Model):
     """标签模型 (仅管理员可操作)"""
@@ -59,6 +60,10 @@ class Post(models.Model):
         verbose_name = '帖子'
         verbose_name_plural = verbose_name
         ordering = ['-created_at']
+        indexes = [
+            # 社区广场 / 搜索结果：WHERE visibility = 'public' ORDER BY created_at DESC
+            models.Index(fields=['visibility', '-created_at'], name='post_visibility_time_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -118,4 +123,66 @@ class Collection(models.Model):
         unique_together = ('user', 'name') # 同一个用户不能有两个同名收藏夹
 
     def __str__(self):
-        return f"{self.user.username} 的收藏夹: {self.name}"
\ No newline at end of file
+        return f"{self.user.username} 的收藏夹: {self.name}"
+
+# 👇👇👇 新增：编辑器上传的图片 (按内容哈希去重)
+class UploadedImage(models.Model):
+    """
+    Vditor 上传的图片
+    文件按内容 SHA-256 命名 (posts/<前两位>/<哈希>.<扩展名>)，相同图片只存一份；
+    缩略图/多尺寸变体由 Celery 任务 generate_image_variants 在后台生成。
+    """
+    sha256 = models.CharField('内容哈希', max_length=64, unique=True)
+    file = models.FileField('原图', upload_to='posts/', max_length=255)
+    width = models.PositiveIntegerField('宽度', default=0)
+    height = models.PositiveIntegerField('高度', default=0)
+    # [{"width": 320, "webp": "posts/ab/<hash>_w320.webp", "jpeg": "posts/ab/<hash>_w320.jpg"}, ...]
+    variants = models.JSONField('尺寸变体', default=list, blank=True)
+    uploader = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='uploaded_images', verbose_name='上传者'
+    )
+    created_at = models.DateTimeField('上传时间', auto_now_add=True)
+
+    class Meta:
+        verbose_name = '上传图片'
+        verbose_name_plural = verbose_name
+
+    def __str__(self):
+        return self.file.name
+
+    def srcset(self):
+        """<img srcset> 字符串 (WebP 变体 + 原图)，变体未生成时返回空串"""
+        if not self.variants:
+            return ''
+        candidates = [f"{default_storage.url(v['webp'])} {v['width']}w" for v in self.variants]
+        candidates.append(f"{self.file.url} {self.width}w")
+        return ', '.join(candidates)
+
+
+# 👇👇👇 新增：关注动态 (写扩散的个人时间线)
+class FeedItem(models.Model):
+    """
+    关注动态收件箱
+    作者发布公开帖子时，为每个关注者写入一行 (fan-out-on-write)，
+    读取时间线只需按 (owner, created_at, post_id) 索引倒序扫描，无需 author_id IN (...) 排序。
+    粉丝数超过 FEED_FANOUT_MAX_FOLLOWERS 的作者不写扩散，读取时实时合并。
+    """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='feed_items', verbose_name='接收者')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='feed_items', verbose_name='帖子')
+    # 冗余作者字段：取消关注时按作者批量清理
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', verbose_name='作者')
+    # 冗余帖子发布时间：时间线按它做游标分页
+    created_at = models.DateTimeField('发布时间')
+
+    class Meta:
+        verbose_name = '关注动态'
+        verbose_name_plural = verbose_name
+        unique_together = ('owner', 'post')
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post'], name='feed_owner_time_idx'),
+            models.Index(fields=['owner', 'author'], name='feed_owner_author_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner} <- {self.post}"
@@ -1,18 +1,31 @@
 from haystack import indexes
+from whoosh.analysis import KeywordAnalyzer
+from .analyzers import get_text_analyzer
 from .models import Post
 
 class PostIndex(indexes.SearchIndex, indexes.Indexable):
     # document=True 表示这是主要搜索字段
     # use_template=True 表示具体的索引内容我们在一个 txt 模板里定义
-    text = indexes.CharField(document=True, use_template=True)
+    # analyzer: 中文二元切分 (各 App 的 text 字段共用同一个 Whoosh 字段，必须用同一个分析器)
+    text = indexes.CharField(document=True, use_template=True, analyzer=get_text_analyzer())
     
     # 我们也可以索引其他字段用于过滤，比如作者、发布时间
     author = indexes.CharField(model_attr='author')
     pub_date = indexes.DateTimeField(model_attr='created_at')
 
+    # 统一搜索的分类 (用于分面统计)，不分词、不做词干化
+    category = indexes.CharField(default='post', analyzer=KeywordAnalyzer())
+
+    # 影响索引内容的模型字段：save(update_fields=...) 未涉及这些字段时跳过重建索引
+    indexed_model_fields = ('title', 'content', 'author', 'created_at', 'visibility')
+
     def get_model(self):
         return Post
 
     def index_queryset(self, using=None):
-        """更新索引时使用的数据集"""
-        return self.get_model().objects.all()
\ No newline at end of file
+        """更新索引时使用的数据集 (私密帖子不进入索引)"""
+        return self.get_model().objects.filter(visibility='public')
+
+    def read_queryset(self, using=None):
+        """搜索结果 load_all() 取回对象时使用：结果列表显示作者，一并查出避免逐条查询"""
+        return self.index_queryset(using).select_related('author')
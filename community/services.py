@@ -0,0 +1,341 @@
+import hashlib
+import io
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Value, CharField, Count, Q
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Post, Collection, UploadedImage, FeedItem
+
+logger = logging.getLogger(__name__)
+
+
+class InteractionStateService:
+    """
+    用户互动状态服务 (点赞 / 收藏 / 关注)
+    一次性为一批帖子返回当前用户的互动状态，列表页和详情页共用：
+    - liked: 已点赞的帖子 ID 集合
+    - collected: {帖子ID: {收藏夹ID, ...}}，收藏夹 ID 用于详情页弹窗回显勾选状态
+    - following: 已关注的作者 ID 集合
+    最多两条 SQL (点赞+收藏 UNION 一条，关注一条)，结果按用户版本号缓存，
+    点赞/收藏/关注的切换视图调用 invalidate() 使其失效。
+    """
+    CACHE_TIMEOUT = 600
+
+    def _version_key(self, user_id):
+        return f"interaction_state_version_{user_id}"
+
+    def _get_version(self, user_id):
+        version = cache.get(self._version_key(user_id))
+        if version is None:
+            version = 1
+            cache.add(self._version_key(user_id), version, None)
+        return version
+
+    def invalidate(self, user):
+        """
+        用户的点赞/收藏/关注发生变化时调用，让该用户的所有缓存失效
+        在事务中调用时提交后才递增版本号：回滚 (含锁冲突重试) 不会白白失效，
+        也不会有并发请求在提交前把旧状态按新版本号缓存下来
+        """
+        transaction.on_commit(lambda: self._bump(user.pk))
+
+    def _bump(self, user_id):
+        key = self._version_key(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # 版本号不存在 (首次或已被淘汰)，直接写入一个新版本
+            cache.set(key, 2, None)
+
+    def get_state(self, user, post_ids, author_ids=()):
+        """
+        :param user: 当前用户
+        :param post_ids: 需要查询的帖子 ID 列表
+        :param author_ids: 需要查询关注状态的作者 ID 列表
+        :return: {'liked': set, 'collected': dict, 'following': set}
+        """
+        post_ids = sorted({int(pk) for pk in post_ids})
+        author_ids = sorted({int(pk) for pk in author_ids if pk != user.pk})
+
+        state = {'liked': set(), 'collected': {}, 'following': set()}
+        if not user.is_authenticated or (not post_ids and not author_ids):
+            return state
+
+        version = self._get_version(user.pk)
+        cache_key = "interaction_state_{}_{}_{}_{}".format(
+            user.pk, version,
+            ",".join(map(str, post_ids)),
+            ",".join(map(str, author_ids)),
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if post_ids:
+            # 查询 1：点赞 + 收藏 (UNION)
+            # 点赞行的 collection_id 固定为 0，收藏行为真实的收藏夹 ID
+            LikeThrough = Post.likes.through
+            CollectionThrough = Collection.posts.through
+            liked_qs = LikeThrough.objects.filter(
+                customuser_id=user.pk, post_id__in=post_ids
+            ).values_list('post_id', Value(0), Value('like', output_field=CharField()))
+            collected_qs = CollectionThrough.objects.filter(
+                collection__user_id=user.pk, post_id__in=post_ids
+            ).values_list('post_id', 'collection_id', Value('collect', output_field=CharField()))
+
+            for post_id, collection_id, kind in liked_qs.union(collected_qs, all=True):
+                if kind == 'like':
+                    state['liked'].add(post_id)
+                else:
+                    state['collected'].setdefault(post_id, set()).add(collection_id)
+
+        if author_ids:
+            # 查询 2：关注关系
+            FollowThrough = user.following.through
+            state['following'] = set(
+                FollowThrough.objects.filter(
+                    from_customuser_id=user.pk, to_customuser_id__in=author_ids
+                ).values_list('to_customuser_id', flat=True)
+            )
+
+        cache.set(cache_key, state, self.CACHE_TIMEOUT)
+        return state
+
+
+class ImageUploadService:
+    """
+    编辑器图片上传流水线
+    请求内只做必须同步完成的部分：校验、按内容哈希去重、去除 EXIF (GPS 等隐私信息)，
+    然后立即返回原图 URL；多尺寸 WebP/JPEG 变体交给 Celery 任务 generate_image_variants。
+    """
+    # Pillow 识别出的格式 -> 保存用的扩展名
+    FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+    # 正文中引用的已上传图片 URL：/media/posts/ab/<sha256>.<ext>
+    URL_PATTERN = re.compile(r'posts/[0-9a-f]{2}/([0-9a-f]{64})\.(?:jpg|png|gif|webp)')
+
+    def save_upload(self, file_obj, user=None):
+        """
+        :return: UploadedImage (相同内容已上传过时直接返回已有记录)
+        :raise ValueError: 文件过大或不是有效图片
+        """
+        max_size = getattr(settings, 'IMAGE_UPLOAD_MAX_SIZE', 10 * 1024 * 1024)
+        if file_obj.size > max_size:
+            raise ValueError(f'图片不能超过 {max_size // (1024 * 1024)}MB')
+
+        hasher = hashlib.sha256()
+        for chunk in file_obj.chunks():
+            hasher.update(chunk)
+        digest = hasher.hexdigest()
+
+        # 1. 去重：相同内容直接复用
+        existing = UploadedImage.objects.filter(sha256=digest).first()
+        if existing:
+            return existing
+
+        # 2. 校验真实格式 (不信任扩展名)
+        file_obj.seek(0)
+        try:
+            image = Image.open(file_obj)
+            image.verify()
+            file_obj.seek(0)
+            image = Image.open(file_obj)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError):
+            raise ValueError('仅支持图片文件')
+        if image.format not in self.FORMATS:
+            raise ValueError('仅支持图片文件')
+
+        # 3. 去除 EXIF：有 EXIF 时按方向旋正后重新编码，否则原样保存
+        file_obj.seek(0)
+        if image.getexif() or 'exif' in image.info:
+            data, (width, height) = self.strip_exif(image)
+            content = ContentFile(data)
+        else:
+            content = ContentFile(file_obj.read())
+            width, height = image.size
+
+        name = f"posts/{digest[:2]}/{digest}.{self.FORMATS[image.format]}"
+        if default_storage.exists(name):
+            # 残留文件 (记录已删除)：覆盖，保证路径与哈希一致
+            default_storage.delete(name)
+        default_storage.save(name, content)
+
+        try:
+            with transaction.atomic():
+                record = UploadedImage.objects.create(
+                    sha256=digest, file=name, width=width, height=height, uploader=user
+                )
+        except IntegrityError:
+            # 并发上传了同一张图，对方已经写入
+            return UploadedImage.objects.get(sha256=digest)
+
+        transaction.on_commit(lambda: self.dispatch(record.pk))
+        return record
+
+    def strip_exif(self, image):
+        """按 EXIF 方向旋正后重新编码 (不带任何元数据)，返回 (字节串, (宽, 高))"""
+        image_format = image.format
+        image = ImageOps.exif_transpose(image)
+        buffer = io.BytesIO()
+        if image_format == 'JPEG':
+            image.save(buffer, 'JPEG', quality=90, optimize=True)
+        else:
+            image.save(buffer, image_format)
+        return buffer.getvalue(), image.size
+
+    def dispatch(self, image_id):
+        from .tasks import generate_image_variants
+
+        try:
+            generate_image_variants.apply_async(args=[image_id], retry=False)
+        except Exception as e:
+            # Broker 不可用时不阻塞上传，原图可以正常显示，变体稍后可补生成
+            logger.warning(f"Image variant queue unavailable: {e}")
+
+    def srcset_map(self, content):
+        """
+        正文中引用的已上传图片 -> srcset
+        :return: {原图 URL: srcset 字符串}，只包含已生成变体的图片
+        """
+        digests = set(self.URL_PATTERN.findall(content or ''))
+        if not digests:
+            return {}
+        images = UploadedImage.objects.filter(sha256__in=digests).exclude(variants=[])
+        return {image.file.url: image.srcset() for image in images}
+
+
+class FeedService:
+    """
+    关注动态时间线 (推拉结合)
+    - 推：普通作者发布公开帖子后，由 Celery 任务把帖子写入每个关注者的 FeedItem；
+    - 拉：粉丝数超过 FEED_FANOUT_MAX_FOLLOWERS 的作者不写扩散，读取时直接查其帖子再合并；
+    - 关注时回填对方最近的帖子，取消关注时删除对方的条目；
+    - 分页使用 (created_at, post_id) 游标，翻页代价与页码无关。
+    """
+    PAGE_SIZE = 20
+    BATCH_SIZE = 500
+    CELEBRITY_CACHE_KEY = 'feed_celebrity_ids'
+    CELEBRITY_CACHE_TIMEOUT = 600
+
+    @property
+    def fanout_limit(self):
+        return getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', 1000)
+
+    @property
+    def backfill_size(self):
+        return getattr(settings, 'FEED_BACKFILL_SIZE', 50)
+
+    def _follow_through(self):
+        return get_user_model().following.through
+
+    def celebrity_ids(self):
+        """粉丝数超过阈值的作者 ID 集合 (缓存，不必实时)"""
+        ids = cache.get(self.CELEBRITY_CACHE_KEY)
+        if ids is None:
+            ids = set(
+                self._follow_through().objects.values('to_customuser_id')
+                .annotate(n=Count('from_customuser_id'))
+                .filter(n__gt=self.fanout_limit)
+                .values_list('to_customuser_id', flat=True)
+            )
+            cache.set(self.CELEBRITY_CACHE_KEY, ids, self.CELEBRITY_CACHE_TIMEOUT)
+        return ids
+
+    # ---------- 写入 ----------
+
+    def fanout(self, post):
+        """把公开帖子推送给作者的所有关注者，返回写入条数 (大V 跳过，返回 0)"""
+        if post.visibility != 'public' or post.author_id in self.celebrity_ids():
+            return 0
+        follower_ids = self._follow_through().objects.filter(
+            to_customuser_id=post.author_id
+        ).values_list('from_customuser_id', flat=True)
+
+        created = 0
+        batch = []
+        for follower_id in follower_ids.iterator():
+            batch.append(FeedItem(owner_id=follower_id, post_id=post.pk, author_id=post.author_id, created_at=post.created_at))
+            if len(batch) >= self.BATCH_SIZE:
+                created += len(FeedItem.objects.bulk_create(batch, ignore_conflicts=True))
+                batch = []
+        if batch:
+            created += len(FeedItem.objects.bulk_create(batch, ignore_conflicts=True))
+        return created
+
+    def retract(self, post_id):
+        """帖子转为私密时从所有时间线撤回 (删除帖子时由外键级联删除)"""
+        FeedItem.objects.filter(post_id=post_id).delete()
+
+    def backfill(self, owner_id, author_id):
+        """关注后回填对方最近的公开帖子"""
+        if author_id in self.celebrity_ids():
+            return 0
+        posts = Post.objects.filter(author_id=author_id, visibility='public')\
+            .order_by('-created_at').values_list('id', 'created_at')[:self.backfill_size]
+        items = [
+            FeedItem(owner_id=owner_id, post_id=post_id, author_id=author_id, created_at=created_at)
+            for post_id, created_at in posts
+        ]
+        return len(FeedItem.objects.bulk_create(items, ignore_conflicts=True))
+
+    def remove_author(self, owner_id, author_id):
+        """取消关注后清理对方的条目"""
+        FeedItem.objects.filter(owner_id=owner_id, author_id=author_id).delete()
+
+    # ---------- 读取 ----------
+
+    def encode_cursor(self, created_at, post_id):
+        delta = created_at - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+        return f"{delta // timedelta(microseconds=1)}_{post_id}"
+
+    def decode_cursor(self, cursor):
+        """游标格式: <微秒时间戳>_<帖子ID>，无效时返回 None (从头开始)"""
+        try:
+            micros, post_id = (int(part) for part in cursor.split('_'))
+        except (AttributeError, ValueError):
+            return None
+        return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=micros), post_id
+
+    def get_page(self, user, cursor=None, limit=None):
+        """
+        :return: (帖子 ID 列表 (新到旧), 下一页游标或 None)
+        """
+        limit = limit or self.PAGE_SIZE
+        position = self.decode_cursor(cursor) if cursor else None
+
+        # 1. 推：自己的收件箱
+        pushed = FeedItem.objects.filter(owner=user)
+        if position:
+            pushed = pushed.filter(Q(created_at__lt=position[0]) | Q(created_at=position[0], post_id__lt=position[1]))
+        rows = list(pushed.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[:limit + 1])
+
+        # 2. 拉：关注的大V 的帖子实时查询
+        celebrities = self.celebrity_ids()
+        if celebrities:
+            followed = list(self._follow_through().objects.filter(
+                from_customuser_id=user.pk, to_customuser_id__in=celebrities
+            ).values_list('to_customuser_id', flat=True))
+            if followed:
+                pulled = Post.objects.filter(author_id__in=followed, visibility='public')
+                if position:
+                    pulled = pulled.filter(Q(created_at__lt=position[0]) | Q(created_at=position[0], id__lt=position[1]))
+                rows += list(pulled.order_by('-created_at', '-id').values_list('created_at', 'id')[:limit + 1])
+
+        # 3. 合并排序，多取的一条用于判断是否还有下一页
+        rows = sorted(set(rows), reverse=True)
+        page, has_more = rows[:limit], len(rows) > limit
+        next_cursor = self.encode_cursor(*page[-1]) if has_more else None
+        return [post_id for _, post_id in page], next_cursor
+
+
+interaction_service = InteractionStateService()
+image_upload_service = ImageUploadService()
+feed_service = FeedService()
@@ -0,0 +1,178 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.dispatch import receiver
+from haystack.exceptions import NotHandled
+from haystack.signals import BaseSignalProcessor
+from haystack.utils.loading import UnifiedIndex
+
+logger = logging.getLogger(__name__)
+
+
+def pending_key(label, pk):
+    """某条记录“已在队列中等待重建索引”的标记 key"""
+    return f"search_index_pending_{label}_{pk}"
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """
+    排队式索引信号处理器 (替代 RealtimeSignalProcessor)
+
+    Realtime 模式下每次 save() 都会在请求内同步重写 Whoosh 索引 (持有 MAIN_WRITELOCK)，
+    连浏览量 +1 这种与搜索无关的保存也不例外。这里改为：
+    1. 只关心注册了 SearchIndex 的模型；
+    2. save(update_fields=...) 只改了未被索引的字段 (如 views) 时直接跳过；
+    3. 同一事务内的变更先缓冲，事务提交后一次性投递给 Celery 任务，由任务合并去重后批量提交索引；
+    4. 同一条记录在队列里还没处理时，再次保存不会重复投递。
+
+    判断模型是否注册了索引时只导入各 App 的 search_indexes，不访问搜索连接：
+    通知、私信、发件箱这类未索引模型的保存不会加载 Whoosh 后端 (Celery worker 大多永远用不到它)。
+    """
+
+    def __init__(self, connections, connection_router):
+        self._local = threading.local()
+        self._indexed_models = None
+        super().__init__(connections, connection_router)
+
+    def _buffer(self):
+        """本线程待投递的记录 {(model_label, pk): None} (保持顺序并去重)"""
+        if not hasattr(self._local, 'items'):
+            self._local.items = {}
+        return self._local.items
+
+    def setup(self):
+        models.signals.post_save.connect(self.handle_save)
+        models.signals.post_delete.connect(self.handle_delete)
+
+    def teardown(self):
+        models.signals.post_save.disconnect(self.handle_save)
+        models.signals.post_delete.disconnect(self.handle_delete)
+
+    def is_indexed(self, sender):
+        if self._indexed_models is None:
+            self._indexed_models = {index.get_model() for index in UnifiedIndex().collect_indexes()}
+        return sender in self._indexed_models
+
+    def _get_index(self, sender, instance):
+        if not self.is_indexed(sender):
+            return None
+        for using in self.connection_router.for_write(instance=instance):
+            try:
+                return self.connections[using].get_unified_index().get_index(sender)
+            except NotHandled:
+                continue
+        return None
+
+    def handle_save(self, sender, instance, update_fields=None, **kwargs):
+        index = self._get_index(sender, instance)
+        if index is None:
+            return
+
+        # 只更新了未索引字段 (例如浏览量、首赞标记)，索引内容不会变化
+        indexed_fields = getattr(index, 'indexed_model_fields', None)
+        if update_fields and indexed_fields is not None:
+            if not set(update_fields) & set(indexed_fields):
+                return
+
+        self.enqueue(instance)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        if self._get_index(sender, instance) is None:
+            return
+        self.enqueue(instance)
+
+    def enqueue(self, instance):
+        self._buffer()[(instance._meta.label_lower, instance.pk)] = None
+        # 每次都注册回调：第一个执行的回调会带走整个缓冲区，其余为空操作
+        # (事务回滚时缓冲区保留，随下一次提交一起投递：任务读取的是数据库最新状态，多更新一次无害)
+        transaction.on_commit(self.flush)
+
+    def flush(self):
+        items = self._buffer()
+        if not items:
+            return
+        self._local.items = {}
+        # 提交后才设置排队标记 (回滚的保存不会留下标记)；已经在队列里的记录不再重复投递，任务执行时会读取最新数据
+        timeout = getattr(settings, 'HAYSTACK_QUEUE_PENDING_TIMEOUT', 300)
+        items = [(label, pk) for label, pk in items if cache.add(pending_key(label, pk), True, timeout)]
+        if items:
+            self.dispatch(items)
+
+    def dispatch(self, items):
+        from .tasks import update_search_index
+
+        countdown = getattr(settings, 'HAYSTACK_QUEUE_COUNTDOWN', 5)
+        try:
+            # retry=False：Broker 不可用时立即失败走同步更新，不在请求线程里反复重连
+            update_search_index.apply_async(args=[items], countdown=countdown, retry=False)
+        except Exception as e:
+            # Broker 不可用时退化为同步更新，保证索引不丢
+            logger.warning(f"Search index queue unavailable, updating inline: {e}")
+            update_search_index(items)
+
+
+# ==================================
+# 关注动态 (FeedItem) 同步
+# ==================================
+
+def dispatch_fanout(post_id):
+    from .tasks import fanout_post
+
+    try:
+        fanout_post.apply_async(args=[post_id], retry=False)
+    except Exception as e:
+        logger.warning(f"Feed fan-out queue unavailable, running inline: {e}")
+        fanout_post(post_id)
+
+
+@receiver(models.signals.pre_save, sender='community.Post', dispatch_uid='feed_remember_visibility')
+def remember_old_visibility(sender, instance, update_fields=None, raw=False, **kwargs):
+    """记录保存前的可见性 (只改浏览量、标题正文等字段时跳过，不多查一次库)"""
+    instance._old_visibility = None
+    if raw or not instance.pk:
+        return
+    if update_fields is not None and 'visibility' not in update_fields:
+        return
+    instance._old_visibility = sender.objects.filter(pk=instance.pk).values_list('visibility', flat=True).first()
+
+
+@receiver(models.signals.post_save, sender='community.Post', dispatch_uid='feed_sync_post')
+def sync_feed_on_post_save(sender, instance, created=False, raw=False, **kwargs):
+    """新发公开帖 -> 写扩散；编辑时只有可见性真的变了才写扩散/撤回"""
+    if raw:
+        return
+    if not created:
+        old_visibility = getattr(instance, '_old_visibility', None)
+        if old_visibility is None or old_visibility == instance.visibility:
+            return
+
+    if instance.visibility == 'public':
+        transaction.on_commit(lambda: dispatch_fanout(instance.pk))
+    elif not created:
+        from .services import feed_service
+        feed_service.retract(instance.pk)
+
+
+@receiver(models.signals.m2m_changed, sender=settings.AUTH_USER_MODEL + '_following', dispatch_uid='feed_sync_follow')
+def sync_feed_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    """关注 -> 回填，取消关注 -> 清理 (follow_user、好友互关、删除好友等所有入口)"""
+    from .services import feed_service
+
+    if action == 'pre_clear' and not reverse:
+        # following.clear()：清空自己的整个时间线
+        FeedItem = instance.feed_items.model
+        FeedItem.objects.filter(owner_id=instance.pk).delete()
+        return
+    if action not in ('post_add', 'post_remove'):
+        return
+
+    # reverse=True 时是 target.followers.add(...)，instance 是被关注者
+    pairs = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+    for owner_id, author_id in pairs:
+        if action == 'post_add':
+            feed_service.backfill(owner_id, author_id)
+        else:
+            feed_service.remove_author(owner_id, author_id)
@@ -0,0 +1,123 @@
+# community/tasks.py
+
+import io
+import os
+from collections import defaultdict
+
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from haystack import connection_router, connections
+from haystack.exceptions import NotHandled
+from PIL import Image
+
+from .signals import pending_key
+
+
+# 没有调用方读取结果：不在投递时订阅结果后端 (Redis 宕机时订阅会重连约 20 秒)
+@shared_task(ignore_result=True)
+def update_search_index(items):
+    """
+    批量增量更新全文索引 (由 QueuedSignalProcessor 投递)
+    :param items: [(model_label, pk), ...]，可包含重复项
+    同一模型的记录合并为一次 backend.update()，每个后端只提交一次；
+    数据库中已不存在 (或不再属于 index_queryset) 的记录从索引中移除。
+    """
+    # 1. 合并去重：{model_label: {pk, ...}}
+    grouped = defaultdict(set)
+    for label, pk in items:
+        grouped[label].add(pk)
+        # 先清除排队标记，处理期间的新保存会重新入队，不会丢更新
+        cache.delete(pending_key(label, pk))
+
+    updated = removed = 0
+    for label, pks in grouped.items():
+        model = apps.get_model(label)
+
+        for using in connection_router.for_write():
+            try:
+                index = connections[using].get_unified_index().get_index(model)
+            except NotHandled:
+                continue
+
+            backend = connections[using].get_backend()
+            instances = list(index.index_queryset(using=using).filter(pk__in=pks))
+
+            # 2. 批量写入 (Whoosh 一次 writer.commit)
+            if instances:
+                backend.update(index, instances)
+                updated += len(instances)
+
+            # 3. 已删除 / 不再需要索引的记录
+            for pk in pks - {obj.pk for obj in instances}:
+                backend.remove(f"{label}.{pk}")
+                removed += 1
+
+    return f"Indexed {updated} objects, removed {removed} objects."
+
+
+@shared_task(ignore_result=True)
+def generate_image_variants(image_id):
+    """
+    为上传的图片生成多尺寸变体 (用于 <img srcset>)
+    每个宽度各生成一份 WebP 和 JPEG，只缩小不放大；动图 GIF 保持原样。
+    """
+    from .models import UploadedImage
+
+    try:
+        record = UploadedImage.objects.get(pk=image_id)
+    except UploadedImage.DoesNotExist:
+        return f"Image {image_id} not found."
+
+    widths = getattr(settings, 'IMAGE_VARIANT_WIDTHS', (320, 640, 1280))
+    base, _ = os.path.splitext(record.file.name)
+
+    with default_storage.open(record.file.name, 'rb') as f:
+        image = Image.open(f)
+        image.load()
+
+    if getattr(image, 'is_animated', False):
+        return f"Skipped animated image {image_id}."
+
+    variants = []
+    for width in sorted(widths):
+        if width >= image.width:
+            break
+        resized = image.copy()
+        resized.thumbnail((width, image.height), Image.LANCZOS)
+
+        variant = {'width': resized.width}
+        for key, fmt, ext in (('webp', 'WEBP', 'webp'), ('jpeg', 'JPEG', 'jpg')):
+            output = resized
+            if fmt == 'JPEG' and resized.mode != 'RGB':
+                # JPEG 不支持透明通道，铺白底
+                rgba = resized.convert('RGBA')
+                output = Image.new('RGB', resized.size, (255, 255, 255))
+                output.paste(rgba, mask=rgba.split()[-1])
+            buffer = io.BytesIO()
+            output.save(buffer, fmt, quality=82, optimize=True)
+
+            name = f"{base}_w{width}.{ext}"
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            variant[key] = default_storage.save(name, ContentFile(buffer.getvalue()))
+        variants.append(variant)
+
+    record.variants = variants
+    record.save(update_fields=['variants'])
+    return f"Generated {len(variants)} variants for image {image_id}."
+
+
+@shared_task(ignore_result=True)
+def fanout_post(post_id):
+    """把新发布 / 转为公开的帖子写入关注者的时间线"""
+    from .models import Post
+    from .services import feed_service
+
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None:
+        return f"Post {post_id} not found."
+    return f"Fanned out post {post_id} to {feed_service.fanout(post)} followers."
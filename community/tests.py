@@ -1,3 +1,372 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from haystack.inputs import AutoQuery
+from haystack.query import SearchQuerySet
+from PIL import Image
+from whoosh.analysis import StemmingAnalyzer
+
+from . import fts
+from .models import Post, Comment, Collection, UploadedImage
+from .services import interaction_service, feed_service
+from .signals import QueuedSignalProcessor
+from .analyzers import ChineseAnalyzer
+from .search_eval import evaluate
+from .tasks import generate_image_variants, update_search_index
+
+User = get_user_model()
+
+
+class InteractionStateServiceTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', email='author@test.com', password='pass')
+        self.reader = User.objects.create_user(username='reader', email='reader@test.com', password='pass')
+        self.posts = [
+            Post.objects.create(title=f'帖子{i}', content='内容', author=self.author)
+            for i in range(3)
+        ]
+
+    def test_batch_state_in_two_queries(self):
+        """测试：点赞/收藏/关注状态最多两条查询"""
+        self.posts[0].likes.add(self.reader)
+        col = Collection.objects.create(user=self.reader, name='默认收藏夹')
+        col.posts.add(self.posts[1])
+        self.reader.following.add(self.author)
+
+        post_ids = [p.pk for p in self.posts]
+        with self.assertNumQueries(2):
+            state = interaction_service.get_state(self.reader, post_ids, [self.author.pk])
+
+        self.assertEqual(state['liked'], {self.posts[0].pk})
+        self.assertEqual(state['collected'], {self.posts[1].pk: {col.pk}})
+        self.assertEqual(state['following'], {self.author.pk})
+
+        # 第二次命中缓存，不再查库
+        with self.assertNumQueries(0):
+            interaction_service.get_state(self.reader, post_ids, [self.author.pk])
+
+    def test_like_toggle_invalidates_cache(self):
+        """测试：点赞后缓存失效，详情页显示最新状态"""
+        self.client.login(username='reader', password='pass')
+        post = self.posts[0]
+        response = self.client.get(reverse('community:post_detail', args=[post.pk]))
+        self.assertFalse(response.context['is_liked'])
+
+        # 版本号在事务提交后才递增
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('community:like_post', args=[post.pk]))
+        response = self.client.get(reverse('community:post_detail', args=[post.pk]))
+        self.assertTrue(response.context['is_liked'])
+
+        response = self.client.get(reverse('community:post_list'))
+        self.assertIn(post.pk, response.context['liked_post_ids'])
+
+
+class QueuedSignalProcessorTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', email='author@test.com')
+        self.post = Post.objects.create(title='标题', content='内容', author=self.author)
+        # 清空 setUp 阶段产生的排队标记和缓冲区
+        cache.clear()
+        apps.get_app_config('haystack').signal_processor._local.items = {}
+
+    @mock.patch.object(QueuedSignalProcessor, 'dispatch')
+    def test_skip_non_indexed_fields(self, dispatch):
+        """测试：只更新浏览量时不触发索引"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.views += 1
+            self.post.save(update_fields=['views'])
+        dispatch.assert_not_called()
+
+    @mock.patch.object(QueuedSignalProcessor, 'dispatch')
+    def test_coalesce_duplicate_saves(self, dispatch):
+        """测试：多次保存同一帖子只投递一次"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                self.post.title = f'标题 {i}'
+                self.post.save()
+        dispatch.assert_called_once_with([('community.post', self.post.pk)])
+
+    @mock.patch.object(QueuedSignalProcessor, 'dispatch')
+    def test_rolled_back_save_does_not_block_reindex(self, dispatch):
+        """测试：回滚的保存不留下排队标记，之后提交的保存照常投递"""
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.post.title = '回滚的标题'
+            self.post.save()
+            raise ValueError
+        dispatch.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = '新标题'
+            self.post.save()
+        dispatch.assert_called_once_with([('community.post', self.post.pk)])
+
+    def test_broker_down_updates_inline(self):
+        """测试：Broker 不可用时不重试，直接在当前进程更新索引"""
+        processor = apps.get_app_config('haystack').signal_processor
+        items = [('community.post', self.post.pk)]
+        with mock.patch.object(update_search_index, 'apply_async', side_effect=OSError('refused')) as apply_async, \
+                mock.patch.object(update_search_index, 'run') as run:
+            processor.dispatch(items)
+        self.assertFalse(apply_async.call_args.kwargs['retry'])
+        run.assert_called_once_with(items)
+
+    def test_unindexed_models_skip_search_backend(self):
+        """测试：未注册索引的模型直接跳过，不为判断而访问搜索连接 (加载 Whoosh 后端)"""
+        from notifications.models import Notification
+
+        processor = apps.get_app_config('haystack').signal_processor
+        with mock.patch.object(processor, 'connections') as connections:
+            self.assertIsNone(processor._get_index(Notification, None))
+        connections.__getitem__.assert_not_called()
+        self.assertTrue(processor.is_indexed(Post))
+
+
+@unittest.skipUnless(fts.is_available(), 'FTS5 仅适用于 SQLite')
+class FTSSearchTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='fts_author', email='fts@test.com')
+
+    def test_chinese_substring_match(self):
+        """测试：中文正文无需空格分词即可按子串命中"""
+        post = Post.objects.create(title='组会通知', content='本周讨论机器学习论文复现', author=self.author)
+        self.assertEqual(fts.search_posts('机器学习'), [post.pk])
+        self.assertEqual(fts.search_posts('学习 复现'), [post.pk])
+        self.assertEqual(fts.search_posts('深度学习'), [])
+
+    def test_title_ranked_first(self):
+        """测试：bm25 排序时标题命中优先"""
+        body_hit = Post.objects.create(title='随便聊聊', content='最近在看图像分割', author=self.author)
+        title_hit = Post.objects.create(title='图像分割入门', content='整理的一些资料', author=self.author)
+        self.assertEqual(fts.search_posts('图像分割'), [title_hit.pk, body_hit.pk])
+
+    def test_sync_on_visibility_change_and_delete(self):
+        """测试：私密、删除的帖子及其评论不会被搜到"""
+        post = Post.objects.create(title='显卡申请', content='服务器排队', author=self.author)
+        Comment.objects.create(post=post, author=self.author, content='显卡已经到货')
+        self.assertEqual([post_id for _, post_id in fts.search_comments('到货')], [post.pk])
+
+        post.visibility = 'private'
+        post.save()
+        self.assertEqual(fts.search_posts('显卡'), [])
+        self.assertEqual(fts.search_comments('到货'), [])
+
+        post.visibility = 'public'
+        post.save()
+        self.assertEqual(fts.search_posts('显卡'), [post.pk])
+        post.delete()
+        self.assertEqual(fts.search_posts('显卡'), [])
+        self.assertEqual(fts.search_comments('到货'), [])
+
+    @override_settings(COMMUNITY_SEARCH_BACKEND='fts5')
+    def test_post_list_keeps_bm25_order(self):
+        """测试：帖子列表按 bm25 相关度排序 (标题命中的旧帖排在正文命中的新帖前，只有评论命中的最后)"""
+        title_hit = Post.objects.create(title='图像分割入门', content='整理的一些资料', author=self.author)
+        body_hit = Post.objects.create(title='随便聊聊', content='最近在看图像分割', author=self.author)
+        comment_hit = Post.objects.create(title='求助', content='代码跑不通', author=self.author)
+        Comment.objects.create(post=comment_hit, author=self.author, content='可能是图像分割的标签错了')
+
+        response = self.client.get(reverse('community:post_list'), {'q': '图像分割'})
+        self.assertEqual(
+            [post.pk for post in response.context['posts']], [title_hit.pk, body_hit.pk, comment_hit.pk],
+        )
+
+    @override_settings(COMMUNITY_SEARCH_BACKEND='fts5')
+    def test_search_results_truncated_notice(self):
+        """测试：命中数超过上限时只取相关度最高的部分，并在页面上提示"""
+        for i in range(3):
+            Post.objects.create(title=f'论文分享 {i}', content='内容', author=self.author)
+        url = reverse('community:post_list')
+
+        with mock.patch('community.views.SEARCH_MAX_RESULTS', 2):
+            response = self.client.get(url, {'q': '论文'})
+        self.assertEqual(len(response.context['posts']), 2)
+        self.assertTrue(response.context['search_truncated'])
+        self.assertContains(response, '只显示相关度最高的 2 条')
+
+        response = self.client.get(url, {'q': '论文'})
+        self.assertEqual(len(response.context['posts']), 3)
+        self.assertNotContains(response, '只显示相关度最高的')
+
+
+class ChineseAnalyzerTest(TestCase):
+    def test_recall_on_chinese_corpus(self):
+        """测试：中文评估语料上二元切分全部召回，默认分析器无法切分中文"""
+        self.assertEqual(evaluate(ChineseAnalyzer(), repeat=1)['recall'], 1.0)
+        self.assertLess(evaluate(StemmingAnalyzer(), repeat=1)['recall'], 0.5)
+
+    def test_haystack_query_matches_chinese_substring(self):
+        """测试：Haystack 查询端使用相同切分，中文子串可以命中帖子"""
+        author = User.objects.create_user(username='zh_author', email='zh@test.com')
+        post = Post.objects.create(title='组会通知', content='本周讨论机器学习论文复现', author=author)
+        update_search_index([('community.post', post.pk)])
+
+        matched = SearchQuerySet().models(Post).filter(content=AutoQuery('机器学习')).values_list('pk', flat=True)
+        self.assertIn(str(post.pk), list(matched))
+
+    def test_post_list_keeps_relevance_order(self):
+        """测试：帖子列表的关键词搜索按索引相关度排序，而不是按发布时间"""
+        author = User.objects.create_user(username='rank_author', email='rank@test.com')
+        relevant = Post.objects.create(title='量子退火实验', content='量子退火 量子退火 的实验记录', author=author)
+        passing = Post.objects.create(
+            title='组会纪要', content='今天组会顺带提了一句量子退火，其余时间都在讨论下周的值日安排和报销流程', author=author,
+        )
+        update_search_index([('community.post', relevant.pk), ('community.post', passing.pk)])
+
+        response = self.client.get(reverse('community:post_list'), {'q': '量子退火'})
+        self.assertEqual([post.pk for post in response.context['posts']], [relevant.pk, passing.pk])
+
+
+class ImageUploadTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='uploader', email='uploader@test.com')
+        self.client.force_login(self.user)
+
+    def make_jpeg(self, size=(1600, 1200)):
+        """带 EXIF (相机型号 + 方向) 的 JPEG"""
+        exif = Image.Exif()
+        exif[0x0110] = 'TestCamera'
+        exif[0x0112] = 6  # 需要顺时针旋转 90°
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 100, 50)).save(buffer, 'JPEG', exif=exif)
+        return buffer.getvalue()
+
+    def upload(self, data, name='photo.jpg'):
+        file_obj = SimpleUploadedFile(name, data, content_type='image/jpeg')
+        return self.client.post(reverse('community:upload_image'), {'file[]': file_obj}).json()
+
+    def test_dedupe_and_strip_exif(self):
+        """测试：相同图片只存一份，保存的原图不含 EXIF 且已按方向旋正"""
+        data = self.make_jpeg()
+        first = self.upload(data, 'a.jpg')
+        second = self.upload(data, 'b.jpg')
+
+        self.assertEqual(first['code'], 0)
+        self.assertEqual(first['data']['succMap']['a.jpg'], second['data']['succMap']['b.jpg'])
+        self.assertEqual(UploadedImage.objects.count(), 1)
+
+        record = UploadedImage.objects.get()
+        with default_storage.open(record.file.name) as f:
+            saved = Image.open(f)
+            self.assertEqual(len(saved.getexif()), 0)
+            self.assertEqual(saved.size, (1200, 1600))
+
+    def test_reject_non_image(self):
+        """测试：扩展名是图片但内容不是图片时拒绝"""
+        result = self.upload(b'not an image', 'fake.png')
+        self.assertEqual(result['code'], 1)
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_reject_decompression_bomb(self):
+        """测试：像素数远超上限的图片 (解压炸弹) 按非法图片拒绝，而不是 500"""
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            result = self.upload(self.make_jpeg(size=(100, 100)), 'bomb.jpg')
+        self.assertEqual(result['code'], 1)
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_generate_variants(self):
+        """测试：后台任务生成不超过原图宽度的 WebP/JPEG 变体"""
+        self.upload(self.make_jpeg(size=(900, 700)))
+        record = UploadedImage.objects.get()
+        generate_image_variants(record.pk)
+
+        record.refresh_from_db()
+        self.assertEqual([v['width'] for v in record.variants], [320, 640])
+        for variant in record.variants:
+            self.assertTrue(default_storage.exists(variant['webp']))
+            self.assertTrue(default_storage.exists(variant['jpeg']))
+        self.assertIn('320w', record.srcset())
+
+
+class FeedServiceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader', email='reader@test.com')
+        self.author = User.objects.create_user(username='writer', email='writer@test.com')
+        self.star = User.objects.create_user(username='star', email='star@test.com')
+
+    def test_fanout_backfill_and_unfollow(self):
+        """测试：关注回填历史帖子，新帖写扩散，私密帖撤回，取消关注清理"""
+        old = Post.objects.create(title='旧帖', content='内容', author=self.author)
+        self.reader.following.add(self.author)
+        self.assertEqual(feed_service.get_page(self.reader)[0], [old.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new = Post.objects.create(title='新帖', content='内容', author=self.author)
+            Post.objects.create(title='私密', content='内容', author=self.author, visibility='private')
+        self.assertEqual(feed_service.get_page(self.reader)[0], [new.pk, old.pk])
+
+        new.visibility = 'private'
+        new.save()
+        self.assertEqual(feed_service.get_page(self.reader)[0], [old.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new.visibility = 'public'
+            new.save()
+        self.assertEqual(feed_service.get_page(self.reader)[0], [new.pk, old.pk])
+
+        self.reader.following.remove(self.author)
+        self.assertEqual(feed_service.get_page(self.reader)[0], [])
+
+    def test_edit_without_visibility_change_skips_fanout(self):
+        """测试：编辑公开帖的标题正文不会重新写扩散"""
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(title='新帖', content='内容', author=self.author)
+
+        with mock.patch('community.signals.dispatch_fanout') as dispatch, \
+                self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.get(pk=post.pk)
+            post.content = '改过的内容'
+            post.save()
+            Post.objects.create(title='又一篇', content='内容', author=self.author)
+        self.assertEqual(dispatch.call_count, 1)
+
+    def test_fanout_inline_when_broker_down(self):
+        """测试：Broker 不可用时不重试，发帖后直接在当前进程写扩散"""
+        from .tasks import fanout_post
+
+        self.reader.following.add(self.author)
+        with mock.patch.object(fanout_post, 'apply_async', side_effect=OSError('refused')) as apply_async, \
+                self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(title='新帖', content='内容', author=self.author)
+        self.assertFalse(apply_async.call_args.kwargs['retry'])
+        self.assertEqual(feed_service.get_page(self.reader)[0], [post.pk])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_celebrity_read_time_merge_and_keyset_pages(self):
+        """测试：大V 不写扩散、读取时合并，游标分页不重不漏"""
+        self.reader.following.add(self.star)
+        with self.captureOnCommitCallbacks(execute=True):
+            posts = [Post.objects.create(title=f'大V {i}', content='内容', author=self.star) for i in range(5)]
+        self.assertFalse(self.reader.feed_items.exists())
+
+        seen, cursor = [], None
+        while True:
+            ids, cursor = feed_service.get_page(self.reader, cursor, limit=2)
+            seen += ids
+            if not cursor:
+                break
+        self.assertEqual(seen, [p.pk for p in reversed(posts)])
+
+        response = self.client.get(reverse('community:feed'))
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('community:feed'))
+        self.assertEqual([p.pk for p in response.context['posts']], seen[:20])
@@ -0,0 +1,37 @@
+import re
+
+# 中日韩文字 (CJK 统一汉字及扩展 A、兼容汉字、日文假名、韩文音节)
+CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+
+# 分组 1：连续的 CJK 文字；分组 2：连续的其他字母/数字 (英文单词、数字、学号等)
+TOKEN_RE = re.compile(rf'([{CJK_CHARS}]+)|((?:(?![{CJK_CHARS}])[^\W_])+)')
+
+
+def tokenize(text):
+    """
+    CJK 二元切分 (bigram)
+    中文没有空格分词，按相邻两字切分：“机器学习” -> 机器 / 器学 / 学习，
+    任意两个字以上的子串都能命中，不依赖词典；单独出现的一个字保留为单字。
+    英文、数字按单词切分并转小写。
+    :return: 生成器，逐个产出 (token, 起始偏移, 结束偏移)
+    """
+    for match in TOKEN_RE.finditer(text or ''):
+        run = match.group(1)
+        if run:
+            start = match.start()
+            if len(run) == 1:
+                yield run, start, start + 1
+                continue
+            for i in range(len(run) - 1):
+                yield run[i:i + 2], start + i, start + i + 2
+        else:
+            yield match.group(2).lower(), match.start(), match.end()
+
+
+def segment(text):
+    """把文本切分成以空格分隔的词串，供 FTS5 (unicode61) 按空格再切一次"""
+    return ' '.join(token for token, _, _ in tokenize(text))
+
+
+def is_cjk(token):
+    return bool(token) and re.fullmatch(f'[{CJK_CHARS}]+', token) is not None
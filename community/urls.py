@@ -6,6 +6,9 @@ app_name = 'community'
 urlpatterns = [
     # 社区首页 (列表)
     path('', views.PostListView.as_view(), name='post_list'),
+
+    # 关注动态
+    path('feed/', views.feed, name='feed'),
     
     # 发布新帖
     path('create/', views.PostCreateView.as_view(), name='post_create'),
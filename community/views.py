@@ -4,14 +4,25 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
 from django.urls import reverse, reverse_lazy
-from django.db.models import Count, Q
+from django.db.models import Count, Prefetch
 from django.contrib import messages  # 👈 之前报错缺少的导入
 from django.http import HttpResponseForbidden
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from django.conf import settings
 import json
 from .models import Post, Comment, Tag, Collection
 from .forms import PostForm, CommentForm, CollectionForm
+from .services import interaction_service, image_upload_service, feed_service
+from notifications.services import notifier
+from . import fts
+from haystack.inputs import AutoQuery
+from haystack.query import SearchQuerySet
+from core.sqlite import retry_on_locked
+from core.utils import preserve_order
+
+# 关键词筛选时最多取回的索引命中数
+SEARCH_MAX_RESULTS = 500
 
 # ==================================================
 # 帖子相关视图
@@ -33,17 +44,38 @@ class PostListView(ListView):
         queryset = Post.objects.filter(visibility='public')\
             .select_related('author')\
             .prefetch_related('tags')\
-            .annotate(comment_count=Count('comments'))
+            .annotate(
+                comment_count=Count('comments', distinct=True),
+                like_count=Count('likes', distinct=True)
+            )
 
         # 2. 标签筛选
         tag_slug = self.request.GET.get('tag')
         if tag_slug:
             queryset = queryset.filter(tags__slug=tag_slug)
             
-        # 3. 关键词搜索 (仅搜索公开内容)
+        # 3. 关键词搜索 (仅搜索公开内容，走全文索引，不做 icontains 扫表)
+        # 多取一条用来判断命中数是否超过上限 (超过时页面提示结果已截断)
+        self.search_truncated = False
+        ranked_ids = None  # 全文检索按相关度返回的主键：有值时按它排序，而不是按时间
         query = self.request.GET.get('q')
         if query:
-            queryset = queryset.filter(Q(title__icontains=query) | Q(content__icontains=query))
+            if getattr(settings, 'COMMUNITY_SEARCH_BACKEND', 'whoosh') == 'fts5':
+                # SQLite FTS5：同时命中帖子正文和评论
+                post_ids = fts.search_posts(query, SEARCH_MAX_RESULTS + 1)
+                comment_hits = fts.search_comments(query, SEARCH_MAX_RESULTS + 1)
+                self.search_truncated = max(len(post_ids), len(comment_hits)) > SEARCH_MAX_RESULTS
+                # 按 bm25 排名：正文命中在前，只有评论命中的帖子在后
+                matched_ids = post_ids[:SEARCH_MAX_RESULTS]
+                matched_ids += [post_id for _, post_id in comment_hits[:SEARCH_MAX_RESULTS]]
+                ranked_ids = matched_ids
+            else:
+                matched_ids = list(SearchQuerySet().models(Post).filter(
+                    content=AutoQuery(query)
+                ).values_list('pk', flat=True)[:SEARCH_MAX_RESULTS + 1])
+                self.search_truncated = len(matched_ids) > SEARCH_MAX_RESULTS
+                matched_ids = ranked_ids = matched_ids[:SEARCH_MAX_RESULTS]
+            queryset = queryset.filter(pk__in=[int(pk) for pk in matched_ids])
             
         # 4. 时间筛选
         time_filter = self.request.GET.get('filter')
@@ -58,12 +90,16 @@ class PostListView(ListView):
             elif time_filter == 'month':
                 queryset = queryset.filter(created_at__gte=now - timedelta(days=30))
 
+        if ranked_ids is not None:
+            return preserve_order(queryset, ranked_ids)
         return queryset.order_by('-created_at')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['current_filter'] = self.request.GET.get('filter', 'all')
         context['search_query'] = self.request.GET.get('q', '')
+        context['search_truncated'] = self.search_truncated
+        context['search_max_results'] = SEARCH_MAX_RESULTS
         
         tag_slug = self.request.GET.get('tag')
         if tag_slug:
@@ -73,8 +109,37 @@ class PostListView(ListView):
                 pass
             
         context['all_tags'] = Tag.objects.all()
+
+        # 当前页帖子的点赞状态 (批量查询，用于卡片上的红心)
+        liked_post_ids = set()
+        if self.request.user.is_authenticated:
+            page_post_ids = [post.pk for post in context['posts']]
+            liked_post_ids = interaction_service.get_state(self.request.user, page_post_ids)['liked']
+        context['liked_post_ids'] = liked_post_ids
         return context
 
+@login_required
+def feed(request):
+    """关注动态：关注的人发布的公开帖子 (游标分页，?before=<游标> 加载更早的)"""
+    post_ids, next_cursor = feed_service.get_page(request.user, request.GET.get('before'))
+
+    posts_by_id = Post.objects.filter(pk__in=post_ids, visibility='public')\
+        .select_related('author')\
+        .prefetch_related('tags')\
+        .annotate(
+            comment_count=Count('comments', distinct=True),
+            like_count=Count('likes', distinct=True)
+        ).in_bulk()
+    posts = [posts_by_id[pk] for pk in post_ids if pk in posts_by_id]
+
+    context = {
+        'posts': posts,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('before'),
+        'liked_post_ids': interaction_service.get_state(request.user, post_ids)['liked'],
+    }
+    return render(request, 'community/feed.html', context)
+
 class PostCreateView(LoginRequiredMixin, CreateView):
     """发布帖子"""
     model = Post
@@ -118,7 +183,7 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return self.request.user == post.author or self.request.user.is_superuser
 
 def post_detail(request, pk):
-    post = get_object_or_404(Post, pk=pk)
+    post = get_object_or_404(Post.objects.select_related('author'), pk=pk)
     
     # 🛑 安全拦截：如果是私密贴，且当前用户不是作者，直接抛出 403 异常
     if post.visibility == 'private':
@@ -132,28 +197,25 @@ def post_detail(request, pk):
         post.save(update_fields=['views'])
         request.session[session_key] = True
 
-    # === 👇👇👇 修改开始：增加关注状态检查 👇👇👇 ===
+    # === 👇👇👇 修改开始：互动状态统一由 interaction_service 批量查询 (带缓存) 👇👇👇 ===
     is_liked = False
     is_collected = False
     is_following = False # 👈 新增变量
     user_collections = []
+    collected_ids = set()
 
     if request.user.is_authenticated:
-        # 1. 检查点赞
-        if post.likes.filter(id=request.user.id).exists():
-            is_liked = True
-        
-        # 2. 检查收藏
-        user_collections = request.user.collections.all()
-        if user_collections.filter(posts=post).exists():
-            is_collected = True
-
-        # 3. 检查关注 (包括好友自动互关的情况，因为好友也在 following 列表中)
-        # 只要作者在我的关注列表中，is_following 就为 True
-        if request.user != post.author:
-            if request.user.following.filter(id=post.author.id).exists():
-                is_following = True
-    # === 👆👆👆 修改结束 👆👆👆 ===
+        state = interaction_service.get_state(request.user, [post.pk], [post.author_id])
+        is_liked = post.pk in state['liked']
+        # 收藏夹 ID 集合，用于弹窗中回显勾选状态
+        collected_ids = state['collected'].get(post.pk, set())
+        is_collected = bool(collected_ids)
+        # 好友自动互关，也在 following 中
+        is_following = post.author_id in state['following']
+
+        # 弹窗中的收藏夹列表：一次查询带出篇数，避免模板里逐个 count
+        user_collections = request.user.collections.annotate(post_count=Count('posts'))
+    # === 👆👆👆 修改结束 👆👆👆
 
     # 处理评论提交
     if request.method == 'POST' and 'content' in request.POST:
@@ -190,10 +252,9 @@ def post_detail(request, pk):
             request.user.earn_rewards(coins=1, growth=5)
 
             # 发送通知
-            from notifications.models import Notification
             if notification_recipient and notification_recipient != request.user:
                 verb = 'reply' if parent_id else 'comment'
-                Notification.objects.create(
+                notifier.notify(
                     recipient=notification_recipient,
                     actor=request.user,
                     verb=verb,
@@ -205,16 +266,31 @@ def post_detail(request, pk):
     else:
         form = CommentForm()
 
-    comments = post.comments.filter(parent=None).order_by('-created_at')
+    # 评论区：作者、点赞数、楼中楼一次性带出，模板里不再逐条查询
+    comment_qs = Comment.objects.select_related('author').annotate(like_count=Count('likes'))
+    comments = comment_qs.filter(post=post, parent=None).order_by('-created_at').prefetch_related(
+        Prefetch('replies', queryset=comment_qs.order_by('created_at'))
+    )
+    liked_comment_ids = set()
+    if request.user.is_authenticated:
+        liked_comment_ids = set(Comment.likes.through.objects.filter(
+            customuser_id=request.user.pk, comment__post=post
+        ).values_list('comment_id', flat=True))
 
     context = {
         'post': post,
         'comments': comments,
+        'like_count': post.likes.count(),
+        'comment_count': post.comments.count(),
+        'liked_comment_ids': liked_comment_ids,
         'form': form,
         'is_liked': is_liked,
         'is_collected': is_collected, # 👈 传递给模板
         'is_following': is_following, # 👈 记得把这个传入 context
         'user_collections': user_collections,
+        'collected_ids': collected_ids,
+        # 正文图片的多尺寸 srcset (前端渲染 Markdown 后回填)
+        'image_srcsets': image_upload_service.srcset_map(post.content),
     }
     return render(request, 'community/post_detail.html', context)
 
@@ -224,6 +300,7 @@ def post_detail(request, pk):
 # ==================================================
 
 @login_required
+@retry_on_locked
 def like_post(request, pk):
     """点赞帖子"""
     post = get_object_or_404(Post, pk=pk)
@@ -241,19 +318,20 @@ def like_post(request, pk):
             else:
                 post.author.earn_rewards(coins=2, growth=10)
             
-            # 通知
-            from notifications.models import Notification
-            Notification.objects.create(
+            # 通知 (重复点赞/取消会合并为同一条)
+            notifier.notify(
                 recipient=post.author,
                 actor=request.user,
                 verb='like',
                 target_url=reverse('community:post_detail', args=[pk]),
                 content='赞了你的帖子'
             )
-        
+
+    interaction_service.invalidate(request.user)
     return redirect('community:post_detail', pk=pk)
 
 @login_required
+@retry_on_locked
 def like_comment(request, pk):
     """点赞评论"""
     comment = get_object_or_404(Comment, pk=pk)
@@ -268,6 +346,21 @@ def like_comment(request, pk):
             
     return redirect(reverse('community:post_detail', args=[comment.post.pk]) + f"#comment-{comment.id}")
 
+@retry_on_locked
+def toggle_default_collection(user, post):
+    """
+    把帖子加入 / 移出用户的默认收藏夹 (不存在时创建)
+    :return: (收藏夹, 是否为加入)。锁冲突时只重试这一段写入，提示消息不会重复添加
+    """
+    collection, created = Collection.objects.get_or_create(user=user, name="默认收藏夹")
+    if collection.posts.filter(pk=post.pk).exists():
+        collection.posts.remove(post)
+        return collection, False
+    collection.posts.add(post)
+    if post.author != user:
+        user.earn_rewards(coins=0, growth=2)
+    return collection, True
+
 @login_required
 def toggle_bookmark(request, pk):
     """
@@ -276,21 +369,13 @@ def toggle_bookmark(request, pk):
     """
     post = get_object_or_404(Post, pk=pk)
     
-    # 查找或创建默认收藏夹
-    collection, created = Collection.objects.get_or_create(
-        user=request.user,
-        name="默认收藏夹"
-    )
-    
-    if post in collection.posts.all():
-        collection.posts.remove(post)
-        messages.info(request, f"已从【{collection.name}】移除")
-    else:
-        collection.posts.add(post)
-        if post.author != request.user:
-            request.user.earn_rewards(coins=0, growth=2)
+    collection, added = toggle_default_collection(request.user, post)
+    if added:
         messages.success(request, f"已加入【{collection.name}】")
-        
+    else:
+        messages.info(request, f"已从【{collection.name}】移除")
+
+    interaction_service.invalidate(request.user)
     return redirect('community:post_detail', pk=pk)
 
 
@@ -304,7 +389,8 @@ def my_collections(request):
     查看和创建收藏夹
     """
     # 获取我的所有收藏夹
-    collections = request.user.collections.annotate(post_count=Count('posts')).order_by('-updated_at')
+    collections = request.user.collections.annotate(post_count=Count('posts')).order_by('-updated_at')\
+        .prefetch_related(Prefetch('posts', queryset=Post.objects.select_related('author')))
     
     if request.method == 'POST':
         form = CollectionForm(request.POST)
@@ -341,6 +427,7 @@ def delete_collection(request, pk):
     if request.method == 'POST':
         name = collection.name
         collection.delete()
+        interaction_service.invalidate(request.user)
         messages.success(request, f"收藏夹【{name}】已删除。")
         
     return redirect('community:my_collections')
@@ -373,6 +460,7 @@ def collect_post(request, pk):
                 if post in col.posts.all():
                     col.posts.remove(post)
         
+        interaction_service.invalidate(request.user)
         messages.success(request, "收藏状态已更新")
         
         # 🎉 奖励：首次收藏他人帖子
@@ -388,40 +476,27 @@ def collect_post(request, pk):
 
 @login_required
 def upload_image(request):
-    """Vditor 图片上传"""
+    """
+    Vditor 图片上传
+    同步完成校验、去重、去除 EXIF 后立即返回原图 URL，多尺寸变体由后台任务生成
+    """
     if request.method == 'POST' and request.FILES.get('file[]'):
         file_obj = request.FILES.get('file[]')
         
         if not file_obj.name.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp')):
             return JsonResponse({'msg': '仅支持图片文件', 'code': 1})
 
-        ext = file_obj.name.split('.')[-1]
-        import uuid
-        import time
-        import os
-        from django.conf import settings
-        
-        filename = f"{uuid.uuid4()}.{ext}"
-        date_path = time.strftime("%Y%m")
-        upload_dir = os.path.join(settings.MEDIA_ROOT, 'posts', date_path)
-        
-        if not os.path.exists(upload_dir):
-            os.makedirs(upload_dir)
-            
-        file_path = os.path.join(upload_dir, filename)
-        
-        with open(file_path, 'wb+') as f:
-            for chunk in file_obj.chunks():
-                f.write(chunk)
-                
-        url = f"{settings.MEDIA_URL}posts/{date_path}/{filename}"
-        
+        try:
+            image = image_upload_service.save_upload(file_obj, request.user)
+        except ValueError as e:
+            return JsonResponse({'msg': str(e), 'code': 1})
+
         return JsonResponse({
             "msg": "上传成功",
             "code": 0,
             "data": {
                 "errFiles": [],
-                "succMap": { file_obj.name: url }
+                "succMap": { file_obj.name: image.file.url }
             }
         })
         
@@ -474,6 +549,7 @@ def manage_collection_posts(request):
         else:
             return JsonResponse({'status': 'error', 'msg': '无效的操作'})
 
+        interaction_service.invalidate(request.user)
         return JsonResponse({'status': 'ok', 'msg': msg})
 
     except Exception as e:
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import ResearchTopic, Publication, LabClass # 👈 引入 LabClass
+from .models import ResearchTopic, Publication, LabClass, OutboundEmail # 👈 引入 LabClass
+from .services import mail_service
 from django.contrib.auth import get_user_model
 
 
@@ -31,4 +32,21 @@ class LabClassAdmin(admin.ModelAdmin):
         # 后台也强制过滤，只显示在读学生
         if db_field.name == "students":
             kwargs["queryset"] = User.objects.filter(status='student')
-        return super().formfield_for_manytomany(db_field, request, **kwargs)
\ No newline at end of file
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'category', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'category')
+    search_fields = ('subject', 'last_error')
+    readonly_fields = ('claimed_by', 'claimed_at', 'created_at', 'sent_at', 'last_error')
+    actions = ['retry_selected']
+
+    def recipients(self, obj):
+        return ', '.join(obj.to)
+    recipients.short_description = '收件人'
+
+    @admin.action(description='重新发送选中的邮件')
+    def retry_selected(self, request, queryset):
+        count = mail_service.retry(queryset)
+        self.message_user(request, f'{count} 封邮件已重新加入发送队列')
@@ -3,3 +3,13 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # 新建 SQLite 连接时应用 WAL / busy_timeout 等 PRAGMA
+        from django.db.backends.signals import connection_created
+
+        from .sqlite import configure_connection
+        connection_created.connect(configure_connection, dispatch_uid='core_sqlite_pragmas')
+
+        # 片段缓存失效信号
+        from . import signals  # noqa: F401
@@ -0,0 +1,258 @@
+"""
+共享缓存层
+
+多进程部署时 LocMemCache 每个进程各存一份，互相看不到对方写入的数据。
+ResilientCache 作为 settings.CACHES 的后端，把操作转发给共享的主后端 (Redis，与 Celery 共用实例)；
+主后端连不上时自动切到本机备用后端 (文件缓存，同机多进程共享)，RETRY_AFTER 秒后再尝试主后端。
+切换期间写过的 key 会被记下，主后端恢复后先从主后端删掉这些 key：
+否则故障前写入、永不过期的版本号 key 会在恢复后重新生效，故障期间的 bump 全部丢失。
+
+同时按 key 前缀统计 get 的命中 / 未命中次数，定期累加到共享缓存，
+由 core:cache_stats 汇总展示所有进程的命中率。
+
+    CACHES = {'default': {
+        'BACKEND': 'core.cache.ResilientCache',
+        'OPTIONS': {
+            'PRIMARY': {'BACKEND': '...RedisCache', 'LOCATION': 'redis://...'},
+            'FALLBACK': {'BACKEND': '...FileBasedCache', 'LOCATION': '/path/to/dir'},
+            'RETRY_AFTER': 30,
+        },
+    }}
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+try:
+    from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+    FAILOVER_ERRORS = (OSError, RedisConnectionError, RedisTimeoutError)
+except ImportError:  # 未安装 redis 时只会用到本机后端
+    FAILOVER_ERRORS = (OSError,)
+
+logger = logging.getLogger(__name__)
+
+STATS_PREFIX = 'cache_stats'
+_GROUP_SPLIT_RE = re.compile(r'[_:]')
+
+
+def key_group(key):
+    """
+    统计分组：取 key 开头不含数字的部分，最多两段
+    notification_counts_12 -> notification_counts，trends_python_weekly_1 -> trends_python
+    """
+    parts = []
+    for part in _GROUP_SPLIT_RE.split(str(key)):
+        if not part or any(ch.isdigit() for ch in part) or len(parts) == 2:
+            break
+        parts.append(part)
+    return '_'.join(parts) or 'other'
+
+
+def build_backend(conf):
+    conf = dict(conf)
+    return import_string(conf.pop('BACKEND'))(conf.pop('LOCATION', ''), conf)
+
+
+class CacheStats:
+    """
+    进程内命中计数，每 FLUSH_INTERVAL 秒把增量 incr 到共享缓存
+    (多个进程的数据在共享缓存里累加，看板读到的是全局命中率)
+    """
+    FLUSH_INTERVAL = 10
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._last_flush = time.monotonic()
+
+    def record(self, group, hits=0, misses=0):
+        with self._lock:
+            if hits:
+                self._pending[(group, 'hits')] += hits
+            if misses:
+                self._pending[(group, 'misses')] += misses
+
+    def due(self):
+        return time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL
+
+    def flush(self, backend):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+        if not pending:
+            return
+
+        groups_key = f'{STATS_PREFIX}:groups'
+        groups = set(backend.get(groups_key) or ())
+        new_groups = {group for group, _ in pending} - groups
+        if new_groups:
+            backend.set(groups_key, sorted(groups | new_groups), None)
+        for (group, kind), delta in pending.items():
+            key = f'{STATS_PREFIX}:{group}:{kind}'
+            if not backend.add(key, delta, None):
+                try:
+                    backend.incr(key, delta)
+                except ValueError:  # 恰好过期 / 被清空
+                    backend.set(key, delta, None)
+
+    def read(self, backend):
+        """:return: [{'group', 'hits', 'misses', 'hit_rate'}, ...] 按请求量倒序"""
+        groups = backend.get(f'{STATS_PREFIX}:groups') or []
+        keys = [f'{STATS_PREFIX}:{group}:{kind}' for group in groups for kind in ('hits', 'misses')]
+        values = backend.get_many(keys)
+        rows = []
+        for group in groups:
+            hits = values.get(f'{STATS_PREFIX}:{group}:hits', 0)
+            misses = values.get(f'{STATS_PREFIX}:{group}:misses', 0)
+            total = hits + misses
+            rows.append({
+                'group': group, 'hits': hits, 'misses': misses,
+                'hit_rate': round(hits / total, 3) if total else None,
+            })
+        return sorted(rows, key=lambda row: row['hits'] + row['misses'], reverse=True)
+
+
+_shared_state = {}
+
+
+class ResilientCache(BaseCache):
+    """主后端 + 本机备用后端，带命中统计的缓存后端 (见模块说明)"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.primary = build_backend(options['PRIMARY'])
+        self.fallback = build_backend(options['FALLBACK']) if options.get('FALLBACK') else None
+        self.retry_after = options.get('RETRY_AFTER', 30)
+        # Django 为每个线程单独实例化缓存后端，故障状态和统计按主后端地址在进程内共享
+        self._state = _shared_state.setdefault(options['PRIMARY'].get('LOCATION', ''), {
+            'down_until': 0.0, 'stats': CacheStats(),
+            # 切到备用后端期间写过的 (key, version)，主后端恢复后从主后端删除
+            'dirty': set(), 'dirty_lock': threading.Lock(),
+        })
+        self.stats = self._state['stats']
+
+    # ---------- 故障切换 ----------
+
+    @property
+    def using_fallback(self):
+        return self.fallback is not None and time.monotonic() < self._state['down_until']
+
+    @property
+    def active(self):
+        return self.fallback if self.using_fallback else self.primary
+
+    def _call(self, method, *args, written=(), **kwargs):
+        """written：本次操作会改写的 key (写在备用后端时记下，主后端恢复后失效)"""
+        if not self.using_fallback:
+            try:
+                if self._state['dirty']:
+                    self._invalidate_dirty()
+                return getattr(self.primary, method)(*args, **kwargs)
+            except FAILOVER_ERRORS as e:
+                if self.fallback is None:
+                    raise
+                self._state['down_until'] = time.monotonic() + self.retry_after
+                logger.warning('主缓存不可用，%s 秒内改用本机缓存 (pid=%s): %s', self.retry_after, os.getpid(), e)
+        if written:
+            version = kwargs.get('version')
+            with self._state['dirty_lock']:
+                self._state['dirty'].update((key, version) for key in written)
+        return getattr(self.fallback, method)(*args, **kwargs)
+
+    def _invalidate_dirty(self):
+        """主后端恢复：删掉故障期间只写进了备用后端的 key，下次读取时重新计算 / 初始化"""
+        with self._state['dirty_lock']:
+            dirty = set(self._state['dirty'])
+        by_version = {}
+        for key, version in dirty:
+            by_version.setdefault(version, []).append(key)
+        for version, keys in by_version.items():
+            self.primary.delete_many(keys, version=version)  # 失败时抛出，由 _call 重新切回备用后端
+        with self._state['dirty_lock']:
+            self._state['dirty'] -= dirty
+        logger.info('主缓存已恢复，失效故障期间写过的 %s 个 key (pid=%s)', len(dirty), os.getpid())
+
+    # ---------- 统计 ----------
+
+    def _record(self, hits_by_group, misses_by_group):
+        for group, n in hits_by_group.items():
+            self.stats.record(group, hits=n)
+        for group, n in misses_by_group.items():
+            self.stats.record(group, misses=n)
+        if self.stats.due():
+            self.flush_stats()
+
+    def flush_stats(self):
+        try:
+            self.stats.flush(self.active)
+        except FAILOVER_ERRORS:
+            pass  # 统计丢一轮不影响业务
+
+    def read_stats(self):
+        self.flush_stats()
+        return self.stats.read(self.active)
+
+    # ---------- 缓存接口 ----------
+
+    def get(self, key, default=None, version=None):
+        sentinel = object()
+        value = self._call('get', key, sentinel, version=version)
+        hit = value is not sentinel
+        self._record({key_group(key): 1} if hit else {}, {} if hit else {key_group(key): 1})
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self._call('get_many', keys, version=version)
+        self._record(
+            Counter(key_group(key) for key in keys if key in found),
+            Counter(key_group(key) for key in keys if key not in found),
+        )
+        return found
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('add', key, value, timeout=self._timeout(timeout), version=version, written=[key])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('set', key, value, timeout=self._timeout(timeout), version=version, written=[key])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('set_many', data, timeout=self._timeout(timeout), version=version, written=list(data))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call('touch', key, timeout=self._timeout(timeout), version=version, written=[key])
+
+    def delete(self, key, version=None):
+        return self._call('delete', key, version=version, written=[key])
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        return self._call('delete_many', keys, version=version, written=keys)
+
+    def has_key(self, key, version=None):
+        return self._call('has_key', key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._call('incr', key, delta, version=version, written=[key])
+
+    def decr(self, key, delta=1, version=None):
+        return self._call('decr', key, delta, version=version, written=[key])
+
+    def clear(self):
+        return self._call('clear')
+
+    def close(self, **kwargs):
+        self.primary.close(**kwargs)
+        if self.fallback is not None:
+            self.fallback.close(**kwargs)
+
+    def _timeout(self, timeout):
+        # 外层 TIMEOUT 为默认值，内层后端拿到的是具体秒数
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
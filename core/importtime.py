@@ -0,0 +1,86 @@
+"""
+进程启动的导入耗时剖析 (python -X importtime)
+
+在子进程里按 Web / Celery worker 的启动路径导入项目，解析 stderr 中每个模块的
+自身耗时 (self) 和累计耗时 (cumulative)，用于 manage.py profile_imports 和启动基准测试。
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import Counter, namedtuple
+
+from django.conf import settings
+
+# 只在首次使用时才导入的重依赖：启动路径上出现任何一个都说明有模块又在顶层导入了它
+DEFERRED_MODULES = (
+    'fitz',            # innovation_agent：解析 PDF
+    'openai',          # innovation_agent：调用大模型
+    'cryptography.fernet',  # innovation_agent：API Key 加解密
+    'numpy',           # npy_editor
+    'whoosh.index',    # Haystack Whoosh 后端：首次检索 / 索引模型保存时加载
+)
+
+# 各启动路径：子进程执行的代码 (结束时把已加载的 DEFERRED_MODULES 以 JSON 输出到 stdout)
+TARGETS = {
+    # Web worker：应用加载 + URLConf (所有视图模块)
+    'web': (
+        "import django; django.setup()\n"
+        "from django.urls import get_resolver; get_resolver().url_patterns\n"
+    ),
+    # Celery worker：应用加载 + 自动发现所有 tasks 模块
+    'celery': (
+        "from myweb.celery import app; app.loader.import_default_modules()\n"
+    ),
+}
+
+ImportRecord = namedtuple('ImportRecord', ['module', 'self_us', 'cumulative_us', 'depth'])
+
+
+def parse_importtime(output):
+    """
+    解析 -X importtime 的输出 (子模块先于父模块打印，缩进表示嵌套层级)
+    :return: [ImportRecord, ...]
+    """
+    records = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        module = name.strip()
+        depth = (len(name.rstrip()) - len(module) - 1) // 2
+        records.append(ImportRecord(module, int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def package_totals(records):
+    """按顶层包汇总自身耗时 (微秒)：{包名: 耗时}"""
+    totals = Counter()
+    for record in records:
+        totals[record.module.split('.')[0]] += record.self_us
+    return totals
+
+
+def profile_startup(target='web'):
+    """
+    在新的解释器里按 target 的启动路径导入项目
+    :return: {'records': [ImportRecord], 'total_ms': 导入总耗时, 'deferred_loaded': 已加载的重依赖}
+    """
+    code = TARGETS[target] + (
+        "import json, sys\n"
+        f"print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))\n"
+    )
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'myweb.settings')}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'{target} 启动失败:\n{result.stderr[-2000:]}')
+
+    records = parse_importtime(result.stderr)
+    return {
+        'records': records,
+        'total_ms': sum(record.cumulative_us for record in records if record.depth == 0) / 1000,
+        'deferred_loaded': json.loads(result.stdout.strip().splitlines()[-1]),
+    }
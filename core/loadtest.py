@@ -0,0 +1,288 @@
+"""
+全站压测工具 (manage.py loadtest)
+
+每个虚拟用户一个线程，用独立的 requests.Session 登录本地服务器后，
+按权重随机执行场景 (刷广场、看帖、点赞、私信收发、通知轮询、背单词、发布/结算任务)，
+记录每个接口的耗时，最后输出 P50/P95/P99 和吞吐量。
+
+压测账号由 seed_load_users() 在本地数据库中批量创建 (loadtest_<n>)，不依赖外网。
+"""
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from urllib.parse import urljoin
+
+import requests
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.utils import timezone
+
+User = get_user_model()
+
+LOAD_USER_PREFIX = 'loadtest_'
+DEFAULT_PASSWORD = 'loadtest-password'
+
+_CSRF_INPUT_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+# ---------- 造数据 ----------
+
+def seed_load_users(count, password=DEFAULT_PASSWORD, posts_per_user=5, words=500):
+    """
+    创建 / 补齐压测账号及其数据 (可重复执行)：
+    每个账号 posts_per_user 篇帖子，和相邻账号互为好友，单词表不足 words 条时补齐
+    :return: 压测账号列表
+    """
+    from community.models import Post
+    from user_app.models import Friendship
+    from vocabulary.models import Word
+
+    existing = set(User.objects.filter(username__startswith=LOAD_USER_PREFIX).values_list('username', flat=True))
+    hashed = make_password(password)  # 只算一次哈希
+    User.objects.bulk_create([
+        User(username=f'{LOAD_USER_PREFIX}{i}', email=f'{LOAD_USER_PREFIX}{i}@loadtest.local',
+             password=hashed, nickname=f'压测{i}', status='student', coins=100000)
+        for i in range(count) if f'{LOAD_USER_PREFIX}{i}' not in existing
+    ])
+    users = list(User.objects.filter(username__in=[f'{LOAD_USER_PREFIX}{i}' for i in range(count)]).order_by('id'))
+
+    with_posts = set(Post.objects.filter(author__in=users).values_list('author_id', flat=True))
+    Post.objects.bulk_create([
+        Post(author=user, title=f'压测帖子 {user.username}-{n}', content='压测内容 ' * 20)
+        for user in users if user.pk not in with_posts for n in range(posts_per_user)
+    ])
+
+    Friendship.objects.bulk_create([
+        Friendship(from_user=user, to_user=users[(i + 1) % len(users)], status='accepted')
+        for i, user in enumerate(users) if len(users) > 1
+    ], ignore_conflicts=True)
+
+    missing = words - Word.objects.filter(level='CET4').count()
+    if missing > 0:
+        Word.objects.bulk_create([
+            Word(word=f'loadword{i}', meaning=f'压测单词 {i}', level='CET4') for i in range(missing)
+        ])
+    return users
+
+
+# ---------- 统计 ----------
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+@dataclass
+class EndpointStats:
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self, duration):
+        values = sorted(self.latencies)
+        return {
+            'requests': len(values),
+            'errors': self.errors,
+            'rps': round(len(values) / duration, 2) if duration else 0,
+            'p50_ms': round(percentile(values, 50), 1),
+            'p95_ms': round(percentile(values, 95), 1),
+            'p99_ms': round(percentile(values, 99), 1),
+            'max_ms': round(values[-1], 1) if values else 0,
+        }
+
+
+class LoadStats:
+    """所有虚拟用户共享，按接口名汇总"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, name, elapsed_ms, ok):
+        with self._lock:
+            stats = self.endpoints.setdefault(name, EndpointStats())
+            stats.latencies.append(elapsed_ms)
+            if not ok:
+                stats.errors += 1
+
+    def report(self, duration):
+        rows = {name: stats.summary(duration) for name, stats in sorted(self.endpoints.items())}
+        all_stats = EndpointStats(
+            latencies=[v for s in self.endpoints.values() for v in s.latencies],
+            errors=sum(s.errors for s in self.endpoints.values()),
+        )
+        rows['TOTAL'] = all_stats.summary(duration)
+        return rows
+
+
+# ---------- 虚拟用户 ----------
+
+class VirtualUser:
+    """一个登录的浏览器会话，场景方法对应真实用户的一次操作"""
+
+    def __init__(self, base_url, user, password, friend, stats, timeout=30, seed=None):
+        self.base_url = base_url
+        self.user = user
+        self.password = password
+        self.friend = friend
+        self.stats = stats
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.rng = random.Random(seed)
+        self.last_message_id = 0
+        self.post_ids = []
+        self.max_page = 1
+        self.word_ids = []
+
+    # --- HTTP ---
+
+    def request(self, name, method, path, expect_redirect=False, **kwargs):
+        """
+        发请求并记录耗时；4xx/5xx 或网络异常计为错误
+        :param expect_redirect: 表单提交类请求，视图出错时会返回 200 重新渲染表单，只有 302 才算成功
+        """
+        headers = kwargs.pop('headers', {})
+        if method != 'GET':
+            headers['X-CSRFToken'] = self.session.cookies.get('csrftoken', '')
+            headers['Referer'] = self.base_url
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, urljoin(self.base_url, path), headers=headers,
+                timeout=self.timeout, allow_redirects=False, **kwargs
+            )
+        except requests.RequestException:
+            self.stats.record(name, (time.perf_counter() - start) * 1000, False)
+            return None
+        ok = response.status_code == 302 if expect_redirect else response.status_code < 400
+        self.stats.record(name, (time.perf_counter() - start) * 1000, ok)
+        return response
+
+    def login(self):
+        """登录不计入统计 (PBKDF2 哈希本身就要几百毫秒，会淹没业务接口的数据)"""
+        try:
+            page = self.session.get(urljoin(self.base_url, '/users/login/'), timeout=self.timeout)
+            match = _CSRF_INPUT_RE.search(page.text)
+            response = self.session.post(urljoin(self.base_url, '/users/login/'), data={
+                'csrfmiddlewaretoken': match.group(1) if match else '',
+                'username': self.user.username,
+                'password': self.password,
+            }, headers={'Referer': self.base_url}, timeout=self.timeout, allow_redirects=False)
+        except requests.RequestException:
+            return False
+        return response.status_code == 302
+
+    # --- 场景 ---
+
+    def browse_feed(self):
+        # 在已见过的分页范围内随机翻页
+        response = self.request('post_list', 'GET', f'/community/?page={self.rng.randint(1, self.max_page)}')
+        if response is not None and response.ok:
+            self.post_ids = [int(pk) for pk in re.findall(r'/community/post/(\d+)/', response.text)] or self.post_ids
+            self.max_page = max([int(n) for n in re.findall(r'[?&]page=(\d+)', response.text)] + [self.max_page])
+        self.request('feed', 'GET', '/community/feed/')
+
+    def read_post(self):
+        if not self.post_ids:
+            return self.browse_feed()
+        self.request('post_detail', 'GET', f'/community/post/{self.rng.choice(self.post_ids)}/')
+
+    def like_post(self):
+        if not self.post_ids:
+            return self.browse_feed()
+        self.request('like_post', 'POST', f'/community/post/{self.rng.choice(self.post_ids)}/like/')
+
+    def chat_send(self):
+        self.request('chat_send', 'POST', f'/messages/chat/{self.friend.pk}/',
+                     data={'content': f'压测消息 {time.time():.3f}'},
+                     headers={'X-Requested-With': 'XMLHttpRequest'})
+
+    def chat_poll(self):
+        response = self.request('chat_poll', 'GET',
+                                f'/messages/api/get-new/{self.friend.pk}/?last_id={self.last_message_id}')
+        if response is not None and response.ok:
+            ids = [m['id'] for m in response.json().get('messages', [])]
+            self.last_message_id = max(ids + [self.last_message_id])
+
+    def notification_poll(self):
+        self.request('notification_poll', 'GET', '/notifications/api/unread-count/')
+
+    def vocab_practice(self):
+        if not self.word_ids:
+            response = self.request('vocab_words', 'GET', '/vocab/api/words/?level=CET4&count=10&mode=learn')
+            if response is not None and response.ok:
+                self.word_ids = [w['id'] for w in response.json().get('data', [])]
+        if self.word_ids:
+            self.request('vocab_submit', 'POST', '/vocab/api/submit/', json={
+                'word_id': self.word_ids.pop(), 'is_correct': self.rng.random() < 0.7,
+            })
+
+    def task_create_settle(self):
+        from tasks.models import Task
+
+        deadline = timezone.localtime(timezone.now() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M')
+        self.request('task_create', 'POST', '/tasks/create/', data={
+            'title': f'压测任务 {time.time():.3f}', 'content': '压测', 'bounty': 1,
+            'deadline': deadline, 'task_type': 'bounty', 'invitees': [self.friend.pk],
+        }, expect_redirect=True)
+        # 结算自己最近一个未结束的任务 (本地库，直接查 ID)
+        task_id = Task.objects.filter(creator=self.user).exclude(status='closed')\
+            .order_by('-id').values_list('id', flat=True).first()
+        if task_id:
+            self.request('task_settle', 'POST', f'/tasks/{task_id}/settle/', data={'winner_id': self.friend.pk},
+                         expect_redirect=True)
+
+
+# 场景权重：模拟上课时全班同时在线 (轮询类请求占大头)
+SCENARIO_WEIGHTS = {
+    'browse_feed': 15,
+    'read_post': 15,
+    'like_post': 5,
+    'chat_send': 8,
+    'chat_poll': 20,
+    'notification_poll': 25,
+    'vocab_practice': 10,
+    'task_create_settle': 2,
+}
+
+
+def run_load(base_url, users, password, duration, think_time=0.0, weights=None, stats=None):
+    """
+    每个账号一个线程：全部登录完成后同时开始，持续 duration 秒
+    :return: (LoadStats, 实际压测秒数, 登录失败的账号数)
+    """
+    weights = weights or SCENARIO_WEIGHTS
+    names, values = list(weights), list(weights.values())
+    stats = stats or LoadStats()
+    window = {}
+    # 最后一个线程登录完成时记下起止时间，所有线程同时起跑
+    ready = threading.Barrier(len(users), action=lambda: window.update(
+        start=time.monotonic(), deadline=time.monotonic() + duration
+    ))
+    failed_logins = []
+
+    def worker(index):
+        vu = VirtualUser(base_url, users[index], password, users[(index + 1) % len(users)], stats, seed=index)
+        logged_in = vu.login()
+        if not logged_in:
+            failed_logins.append(vu.user.username)
+        ready.wait()
+        try:
+            while logged_in and time.monotonic() < window['deadline']:
+                getattr(vu, vu.rng.choices(names, values)[0])()
+                if think_time:
+                    time.sleep(vu.rng.uniform(0, think_time * 2))
+        finally:
+            connections.close_all()  # 任务场景在本线程查过库，线程结束前关闭连接
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(len(users))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.monotonic() - window['start'], len(failed_logins)
@@ -0,0 +1,127 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.loadtest import percentile
+from core.sqlite import DEFAULT_PRAGMAS, apply_pragmas, is_locked_error
+
+# 对比的两套配置：调优前 (Django 默认：回滚日志、DEFERRED 事务、sqlite3 默认 5 秒等待) / 调优后
+MODES = {
+    'default': {'pragmas': {}, 'begin': 'BEGIN'},
+    'tuned': {'pragmas': None, 'begin': 'BEGIN IMMEDIATE'},  # None = settings.SQLITE_PRAGMAS
+}
+
+
+class Command(BaseCommand):
+    help = '并发读写压测：对比 SQLite 默认配置与 WAL / busy_timeout / IMMEDIATE 事务下的吞吐量和锁冲突'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='读线程数')
+        parser.add_argument('--writers', type=int, default=4, help='写线程数')
+        parser.add_argument('--duration', type=float, default=5, help='每种配置的压测秒数')
+        parser.add_argument('--rows', type=int, default=20000, help='预置行数')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"读 {options['readers']} 线程 / 写 {options['writers']} 线程，每种配置 {options['duration']} 秒\n"
+        )
+        header = f"{'配置':<10}{'读 ops/s':>10}{'读 P95':>9}{'写 ops/s':>10}{'写 P95':>9}{'锁冲突':>8}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for mode, conf in MODES.items():
+            pragmas = conf['pragmas'] if conf['pragmas'] is not None else getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+            result = self.run_mode(pragmas, conf['begin'], options)
+            self.stdout.write(
+                f"{mode:<10}{result['read_rps']:>10}{result['read_p95']:>9}"
+                f"{result['write_rps']:>10}{result['write_p95']:>9}{result['locked']:>8}"
+            )
+        self.stdout.write('(延迟单位 ms；锁冲突 = 因 database is locked 失败的写事务数)')
+
+    def run_mode(self, pragmas, begin, options):
+        tmp_dir = tempfile.mkdtemp(prefix='bench_sqlite_')
+        path = os.path.join(tmp_dir, 'bench.sqlite3')
+        self.prepare(path, pragmas, options['rows'])
+
+        latencies = {'read': [], 'write': []}
+        locked = []
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        def connect():
+            db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+            apply_pragmas(db, pragmas)
+            return db
+
+        def reader(seed):
+            db, rng, samples = connect(), random.Random(seed), []
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                low = rng.randint(1, options['rows'] - 50)
+                db.execute('SELECT id, counter, body FROM item WHERE id BETWEEN ? AND ?', (low, low + 50)).fetchall()
+                db.execute('SELECT COUNT(*) FROM event WHERE item_id = ?', (low,)).fetchone()
+                samples.append((time.perf_counter() - start) * 1000)
+            db.close()
+            with lock:
+                latencies['read'].extend(samples)
+
+        def writer(seed):
+            # 模拟点赞：先读再写 (DEFERRED 事务在这里升级锁)
+            db, rng, samples, failures = connect(), random.Random(seed), [], 0
+            while time.monotonic() < deadline:
+                item_id = rng.randint(1, options['rows'])
+                start = time.perf_counter()
+                try:
+                    db.execute(begin)
+                    db.execute('SELECT counter FROM item WHERE id = ?', (item_id,)).fetchone()
+                    db.execute('UPDATE item SET counter = counter + 1 WHERE id = ?', (item_id,))
+                    db.execute('INSERT INTO event (item_id, created_at) VALUES (?, ?)', (item_id, time.time()))
+                    db.execute('COMMIT')
+                    samples.append((time.perf_counter() - start) * 1000)
+                except sqlite3.OperationalError as e:
+                    if not is_locked_error(e):
+                        raise
+                    failures += 1
+                    if db.in_transaction:
+                        db.execute('ROLLBACK')
+            db.close()
+            with lock:
+                latencies['write'].extend(samples)
+                locked.append(failures)
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, name))
+        os.rmdir(tmp_dir)
+
+        reads, writes = sorted(latencies['read']), sorted(latencies['write'])
+        return {
+            'read_rps': round(len(reads) / options['duration']),
+            'read_p95': round(percentile(reads, 95), 2),
+            'write_rps': round(len(writes) / options['duration']),
+            'write_p95': round(percentile(writes, 95), 2),
+            'locked': sum(locked),
+        }
+
+    def prepare(self, path, pragmas, rows):
+        db = sqlite3.connect(path, isolation_level=None)
+        apply_pragmas(db, pragmas)
+        db.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, counter INTEGER NOT NULL, body TEXT NOT NULL)')
+        db.execute('CREATE TABLE event (id INTEGER PRIMARY KEY, item_id INTEGER NOT NULL, created_at REAL NOT NULL)')
+        db.execute('CREATE INDEX event_item_idx ON event (item_id)')
+        db.execute('BEGIN')
+        db.executemany('INSERT INTO item (id, counter, body) VALUES (?, 0, ?)',
+                       ((i, '内容 ' * 20) for i in range(1, rows + 1)))
+        db.execute('COMMIT')
+        db.close()
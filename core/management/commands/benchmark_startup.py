@@ -0,0 +1,161 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadtest import percentile
+from myweb.serving import thread_count, worker_count
+
+# 各部署方式的启动命令和额外环境变量
+MODES = {
+    'runserver': {
+        'cmd': lambda port: [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload'],
+        'env': {'DJANGO_DEBUG': 'true'},
+    },
+    'wsgi': {
+        'cmd': lambda port: [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}'],
+        'env': {'SERVER_MODE': 'wsgi', 'DJANGO_DEBUG': 'false'},
+    },
+    'asgi': {
+        'cmd': lambda port: [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}'],
+        'env': {'SERVER_MODE': 'asgi', 'DJANGO_DEBUG': 'false'},
+    },
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = '对比 runserver 与 gunicorn (WSGI gthread / ASGI uvicorn) 的启动耗时、页面和静态文件吞吐量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default=','.join(MODES), help='要对比的部署方式 (逗号分隔)')
+        parser.add_argument('--requests', type=int, default=300, help='每个地址的请求数')
+        parser.add_argument('--concurrency', type=int, default=8, help='并发客户端线程数')
+        parser.add_argument('--page', default='/users/login/', help='被测页面 (无需登录)')
+        parser.add_argument('--static', default='/static/admin/css/base.css', help='被测静态文件')
+        parser.add_argument('--startup-timeout', type=float, default=60, help='等待服务器就绪的最长秒数')
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f'未知部署方式: {", ".join(sorted(unknown))}')
+
+        if {'wsgi', 'asgi'} & set(modes):
+            # manifest 存储需要先收集；计时只算服务器本身的启动
+            subprocess.run([sys.executable, 'manage.py', 'collectstatic', '--noinput', '-v', '0'],
+                           cwd=settings.BASE_DIR, env=self.child_env({'DJANGO_DEBUG': 'false'}), check=True)
+
+        self.stdout.write(
+            f"每个地址 {options['requests']} 次请求，{options['concurrency']} 并发；"
+            f"gunicorn 进程数 asgi={worker_count('asgi')} / wsgi={worker_count('wsgi')}×{thread_count('wsgi')} 线程\n"
+        )
+        header = f"{'方式':<11}{'启动 s':>8}{'页面 RPS':>10}{'页面 P95':>10}{'静态 RPS':>10}{'静态 P95':>10}{'错误':>6}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for mode in modes:
+            result = self.run_mode(mode, options)
+            self.stdout.write(
+                f"{mode:<11}{result['startup']:>8}{result['page_rps']:>10}{result['page_p95']:>10}"
+                f"{result['static_rps']:>10}{result['static_p95']:>10}{result['errors']:>6}"
+            )
+        self.stdout.write('(启动 = 进程启动到首个 200 响应；延迟单位 ms)')
+
+    def child_env(self, extra):
+        """子进程环境：沿用当前 settings 模块 (可以是测试 / 开发用的配置)"""
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'myweb.settings')}
+        env.update(extra)
+        return env
+
+    def run_mode(self, mode, options):
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        env = {**MODES[mode]['env'], 'COLLECTSTATIC_ON_START': 'false', 'GUNICORN_ACCESS_LOG': ''}
+        log = tempfile.TemporaryFile()
+
+        started = time.perf_counter()
+        process = subprocess.Popen(MODES[mode]['cmd'](port), cwd=settings.BASE_DIR, env=self.child_env(env),
+                                   stdout=log, stderr=subprocess.STDOUT)
+        try:
+            startup = self.wait_ready(base_url + options['page'], process, started, options['startup_timeout'])
+            if startup is None:
+                log.seek(0)
+                raise CommandError(f'{mode} 启动失败:\n{log.read().decode(errors="replace")[-2000:]}')
+
+            page = self.hammer(base_url + options['page'], options)
+            static = self.hammer(base_url + options['static'], options)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+
+        return {
+            'startup': round(startup, 2),
+            'page_rps': page['rps'], 'page_p95': page['p95'],
+            'static_rps': static['rps'], 'static_p95': static['p95'],
+            'errors': page['errors'] + static['errors'],
+        }
+
+    def wait_ready(self, url, process, started, timeout):
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                return None
+            try:
+                if requests.get(url, timeout=2).status_code == 200:
+                    return time.perf_counter() - started
+            except requests.RequestException:
+                pass
+            time.sleep(0.05)
+        return None
+
+    def hammer(self, url, options):
+        """concurrency 个线程各自复用一个 Session (keep-alive)，共发 requests 次"""
+        latencies, errors = [], []
+        lock = threading.Lock()
+        per_thread = max(options['requests'] // options['concurrency'], 1)
+
+        def client(_):
+            session, samples, failures = requests.Session(), [], 0
+            for _ in range(per_thread):
+                start = time.perf_counter()
+                try:
+                    ok = session.get(url, timeout=30).status_code == 200
+                except requests.RequestException:
+                    ok = False
+                if ok:
+                    samples.append((time.perf_counter() - start) * 1000)
+                else:
+                    failures += 1
+            session.close()
+            with lock:
+                latencies.extend(samples)
+                errors.append(failures)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            list(pool.map(client, range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'rps': round(len(latencies) / elapsed),
+            'p95': round(percentile(latencies, 95), 1),
+            'errors': sum(errors),
+        }
+
@@ -0,0 +1,61 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadtest import DEFAULT_PASSWORD, LOAD_USER_PREFIX, SCENARIO_WEIGHTS, run_load, seed_load_users
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = '对本地运行中的服务器做混合场景压测，输出各接口 P50/P95/P99 延迟和吞吐量'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8218', help='被测服务器地址')
+        parser.add_argument('--users', type=int, default=20, help='并发虚拟用户数 (每个一个线程)')
+        parser.add_argument('--duration', type=float, default=30, help='压测时长 (秒)')
+        parser.add_argument('--think-time', type=float, default=0.0, help='两次操作间的平均停顿 (秒)')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='压测账号密码')
+        parser.add_argument('--seed', action='store_true', help='先在本地库中创建 / 补齐压测账号和数据')
+        parser.add_argument('--only', default='', help=f'只跑指定场景 (逗号分隔): {", ".join(SCENARIO_WEIGHTS)}')
+        parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+
+    def handle(self, *args, **options):
+        weights = SCENARIO_WEIGHTS
+        if options['only']:
+            names = [name.strip() for name in options['only'].split(',') if name.strip()]
+            unknown = set(names) - set(SCENARIO_WEIGHTS)
+            if unknown:
+                raise CommandError(f'未知场景: {", ".join(sorted(unknown))}')
+            weights = {name: SCENARIO_WEIGHTS[name] for name in names}
+
+        if options['seed']:
+            users = seed_load_users(options['users'], password=options['password'])
+        else:
+            users = list(User.objects.filter(username__startswith=LOAD_USER_PREFIX).order_by('id')[:options['users']])
+        if len(users) < 2:
+            raise CommandError('压测账号不足，请加 --seed 先创建')
+
+        self.stdout.write(f'🚀 {len(users)} 个虚拟用户压测 {options["base_url"]}，持续 {options["duration"]} 秒 ...')
+        stats, elapsed, failed_logins = run_load(
+            options['base_url'], users, options['password'], options['duration'],
+            think_time=options['think_time'], weights=weights,
+        )
+        if failed_logins:
+            self.stderr.write(self.style.WARNING(f'⚠️ {failed_logins} 个账号登录失败'))
+
+        report = stats.report(elapsed)
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+
+        header = f"{'接口':<20}{'请求数':>8}{'错误':>6}{'RPS':>9}{'P50':>9}{'P95':>9}{'P99':>9}{'MAX':>9}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, row in report.items():
+            self.stdout.write(
+                f"{name:<20}{row['requests']:>8}{row['errors']:>6}{row['rps']:>9}"
+                f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}"
+            )
+        self.stdout.write(f'(延迟单位 ms，实际耗时 {elapsed:.1f} 秒)')
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importtime import DEFERRED_MODULES, TARGETS, package_totals, profile_startup
+
+
+class Command(BaseCommand):
+    help = '用 python -X importtime 剖析 Web / Celery worker 启动时各模块的导入耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default='web', help=f'启动路径 ({" / ".join(TARGETS)})')
+        parser.add_argument('--limit', type=int, default=20, help='列出耗时最多的前 N 项')
+        parser.add_argument('--min-ms', type=float, default=1.0, help='忽略累计耗时低于该值的模块')
+
+    def handle(self, *args, **options):
+        target = options['target']
+        if target not in TARGETS:
+            raise CommandError(f'未知启动路径: {target}')
+
+        try:
+            result = profile_startup(target)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        records, limit = result['records'], options['limit']
+
+        self.stdout.write(f"启动路径 {target}：导入 {len(records)} 个模块，共 {result['total_ms']:.0f} ms\n")
+
+        # 1. 模块累计耗时 (含其导入的子模块)
+        header = f"{'累计 ms':>9}{'自身 ms':>9}  模块"
+        self.stdout.write(header)
+        self.stdout.write('-' * 60)
+        heaviest = sorted(
+            (record for record in records if record.cumulative_us >= options['min_ms'] * 1000),
+            key=lambda record: record.cumulative_us, reverse=True,
+        )[:limit]
+        for record in heaviest:
+            self.stdout.write(
+                f"{record.cumulative_us / 1000:>9.1f}{record.self_us / 1000:>9.1f}  {record.module}"
+            )
+
+        # 2. 按顶层包汇总自身耗时
+        self.stdout.write(f"\n{'自身 ms':>9}  顶层包")
+        self.stdout.write('-' * 60)
+        for package, self_us in package_totals(records).most_common(limit):
+            self.stdout.write(f"{self_us / 1000:>9.1f}  {package}")
+
+        # 3. 应当延迟导入的重依赖
+        self.stdout.write('\n延迟导入的重依赖：')
+        for module in DEFERRED_MODULES:
+            if module in result['deferred_loaded']:
+                self.stdout.write(self.style.ERROR(f"  ✗ {module} 在启动时已被导入"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"  ✓ {module}"))
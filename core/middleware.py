@@ -0,0 +1,54 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+
+from .profiling import QueryRecorder, profile_buffer
+
+logger = logging.getLogger('core.profiling')
+
+
+class QueryProfilerMiddleware:
+    """
+    记录每个请求的 SQL 条数、SQL 耗时、重复查询和总耗时
+    - 写入环形缓冲区，员工可在 core:query_profile 查看按视图的汇总
+    - 每个请求一条 JSON 日志；同一条 SQL 重复达到 QUERY_PROFILER_N_PLUS_ONE_THRESHOLD 次时记 WARNING (疑似 N+1)
+    放在 MIDDLEWARE 最前面，耗时包含会话 / 认证等其它中间件
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_PROFILER_ENABLED', False):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with recorder.record_on_all_connections():
+            response = self.get_response(request)
+        wall_time = time.perf_counter() - start
+
+        threshold = getattr(settings, 'QUERY_PROFILER_N_PLUS_ONE_THRESHOLD', 10)
+        duplicates = recorder.duplicates()
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'time': time.time(),
+            'method': request.method,
+            'path': request.path,
+            'view': (match.view_name or match.route) if match else request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'sql_ms': round(recorder.sql_time * 1000, 2),
+            'wall_ms': round(wall_time * 1000, 2),
+            'duplicates': [{'count': n, 'sql': sql[:300]} for n, sql in duplicates[:5]],
+            'n_plus_one': bool(duplicates) and duplicates[0][0] >= threshold,
+        }
+        profile_buffer.append(record)
+
+        if record['n_plus_one']:
+            logger.warning('疑似 N+1 查询 %s', json.dumps(record, ensure_ascii=False))
+        elif logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(record, ensure_ascii=False))
+        return response
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_labclass'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, help_text='activation / welcome / friend_request 等', max_length=30, verbose_name='类型')),
+                ('subject', models.CharField(max_length=255, verbose_name='主题')),
+                ('body', models.TextField(verbose_name='正文')),
+                ('from_email', models.CharField(blank=True, help_text='留空使用 DEFAULT_FROM_EMAIL', max_length=254, verbose_name='发件人')),
+                ('to', models.JSONField(verbose_name='收件人')),
+                ('priority', models.PositiveSmallIntegerField(default=5, verbose_name='优先级')),
+                ('status', models.CharField(choices=[('pending', '待发送'), ('sending', '发送中'), ('sent', '已发送'), ('failed', '发送失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='尝试次数')),
+                ('last_error', models.TextField(blank=True, verbose_name='最近一次错误')),
+                ('send_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='最早发送时间')),
+                ('claimed_by', models.CharField(blank=True, max_length=32, verbose_name='发送批次')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='领取时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='发送时间')),
+            ],
+            options={
+                'verbose_name': '邮件发件箱',
+                'verbose_name_plural': '邮件发件箱',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['status', 'send_after'], name='outbox_status_due_idx')],
+            },
+        ),
+    ]
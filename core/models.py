@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 User = settings.AUTH_USER_MODEL
@@ -64,4 +65,44 @@ class LabClass(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"{self.name} (导师: {self.mentor.nickname or self.mentor.username})"
\ No newline at end of file
+        return f"{self.name} (导师: {self.mentor.nickname or self.mentor.username})"
+
+# 👇👇👇 新增：邮件发件箱 (系统邮件先入库，由 Celery mail 队列复用 SMTP 连接批量发送) 👇👇👇
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = (
+        ('pending', '待发送'),
+        ('sending', '发送中'),
+        ('sent', '已发送'),
+        ('failed', '发送失败'),
+    )
+    # 数值越小越先发：激活邮件不排在批量邀请后面
+    PRIORITY_HIGH = 0
+    PRIORITY_NORMAL = 5
+    PRIORITY_LOW = 9
+
+    category = models.CharField('类型', max_length=30, blank=True, help_text="activation / welcome / friend_request 等")
+    subject = models.CharField('主题', max_length=255)
+    body = models.TextField('正文')
+    from_email = models.CharField('发件人', max_length=254, blank=True, help_text="留空使用 DEFAULT_FROM_EMAIL")
+    to = models.JSONField('收件人')
+    priority = models.PositiveSmallIntegerField('优先级', default=PRIORITY_NORMAL)
+    status = models.CharField('状态', max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField('尝试次数', default=0)
+    last_error = models.TextField('最近一次错误', blank=True)
+    send_after = models.DateTimeField('最早发送时间', default=timezone.now)  # 失败后按退避时间推迟
+    claimed_by = models.CharField('发送批次', max_length=32, blank=True)
+    claimed_at = models.DateTimeField('领取时间', null=True, blank=True)
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    sent_at = models.DateTimeField('发送时间', null=True, blank=True)
+
+    class Meta:
+        verbose_name = '邮件发件箱'
+        verbose_name_plural = verbose_name
+        ordering = ['-id']
+        indexes = [
+            # 发送任务按 status='pending' AND send_after <= now 领取
+            models.Index(fields=['status', 'send_after'], name='outbox_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.get_status_display()})"
@@ -0,0 +1,105 @@
+"""
+请求级 SQL 剖析
+
+QueryRecorder 通过 connection.execute_wrapper 挂在每个数据库连接上，记录一次请求内：
+- 查询条数、SQL 总耗时
+- 重复查询指纹 (把字面量替换成 ? 后相同的 SQL)，同一指纹出现多次通常就是 N+1
+
+结果写入进程内的环形缓冲区 (最近 QUERY_PROFILER_BUFFER_SIZE 条请求)，
+由 core:query_profile 按视图汇总展示；每条记录同时以 JSON 写入日志。
+"""
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+# 指纹归一化：字符串 / 数字字面量 -> ?，IN (?, ?, ...) -> IN (...)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN \((?:\s*(?:\?|%s|NULL)\s*,?)+\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """一次请求内的 SQL 统计，作为 execute_wrapper 使用"""
+
+    def __init__(self):
+        self.count = 0
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def record_on_all_connections(self):
+        """返回上下文管理器：范围内所有数据库连接的查询都会被记录"""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+    def duplicates(self, min_count=2):
+        """重复出现的查询指纹 [(次数, SQL), ...]，按次数倒序"""
+        return [(n, sql) for sql, n in self.fingerprints.most_common() if n >= min_count]
+
+
+class ProfileBuffer:
+    """进程内环形缓冲区，保存最近的请求剖析记录"""
+
+    def __init__(self, maxlen=None):
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=maxlen or getattr(settings, 'QUERY_PROFILER_BUFFER_SIZE', 500))
+
+    def append(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def summary(self):
+        """按视图汇总：请求数、平均 / 最大查询数、平均 SQL 耗时、平均 / P95 总耗时、N+1 告警次数"""
+        by_view = {}
+        for record in self.records():
+            by_view.setdefault(record['view'], []).append(record)
+
+        rows = []
+        for view, records in by_view.items():
+            walls = sorted(r['wall_ms'] for r in records)
+            queries = [r['queries'] for r in records]
+            rows.append({
+                'view': view,
+                'requests': len(records),
+                'avg_queries': round(sum(queries) / len(records), 1),
+                'max_queries': max(queries),
+                'avg_sql_ms': round(sum(r['sql_ms'] for r in records) / len(records), 2),
+                'avg_wall_ms': round(sum(walls) / len(records), 2),
+                'p95_wall_ms': walls[min(len(walls) - 1, int(len(walls) * 0.95))],
+                'n_plus_one': sum(1 for r in records if r['n_plus_one']),
+            })
+        return sorted(rows, key=lambda row: row['avg_queries'], reverse=True)
+
+
+profile_buffer = ProfileBuffer()
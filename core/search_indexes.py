@@ -0,0 +1,18 @@
+from haystack import indexes
+from whoosh.analysis import KeywordAnalyzer
+from community.analyzers import get_text_analyzer
+from .models import Publication
+
+class PublicationIndex(indexes.SearchIndex, indexes.Indexable):
+    text = indexes.CharField(document=True, use_template=True, analyzer=get_text_analyzer())
+    year = indexes.IntegerField(model_attr='year')
+    # 统一搜索的分类 (用于分面统计)，不分词、不做词干化
+    category = indexes.CharField(default='publication', analyzer=KeywordAnalyzer())
+
+    indexed_model_fields = ('title', 'authors', 'venue', 'year')
+
+    def get_model(self):
+        return Publication
+
+    def index_queryset(self, using=None):
+        return self.get_model().objects.all()
@@ -0,0 +1,222 @@
+import logging
+import random
+import smtplib
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def is_permanent_error(exc):
+    """5xx 响应 (收件人不存在、内容被拒等)：重试也不会成功；认证失败属于配置问题，在建连时整批推迟"""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException) and not isinstance(exc, smtplib.SMTPAuthenticationError):
+        return exc.smtp_code >= 500
+    return False
+
+
+class MailQueueService:
+    """
+    系统邮件的唯一出口 (替代请求内同步 send_mail / 每封邮件一个线程)
+
+    1. enqueue()：写入 OutboundEmail 发件箱，事务提交后投递 Celery mail 队列，请求不等待 SMTP；
+    2. send_batch()：按优先级领取一批到期邮件，复用同一个 SMTP 连接逐封发送，按 MAIL_RATE_PER_SECOND 限速；
+    3. 重试：临时错误按指数退避推迟 send_after，5xx 永久错误或超过 MAIL_MAX_ATTEMPTS 次标记为 failed，
+       后台 "邮件发件箱" 可以查看错误并重新发送。
+    """
+
+    STALE_CLAIM_SECONDS = 600  # 领取后超过该时间仍是"发送中" (worker 被杀)，放回队列
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'MAIL_BATCH_SIZE', 50)
+
+    @property
+    def max_attempts(self):
+        return getattr(settings, 'MAIL_MAX_ATTEMPTS', 5)
+
+    def enqueue(self, subject, body, to, category='', priority=OutboundEmail.PRIORITY_NORMAL):
+        """:param to: 收件人邮箱列表"""
+        return self.enqueue_many([
+            {'subject': subject, 'body': body, 'to': to, 'category': category, 'priority': priority}
+        ])[0]
+
+    def enqueue_many(self, messages):
+        """:param messages: [{'subject', 'body', 'to', 'category', 'priority'}]，一次 bulk_create"""
+        emails = OutboundEmail.objects.bulk_create([OutboundEmail(**message) for message in messages])
+        if emails:
+            transaction.on_commit(self.schedule)
+        return emails
+
+    def schedule(self):
+        from .tasks import flush_outbox
+
+        try:
+            flush_outbox.apply_async(retry=False)
+        except Exception as e:
+            # Broker 不可用：邮件已在发件箱里，由每分钟的定时任务补发
+            logger.warning(f"Mail queue unavailable: {e}")
+
+    def claim(self, limit):
+        """领取一批到期邮件 (条件更新，多个 worker 同时领取也不会重复发送)"""
+        now = timezone.now()
+        ids = list(
+            OutboundEmail.objects.filter(status='pending', send_after__lte=now)
+            .order_by('priority', 'id').values_list('pk', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        token = uuid.uuid4().hex
+        OutboundEmail.objects.filter(pk__in=ids, status='pending').update(
+            status='sending', claimed_by=token, claimed_at=now
+        )
+        return list(OutboundEmail.objects.filter(claimed_by=token, status='sending').order_by('priority', 'id'))
+
+    def release_stale(self):
+        cutoff = timezone.now() - timedelta(seconds=self.STALE_CLAIM_SECONDS)
+        return OutboundEmail.objects.filter(status='sending', claimed_at__lt=cutoff).update(
+            status='pending', claimed_by=''
+        )
+
+    def backoff(self, attempts):
+        base = getattr(settings, 'MAIL_RETRY_BACKOFF', 60)
+        return base * (2 ** (attempts - 1)) * (1 + random.random())
+
+    def send_batch(self, limit=None):
+        """:return: {'sent': 成功数, 'retry': 推迟重试数, 'failed': 放弃数}"""
+        result = {'sent': 0, 'retry': 0, 'failed': 0}
+        emails = self.claim(limit or self.batch_size)
+        if not emails:
+            return result
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            # SMTP 连不上 / 认证失败：整批推迟，不计为邮件本身的问题
+            logger.warning(f"SMTP connection failed, {len(emails)} emails deferred: {e}")
+            for email in emails:
+                result[self._fail(email, e, permanent=False)] += 1
+            return result
+
+        rate = getattr(settings, 'MAIL_RATE_PER_SECOND', 0)
+        try:
+            for i, email in enumerate(emails):
+                if i and rate:
+                    time.sleep(1 / rate)
+                message = EmailMessage(
+                    email.subject, email.body, email.from_email or settings.DEFAULT_FROM_EMAIL, email.to,
+                    connection=connection,
+                )
+                try:
+                    message.send()
+                except Exception as e:
+                    permanent = is_permanent_error(e)
+                    result[self._fail(email, e, permanent)] += 1
+                    if not permanent:
+                        # 连接可能已断开：重连后继续发送剩余邮件
+                        connection.close()
+                        try:
+                            connection.open()
+                        except Exception:
+                            pass
+                    continue
+
+                email.status = 'sent'
+                email.attempts += 1
+                email.sent_at = timezone.now()
+                email.claimed_by = ''
+                email.save(update_fields=['status', 'attempts', 'sent_at', 'claimed_by'])
+                result['sent'] += 1
+        finally:
+            connection.close()
+        return result
+
+    def _fail(self, email, exc, permanent):
+        """:return: 'retry' / 'failed'"""
+        email.attempts += 1
+        email.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+        email.claimed_by = ''
+        if permanent or email.attempts >= self.max_attempts:
+            email.status = 'failed'
+            logger.warning(f"Email {email.pk} to {email.to} failed permanently: {email.last_error}")
+        else:
+            email.status = 'pending'
+            email.send_after = timezone.now() + timedelta(seconds=self.backoff(email.attempts))
+        email.save(update_fields=['status', 'attempts', 'last_error', 'claimed_by', 'send_after'])
+        return 'failed' if email.status == 'failed' else 'retry'
+
+    def retry(self, queryset):
+        """后台手动重发：清零尝试次数，立即进入队列"""
+        count = queryset.exclude(status='sent').update(
+            status='pending', attempts=0, send_after=timezone.now(), claimed_by=''
+        )
+        if count:
+            transaction.on_commit(self.schedule)
+        return count
+
+
+mail_service = MailQueueService()
+
+
+class FragmentCacheService:
+    """
+    首页 / 实验室介绍页的片段缓存与对象缓存
+
+    - 每个数据分组 (announcements / posts / users / lab_intro / todos_{用户ID}) 一个版本号 key，
+      片段缓存 ({% cache %}) 和对象缓存的 key 都带上相关分组的版本号；
+    - core.signals 在相关模型 post_save / post_delete 后 bump() 版本号，旧 key 不再被读到，
+      等 FRAGMENT_CACHE_TIMEOUT 过期即可，不用逐个删除；
+    - 版本号丢失 (被淘汰 / 缓存切换) 时用当前毫秒时间戳重新初始化，不会撞上旧版本的片段。
+    """
+
+    def _version_key(self, group):
+        return f"fragment_version_{group}"
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 300)
+
+    def versions(self, *groups):
+        """:return: {分组: 版本号}，一次 get_many"""
+        keys = {self._version_key(group): group for group in groups}
+        found = cache.get_many(list(keys))
+        versions = {}
+        for key, group in keys.items():
+            version = found.get(key)
+            if version is None:
+                version = int(time.time() * 1000)
+                cache.add(key, version, None)
+            versions[group] = version
+        return versions
+
+    def bump(self, *groups):
+        for group in groups:
+            key = self._version_key(group)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, int(time.time() * 1000), None)
+
+    def get_or_set(self, name, groups, compute, timeout=None):
+        """对象缓存：key 由名称和各分组版本号组成，未命中时调用 compute()"""
+        versions = self.versions(*groups)
+        key = f"fragment_{name}_" + '_'.join(str(versions[group]) for group in groups)
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            cache.set(key, value, self.timeout if timeout is None else timeout)
+        return value
+
+
+fragment_cache = FragmentCacheService()
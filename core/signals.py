@@ -0,0 +1,69 @@
+"""
+片段缓存失效：相关模型保存 / 删除后 (事务提交时) 递增对应分组的版本号，见 core.services.FragmentCacheService
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .services import fragment_cache
+
+# 只改了这些字段时不递增版本号 (浏览量、登录时间、积分；等级只影响导师卡片的 Lv 和排序，等片段超时即可)
+POST_UNCACHED_FIELDS = {'views'}
+USER_UNCACHED_FIELDS = {'last_login', 'coins', 'growth', 'level'}
+
+
+def bump_on_commit(*groups):
+    transaction.on_commit(lambda: fragment_cache.bump(*groups))
+
+
+def changed(update_fields, uncached_fields):
+    return not update_fields or not set(update_fields) <= uncached_fields
+
+
+@receiver([post_save, post_delete], sender='news.Announcement', dispatch_uid='fragment_announcement')
+def invalidate_announcements(sender, raw=False, **kwargs):
+    if not raw:
+        bump_on_commit('announcements')
+
+
+@receiver([post_save, post_delete], sender='community.Post', dispatch_uid='fragment_post')
+def invalidate_posts(sender, update_fields=None, raw=False, **kwargs):
+    if not raw and changed(update_fields, POST_UNCACHED_FIELDS):
+        bump_on_commit('posts')
+
+
+@receiver([post_save, post_delete], sender='community.Comment', dispatch_uid='fragment_comment')
+def invalidate_comment_counts(sender, raw=False, **kwargs):
+    # 首页最新讨论显示评论数
+    if not raw:
+        bump_on_commit('posts')
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL, dispatch_uid='fragment_user')
+def invalidate_users(sender, update_fields=None, raw=False, **kwargs):
+    # 成员总数、导师 / 组员列表、帖子作者昵称和头像
+    if not raw and changed(update_fields, USER_UNCACHED_FIELDS):
+        bump_on_commit('users')
+
+
+@receiver([post_save, post_delete], sender='core.ResearchTopic', dispatch_uid='fragment_topic')
+@receiver([post_save, post_delete], sender='core.Publication', dispatch_uid='fragment_publication')
+def invalidate_lab_intro(sender, raw=False, **kwargs):
+    if not raw:
+        bump_on_commit('lab_intro')
+
+
+@receiver([post_save, post_delete], sender='tasks.TaskParticipant', dispatch_uid='fragment_participant')
+def invalidate_participant_todos(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_on_commit(f'todos_{instance.user_id}')
+
+
+@receiver(post_save, sender='tasks.Task', dispatch_uid='fragment_task')
+def invalidate_task_todos(sender, instance, created=False, raw=False, **kwargs):
+    # 任务标题 / 截止时间 / 状态变化：所有参与者的待办日程失效 (删除任务时由参与者的 post_delete 处理)
+    if raw or created:
+        return
+    user_ids = instance.participants.values_list('user_id', flat=True)
+    bump_on_commit(*[f'todos_{user_id}' for user_id in user_ids])
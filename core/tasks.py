@@ -0,0 +1,18 @@
+from celery import shared_task
+
+from .services import mail_service
+
+
+# 投递结果没人读取：不订阅结果后端 (Redis 宕机时订阅会在请求里重连约 20 秒)
+@shared_task(ignore_result=True)
+def flush_outbox():
+    """
+    发送发件箱中到期的邮件 (路由到 mail 队列，单并发 worker 消费：全站共用一个 SMTP 连接和限速)
+    一批发满且确实发出了邮件，说明还有积压，接着投递下一批；
+    整批都没发出去 (SMTP 连不上 / 全部退避) 时不立即重投，剩下的交给每分钟的定时任务
+    """
+    mail_service.release_stale()
+    result = mail_service.send_batch()
+    if result['sent'] and sum(result.values()) >= mail_service.batch_size:
+        mail_service.schedule()
+    return result
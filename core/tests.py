@@ -1,3 +1,1015 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import re
+import shutil
+import smtplib
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.core.servers.basehttp import WSGIServer
+from django.db import OperationalError, connection
+from django.db.models import Q
+from django.http import HttpResponse
+from django.test import LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase, override_settings, tag
+from django.test.testcases import LiveServerThread, QuietWSGIRequestHandler
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from haystack import connections as haystack_connections
+
+from community.models import FeedItem, Post
+from community.tasks import update_search_index
+from direct_messages.models import Message
+from Github_trend.models import Repository
+from Github_trend.services import ranking_service
+from innovation_agent.models import InnovationProject, LLMConfiguration, ProjectChatHistory
+from news.models import Announcement
+from notifications.models import Notification
+from tasks.models import Task, TaskParticipant
+from vocabulary.models import UserWordProgress, Word
+
+from .cache import ResilientCache, _shared_state, key_group
+from .importtime import TARGETS, package_totals, parse_importtime, profile_startup
+from .models import OutboundEmail, Publication
+from .services import fragment_cache, mail_service
+from .tasks import flush_outbox
+from .loadtest import DEFAULT_PASSWORD, SCENARIO_WEIGHTS, percentile, run_load, seed_load_users
+from .middleware import QueryProfilerMiddleware
+from .profiling import fingerprint, profile_buffer
+from .sqlite import retry_on_locked
+from myweb.serving import thread_count, worker_count
+
+User = get_user_model()
+
+# EXPLAIN QUERY PLAN 中的全表扫描：SCAN <表名> 且没有 USING INDEX / USING INTEGER PRIMARY KEY
+FULL_SCAN_RE = re.compile(r'\bSCAN (\w+)(?!.*\bUSING\b)')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN 仅适用于 SQLite')
+class QueryPlanTest(TestCase):
+    """
+    热点查询的执行计划回归测试：
+    各视图 / 定时任务的核心查询必须命中索引，退化为全表扫描时失败 (通常是索引被删或查询条件被改写)
+    """
+
+    def hot_querysets(self):
+        now = timezone.now()
+        return {
+            # 私信：聊天记录、轮询新消息、未读邮件提醒
+            'chat_history': Message.objects.filter(
+                Q(sender_id=1, recipient_id=2) | Q(sender_id=2, recipient_id=1)
+            ).order_by('timestamp'),
+            'chat_poll': Message.objects.filter(sender_id=2, recipient_id=1, id__gt=0).order_by('timestamp'),
+            'unread_email_reminder': Message.objects.filter(
+                is_read=False, is_email_sent=False, timestamp__lte=now
+            ),
+            # 消息中心：列表分页、未读数 / 一键已读、保留策略清理
+            'notification_page': Notification.objects.filter(recipient_id=1).order_by('-created_at', '-id')[:7],
+            'notification_unread': Notification.objects.filter(recipient_id=1, is_read=False),
+            'notification_retention': Notification.objects.filter(is_read=True, created_at__lt=now).order_by('created_at'),
+            # 社区：广场列表、关注动态
+            'post_list': Post.objects.filter(visibility='public').order_by('-created_at')[:10],
+            'feed_page': FeedItem.objects.filter(owner_id=1).order_by('-created_at', '-post_id')[:11],
+            # 任务：首页日程、自动结算
+            'my_todos': TaskParticipant.objects.filter(
+                user_id=1, status='accepted', task__status__in=['open', 'in_progress']
+            ).select_related('task').order_by('task__deadline'),
+            'auto_settle': Task.objects.filter(status__in=['open', 'in_progress'], deadline__lte=now),
+            # 单词：错题本
+            'mistake_book': UserWordProgress.objects.filter(
+                user_id=1, is_mistake=True, word__level='CET4'
+            ).select_related('word').order_by('-mistake_count'),
+            # GitHub 趋势：按语言 / 全部，按星标数 / 增速排序
+            'trends_lang_stars': ranking_service.ranked_queryset('python', 'weekly', 'stars')[:13],
+            'trends_lang_rising': ranking_service.ranked_queryset('python', 'weekly', 'rising')[:13],
+            'trends_all_stars': ranking_service.ranked_queryset('all', 'weekly', 'stars')[:13],
+            'trends_all_rising': ranking_service.ranked_queryset('all', 'weekly', 'rising')[:13],
+        }
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in self.hot_querysets().items():
+            with self.subTest(name):
+                plan = queryset.explain()
+                scanned = FULL_SCAN_RE.findall(plan)
+                self.assertFalse(scanned, f'{name} 全表扫描 {scanned}：\n{plan}')
+
+    def test_full_scan_detected(self):
+        """确认检测本身有效：按无索引字段过滤必然全表扫描"""
+        plan = Message.objects.filter(content='hello').explain()
+        self.assertEqual(FULL_SCAN_RE.findall(plan), ['direct_messages_message'])
+
+
+@override_settings(QUERY_PROFILER_ENABLED=True)
+class QueryProfilerTest(TestCase):
+    def setUp(self):
+        profile_buffer.clear()
+        self.user = User.objects.create_user(username='alice', email='alice@test.com')
+        self.staff = User.objects.create_user(username='admin', email='admin@test.com', is_staff=True)
+
+    def test_fingerprint_normalizes_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'bob' AND x IN (1, 2, 3)"),
+            fingerprint("SELECT * FROM t WHERE id = 7 AND name = 'amy' AND x IN (4)"),
+        )
+
+    @override_settings(QUERY_PROFILER_N_PLUS_ONE_THRESHOLD=5)
+    def test_repeated_queries_recorded_and_alarmed(self):
+        """测试：循环内逐个查询被记录为重复指纹，并触发 N+1 告警"""
+        def n_plus_one_view(request):
+            for user in User.objects.all():
+                list(User.objects.filter(pk=user.pk))
+            return HttpResponse()
+
+        middleware = QueryProfilerMiddleware(n_plus_one_view)
+        with self.assertLogs('core.profiling', level='WARNING') as logs:
+            for _ in range(3):
+                User.objects.create_user(username=f'u{_}', email=f'u{_}@test.com')
+            middleware(RequestFactory().get('/n-plus-one/'))
+
+        record = profile_buffer.records()[-1]
+        self.assertEqual((record['view'], record['queries']), ('/n-plus-one/', 6))
+        self.assertTrue(record['n_plus_one'])
+        self.assertEqual(record['duplicates'][0]['count'], 5)
+        self.assertIn('N+1', logs.output[0])
+
+    def test_endpoint_staff_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('core:query_profile')).status_code, 302)
+
+        self.client.force_login(self.staff)
+        self.client.get(reverse('vocabulary:index'))
+        data = self.client.get(reverse('core:query_profile')).json()
+        self.assertIn('vocabulary:index', [row['view'] for row in data['views']])
+
+
+class ResilientCacheTest(TestCase):
+    # 1 号端口上没有 Redis，第一次访问就会连接失败
+    PRIMARY_LOCATION = 'redis://127.0.0.1:1/0'
+
+    def setUp(self):
+        _shared_state.pop(self.PRIMARY_LOCATION, None)
+        self.make_cache().fallback.clear()
+
+    def make_cache(self):
+        return ResilientCache('', {'OPTIONS': {
+            'PRIMARY': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': self.PRIMARY_LOCATION,
+                'OPTIONS': {'socket_connect_timeout': 0.2},
+            },
+            'FALLBACK': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fallback-test'},
+            'RETRY_AFTER': 30,
+        }})
+
+    def test_key_group(self):
+        self.assertEqual(key_group('notification_counts_12'), 'notification_counts')
+        self.assertEqual(key_group('trends_python_weekly_1'), 'trends_python')
+        self.assertEqual(key_group('42'), 'other')
+
+    def test_failover_to_fallback(self):
+        """测试：主后端连不上时切到备用后端，冷却时间过后重新尝试主后端"""
+        test_cache = self.make_cache()
+        with self.assertLogs('core.cache', level='WARNING'):
+            test_cache.set('greeting', 'hi', 60)
+        self.assertTrue(test_cache.using_fallback)
+        self.assertEqual(test_cache.get('greeting'), 'hi')
+        test_cache.add('n', 1)
+        self.assertEqual(test_cache.incr('n', 2), 3)
+
+        self.assertTrue(self.make_cache().using_fallback)  # 同进程其他线程的实例共享故障状态
+        test_cache._state['down_until'] = 0  # 冷却结束
+        self.assertFalse(test_cache.using_fallback)
+        with self.assertLogs('core.cache', level='WARNING'):
+            self.assertEqual(test_cache.get('greeting'), 'hi')
+
+    def test_bump_during_outage_survives_recovery(self):
+        """测试：故障期间 bump 的版本号，主后端恢复后不会退回故障前的旧版本"""
+        primary = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'primary-test'}
+        _shared_state.pop('primary-test', None)
+        test_cache = ResilientCache('', {'OPTIONS': {
+            'PRIMARY': primary,
+            'FALLBACK': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'fallback-test'},
+            'RETRY_AFTER': 30,
+        }})
+        test_cache.primary.clear()
+
+        test_cache.set('fragment_version_posts', 1, None)
+
+        with mock.patch('core.services.cache', test_cache):
+            before = fragment_cache.versions('posts')['posts']
+
+            # Redis 宕机：bump 只写进了备用后端
+            outage = mock.patch.object(test_cache.primary, 'incr', side_effect=ConnectionRefusedError('down'))
+            with outage, self.assertLogs('core.cache', level='WARNING'):
+                fragment_cache.bump('posts')
+            self.assertNotEqual(fragment_cache.versions('posts')['posts'], before)
+
+            test_cache._state['down_until'] = 0  # 冷却结束，主后端已恢复
+            self.assertNotEqual(fragment_cache.versions('posts')['posts'], before)
+        self.assertFalse(test_cache._state['dirty'])
+
+    def test_hit_rate_stats(self):
+        test_cache = self.make_cache()
+        with self.assertLogs('core.cache', level='WARNING'):
+            test_cache.set('notification_counts_1', {'unread': 1}, 60)
+        test_cache.get('notification_counts_1')
+        test_cache.get('notification_counts_2')
+        test_cache.get_many(['notification_counts_1', 'trends_python_weekly_1'])
+
+        rows = {row['group']: row for row in test_cache.read_stats()}
+        self.assertEqual((rows['notification_counts']['hits'], rows['notification_counts']['misses']), (2, 1))
+        self.assertEqual(rows['trends_python']['hit_rate'], 0.0)
+
+        # 再次读取只累加新增部分
+        test_cache.get('notification_counts_1')
+        rows = {row['group']: row for row in test_cache.read_stats()}
+        self.assertEqual(rows['notification_counts']['hits'], 3)
+
+    def test_dashboard_staff_only(self):
+        user = User.objects.create_user(username='alice', email='alice@test.com')
+        staff = User.objects.create_user(username='admin', email='admin@test.com', is_staff=True)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(reverse('core:cache_stats')).status_code, 302)
+
+        self.client.force_login(staff)
+        data = self.client.get(reverse('core:cache_stats')).json()
+        self.assertFalse(data['using_fallback'])
+        self.assertIsInstance(data['groups'], list)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite 专用调优')
+class SqliteTuningTest(TransactionTestCase):
+    """TransactionTestCase：retry_on_locked 在外层事务中不会重试，TestCase 的事务包裹会干扰测试"""
+
+    def test_pragmas_applied_on_connect(self):
+        connection.close()
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_retry_on_locked(self):
+        calls = []
+
+        @retry_on_locked(backoff=0)
+        def flaky_write():
+            calls.append(1)
+            User.objects.create_user(username=f'flaky{len(calls)}', email=f'flaky{len(calls)}@test.com')
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'ok'
+
+        with self.assertLogs('core.sqlite', level='WARNING'):
+            self.assertEqual(flaky_write(), 'ok')
+        # 失败的两次尝试整体回滚，只留下最后一次的写入
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['flaky3'])
+
+    def test_retry_keeps_view_side_effects_single(self):
+        """测试：收藏提交时遇到锁冲突，只重试写入这一段，提示消息和缓存失效各只发生一次"""
+        reader = User.objects.create_user(username='reader', email='reader@test.com')
+        author = User.objects.create_user(username='author', email='author@test.com')
+        post = Post.objects.create(title='帖子', content='内容', author=author)
+        version_key = f'interaction_state_version_{reader.pk}'
+        cache.delete(version_key)
+
+        self.client.force_login(reader)
+        real_commit, commits = connection.commit, []
+
+        def commit_locked_once():
+            commits.append(1)
+            if len(commits) == 1:
+                raise OperationalError('database is locked')
+            return real_commit()
+
+        with mock.patch.object(connection, 'commit', side_effect=commit_locked_once), \
+                mock.patch('core.sqlite.time.sleep'), self.assertLogs('core.sqlite', level='WARNING'):
+            response = self.client.post(reverse('community:toggle_bookmark', args=[post.pk]))
+
+        self.assertEqual(len(list(get_messages(response.wsgi_request))), 1)
+        self.assertEqual(cache.get(version_key), 2)
+        self.assertTrue(reader.collections.get().posts.filter(pk=post.pk).exists())
+
+    def test_other_errors_not_retried(self):
+        calls = []
+
+        @retry_on_locked(backoff=0)
+        def broken():
+            calls.append(1)
+            raise OperationalError('no such table: nope')
+
+        with self.assertRaises(OperationalError):
+            broken()
+        self.assertEqual(len(calls), 1)
+
+    def test_benchmark_command(self):
+        out = io.StringIO()
+        call_command('benchmark_sqlite', readers=2, writers=2, duration=0.3, rows=500, stdout=out)
+        tuned = next(line for line in out.getvalue().splitlines() if line.startswith('tuned'))
+        self.assertEqual(tuned.split()[-1], '0')  # 调优后没有锁冲突
+
+
+def seed_site_data(scale=1):
+    """
+    按接近线上的量级批量造数据 (bulk_create，不触发信号)
+    返回 {'me': 当前登录用户, ...} 供各视图的 URL 取参数
+    """
+
+    from community.models import Collection, Comment, Tag
+    from core.models import LabClass, Publication, ResearchTopic
+    from news.models import Announcement
+    from user_app.models import Friendship
+    from vocabulary.models import Word
+
+    now = timezone.now()
+    users = User.objects.bulk_create([
+        User(username=f'user{i}', email=f'user{i}@test.com', password='!', nickname=f'用户{i}',
+             status='faculty' if i == 0 else 'student')
+        for i in range(60)
+    ])
+    me, others = users[0], users[1:]
+    me.is_staff = True
+    me.save(update_fields=['is_staff'])
+
+    # 关注 / 好友：和 20 人互相关注，15 个好友，5 个待处理申请
+    Follow = User.following.through
+    Follow.objects.bulk_create(
+        [Follow(from_customuser_id=me.pk, to_customuser_id=u.pk) for u in others[:20]]
+        + [Follow(from_customuser_id=u.pk, to_customuser_id=me.pk) for u in others[:20]]
+    )
+    Friendship.objects.bulk_create(
+        [Friendship(from_user=me, to_user=u, status='accepted') for u in others[:15]]
+        + [Friendship(from_user=u, to_user=me, status='pending') for u in others[40:45]]
+    )
+
+    # 社区：帖子、标签、评论 (含回复)、点赞、收藏夹
+    tags = Tag.objects.bulk_create([Tag(name=f'标签{i}', slug=f'tag-{i}') for i in range(10)])
+    posts = Post.objects.bulk_create([
+        Post(author=users[i % len(users)], title=f'帖子 {i}', content=f'第 {i} 篇帖子的正文内容 ' * 5,
+             visibility='private' if i % 20 == 0 else 'public')
+        for i in range(2000 * scale)
+    ])
+    PostTag = Post.tags.through
+    PostTag.objects.bulk_create([PostTag(post_id=p.pk, tag_id=tags[i % 10].pk) for i, p in enumerate(posts)])
+    target = posts[1]
+    comments = Comment.objects.bulk_create([
+        Comment(post=posts[i % 200] if i >= 40 else target, author=users[i % len(users)], content=f'评论 {i}')
+        for i in range(5000 * scale)
+    ])
+    Comment.objects.bulk_create([
+        Comment(post=target, author=users[i % len(users)], content=f'回复 {i}', parent=comments[i])
+        for i in range(20)
+    ])
+    PostLike = Post.likes.through
+    PostLike.objects.bulk_create([PostLike(post_id=target.pk, customuser_id=u.pk) for u in users[:30]])
+    collection = Collection.objects.create(user=me, name='默认收藏夹')
+    collection.posts.add(*posts[:30])
+    FeedItem.objects.bulk_create([
+        FeedItem(owner=me, post=p, author_id=p.author_id, created_at=now - timedelta(minutes=i))
+        for i, p in enumerate(posts[:500])
+    ])
+
+    # 私信：和好友、陌生人的往来
+    Message.objects.bulk_create([
+        Message(sender=me if i % 2 else others[i % 30], recipient=others[i % 30] if i % 2 else me,
+                content=f'消息 {i}', is_read=i % 3 != 0)
+        for i in range(3000 * scale)
+    ])
+
+    # 通知
+    Notification.objects.bulk_create([
+        Notification(recipient=me, actor=others[i % 50], verb='like', target_url=f'/community/post/{i}/',
+                     is_read=i % 4 != 0)
+        for i in range(3000 * scale)
+    ])
+
+    # 单词：5 个等级，部分已学 / 错题
+    words = Word.objects.bulk_create([
+        Word(word=f'word{i}', meaning=f'释义 {i}', level=['CET4', 'CET6', 'KaoYan', 'TOEFL', 'IELTS'][i % 5])
+        for i in range(2000 * scale)
+    ])
+    UserWordProgress.objects.bulk_create([
+        UserWordProgress(user=me, word=w, status=i % 3, is_mistake=i % 4 == 0, mistake_count=i % 5)
+        for i, w in enumerate(words[:600])
+    ])
+
+    # 任务：我发布的、我参与的
+    tasks = Task.objects.bulk_create([
+        Task(title=f'任务 {i}', content='任务详情', creator=users[i % 10], bounty=10,
+             status=['open', 'in_progress', 'closed'][i % 3], deadline=now + timedelta(days=i % 30 + 1))
+        for i in range(200)
+    ])
+    TaskParticipant.objects.bulk_create(
+        [TaskParticipant(task=t, user=me, status='accepted') for t in tasks[10:40]]
+        + [TaskParticipant(task=tasks[0], user=u, status='accepted') for u in others[:20]]
+    )
+
+    # 实验室主页
+    Announcement.objects.bulk_create([Announcement(title=f'公告 {i}', content='内容', is_top=i == 0) for i in range(20)])
+    ResearchTopic.objects.bulk_create([ResearchTopic(title=f'方向 {i}', description='简介') for i in range(5)])
+    Publication.objects.bulk_create([
+        Publication(title=f'论文 {i}', authors='Zhang San', venue='CVPR', year=2020 + i % 6) for i in range(30)
+    ])
+    lab_class = LabClass.objects.create(name='2026 级', mentor=me)
+    lab_class.students.add(*others[:20])
+
+    # 创新助手：一个带聊天记录的项目
+    LLMConfiguration.objects.create(user=me)
+    project = InnovationProject.objects.create(user=me, title='创新项目 1', base_md_content='# Baseline\n' * 50)
+    ProjectChatHistory.objects.bulk_create([
+        ProjectChatHistory(project=project, role='user' if i % 2 else 'assistant', content=f'第 {i} 轮对话')
+        for i in range(40)
+    ])
+
+    return {
+        'me': me,
+        'other': others[0],
+        'stranger': others[35],
+        'post': target,
+        'own_post': posts[0],
+        'comment': comments[0],
+        'collection': collection,
+        'task': tasks[0],
+        'joined_task': tasks[10],
+        'word': words[0],
+        'lab_class': lab_class,
+        'project': project,
+        'friend_request': Friendship.objects.filter(to_user=me, status='pending').first(),
+        'notification': Notification.objects.filter(recipient=me).first(),
+    }
+
+
+# (URL 名称, 路径参数工厂, 查询参数 (或工厂), 是否登录, 查询条数上限)
+# 上限按当前实现在缓存全空时的实测值留少量余量；查询数随数据量增长 (N+1) 时这里会失败
+VIEW_BUDGETS = [
+    # 门户 / 实验室
+    ('home', None, {}, True, 10),
+    ('core:intro', None, {}, True, 11),
+    ('core:class_management', None, {}, True, 8),
+    ('core:class_create', None, {}, True, 5),
+    ('core:class_edit', lambda d: [d['lab_class'].pk], {}, True, 7),
+    ('core:query_profile', None, {}, True, 4),
+    ('core:cache_stats', None, {}, True, 3),
+    ('haystack_search', None, {'q': '帖子'}, True, 4),
+    # 用户
+    ('user_app:login', None, {}, False, 2),
+    ('user_app:register', None, {}, False, 2),
+    ('user_app:activation_sent', None, {}, False, 2),
+    ('user_app:password_reset', None, {}, False, 2),
+    ('user_app:password_reset_done', None, {}, False, 2),
+    ('user_app:password_reset_complete', None, {}, False, 2),
+    ('user_app:profile', None, {}, True, 7),
+    ('user_app:public_profile', lambda d: [d['other'].pk], {}, True, 14),
+    ('user_app:following_list', lambda d: [d['me'].pk], {}, True, 7),
+    ('user_app:followers_list', lambda d: [d['me'].pk], {}, True, 7),
+    ('user_app:search_users', None, {'q': 'user1'}, True, 4),
+    ('user_app:friend_requests', None, {}, True, 6),
+    # 社区
+    ('community:post_list', None, {}, True, 9),
+    ('community:post_list', None, {'tag': 'tag-3'}, True, 10),
+    ('community:feed', None, {}, True, 9),
+    ('community:post_create', None, {}, True, 5),
+    ('community:post_detail', lambda d: [d['post'].pk], {}, True, 14),
+    ('community:post_edit', lambda d: [d['own_post'].pk], {}, True, 9),
+    ('community:my_collections', None, {}, True, 6),
+    # 消息中心 / 私信
+    ('notifications:list', None, {}, True, 5),
+    ('notifications:api_list', None, {}, True, 5),
+    ('notifications:api_unread_count', None, {}, True, 4),
+    ('notifications:read_and_redirect', lambda d: [d['notification'].pk], {}, True, 4),
+    ('direct_messages:inbox', None, {}, True, 8),
+    ('direct_messages:inbox', None, lambda d: {'uid': d['other'].pk}, True, 13),
+    ('direct_messages:chat_room', lambda d: [d['other'].pk], {}, True, 7),
+    ('direct_messages:get_new_messages', lambda d: [d['other'].pk], {'last_id': 0}, True, 8),
+    # 任务
+    ('tasks:task_create', None, {}, True, 7),
+    ('tasks:my_tasks', None, {}, True, 6),
+    ('tasks:task_detail', lambda d: [d['task'].pk], {}, True, 8),
+    # 单词
+    ('vocabulary:index', None, {}, True, 6),
+    ('vocabulary:practice', None, {}, True, 4),
+    ('vocabulary:mistake_book', None, {}, True, 7),
+    ('vocabulary:api_get_words', None, {'mode': 'learn'}, True, 6),
+    ('vocabulary:api_get_words', None, {'mode': 'review'}, True, 5),
+    # 工具
+    ('Github_trend:index', None, {}, True, 5),
+    ('innovation_agent:config', None, {}, True, 5),
+    ('innovation_agent:project_list', None, {}, True, 6),
+    ('innovation_agent:workspace', lambda d: [d['project'].pk], {}, True, 6),
+    ('innovation_agent:api_get_doc_content', lambda d: [d['project'].pk], {'type': 'base'}, True, 4),
+    ('innovation_agent:download_project', lambda d: [d['project'].pk], {}, True, 4),
+    ('innovation_agent:api_generate_pdf', lambda d: [d['project'].pk], {}, True, 3),
+    ('npy_editor:home', None, {}, True, 4),
+    ('npy_editor:get_data', None, {'y_key': 'Value'}, True, 3),
+]
+
+# 写操作 (登录后 POST)：(URL 名称, 路径参数工厂, 表单数据工厂, 查询条数上限)
+# 数据工厂返回 str 时按 JSON 请求体提交；按顺序各执行一次，缓存全空
+WRITE_BUDGETS = [
+    ('community:like_post', lambda d: [d['post'].pk], None, 9),
+    ('community:like_comment', lambda d: [d['comment'].pk], None, 10),
+    ('community:toggle_bookmark', lambda d: [d['post'].pk], None, 10),
+    ('community:collect_post', lambda d: [d['own_post'].pk], lambda d: {'collection_ids': [d['collection'].pk]}, 6),
+    ('community:api_create_collection', None, lambda d: json.dumps({'name': '新收藏夹'}), 5),
+    ('community:manage_collection_posts', None, lambda d: json.dumps({
+        'action': 'remove', 'source_collection_id': d['collection'].pk, 'post_ids': [d['own_post'].pk],
+    }), 8),
+    ('direct_messages:send_message', None, lambda d: {'recipient_id': d['other'].pk, 'content': '你好'}, 6),
+    ('direct_messages:chat_room', lambda d: [d['other'].pk], lambda d: {'content': '你好'}, 7),
+    ('user_app:follow_user', lambda d: [d['stranger'].pk], None, 10),
+    ('user_app:add_friend', lambda d: [d['stranger'].pk], None, 7),
+    ('user_app:handle_request', lambda d: [d['friend_request'].pk, 'accept'], None, 14),
+    ('vocabulary:api_submit_result', None, lambda d: json.dumps({'word_id': d['word'].pk, 'is_correct': True}), 9),
+    ('vocabulary:api_kill_word', None, lambda d: json.dumps({'word_id': d['word'].pk}), 7),
+    ('innovation_agent:create_project', None, None, 6),
+    ('tasks:task_create', None, lambda d: {
+        'title': '新任务', 'content': '任务详情', 'bounty': 0, 'task_type': 'bounty',
+        'deadline': (timezone.now() + timedelta(days=3)).strftime('%Y-%m-%dT%H:%M'),
+        'invitees': [d['other'].pk, d['stranger'].pk],
+    }, 9),
+    ('tasks:handle_invite', lambda d: [d['joined_task'].pk, 'accept'], None, 7),
+    ('tasks:settle_task', lambda d: [d['task'].pk], lambda d: {'winner_id': d['other'].pk}, 13),
+]
+
+# 不做预算的路由及原因 (新增路由必须出现在上面两张表或这里，否则 test_every_route_budgeted 失败)
+UNBUDGETED_ROUTES = {
+    'media': '媒体文件 (不查库)',
+    'user_app:logout': '注销会话，之后的请求都会变成匿名',
+    'user_app:activate': '需要一次性激活令牌',
+    'user_app:password_reset_confirm': '需要一次性重置令牌',
+    'notifications:api_stream': 'SSE 长连接，见 UnreadCountStreamTest',
+    # 删除操作：低频，且会删掉其它视图要用的数据
+    'user_app:delete_friend': '删除操作',
+    'community:post_delete': '删除操作',
+    'community:delete_collection': '删除操作',
+    'direct_messages:delete_conversation': '删除操作',
+    'direct_messages:delete_chat': '删除操作',
+    'core:class_delete': '删除操作',
+    'tasks:task_delete': '删除操作',
+    'innovation_agent:delete_project': '删除操作',
+    # 文件上传 / 改写：耗时在文件处理而不在 SQL
+    'community:upload_image': '文件上传',
+    'npy_editor:upload_file': '文件上传',
+    'npy_editor:update_data': '改写上传的 .npy 文件',
+    'innovation_agent:api_upload_baseline': '文件上传',
+    # 调用外部大模型接口
+    'innovation_agent:api_generate_base_summary': '调用大模型',
+    'innovation_agent:api_chat_innovation': '调用大模型',
+    'innovation_agent:api_confirm_step': '调用大模型',
+    'innovation_agent:api_generate_experiment': '调用大模型',
+}
+
+
+def named_routes(patterns=None, namespace=None):
+    """URLconf 中所有带名字的路由 ('命名空间:名称')，跳过 admin"""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace == 'admin':
+                continue
+            names |= named_routes(pattern.url_patterns, pattern.namespace or namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(f'{namespace}:{pattern.name}' if namespace else pattern.name)
+    return names
+
+
+@tag('benchmark')
+@override_settings(QUERY_PROFILER_ENABLED=False)
+class ViewQueryBudgetTest(TestCase):
+    """
+    视图性能预算：按线上量级造数据后逐个请求页面，断言 SQL 条数和响应时间上限
+    预算按缓存全空 (冷启动 / 缓存失效后) 的请求计算，缓存命中时的请求也不得超出
+    (较慢，可用 manage.py test --exclude-tag benchmark 跳过)
+    """
+    MAX_RESPONSE_MS = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_site_data()
+        Repository.objects.create(
+            full_name='lab/demo', name='demo', language='Python', language_key='python',
+            url='https://github.com/lab/demo', created_at=timezone.now(), stars=1,
+        )
+
+    def setUp(self):
+        random.seed(0)  # 随机抽词等路径的查询条数固定下来
+        self.npy_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.npy_dir, ignore_errors=True)
+        self.npy_path = os.path.join(self.npy_dir, 'main.npy')
+        import numpy as np
+        np.save(self.npy_path, np.arange(1000, dtype=float))
+        self.reset_cache()
+
+    def reset_cache(self):
+        cache.clear()
+        # 趋势页只查本地库；该组合刚抓取过，不投递后台刷新
+        cache.set('trends_meta_python_weekly_1', {'etag': '', 'fetched_at': time.time()}, 300)
+
+    def login(self):
+        self.client.force_login(self.data['me'])
+        # npy 编辑器从会话里取已上传文件的路径
+        session = self.client.session
+        session['main_npy_path'] = self.npy_path
+        session.save()
+
+    def measure(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        return response, len(queries), elapsed_ms
+
+    def check(self, url, response, count, elapsed_ms, budget):
+        self.assertLess(response.status_code, 400)
+        self.assertLessEqual(count, budget, f'{url} 查询 {count} 条，超出预算 {budget}')
+        self.assertLess(elapsed_ms, self.MAX_RESPONSE_MS, f'{url} 耗时 {elapsed_ms:.0f}ms')
+
+    def test_every_route_budgeted(self):
+        budgeted = {row[0] for row in VIEW_BUDGETS} | {row[0] for row in WRITE_BUDGETS}
+        missing = named_routes() - budgeted - set(UNBUDGETED_ROUTES)
+        self.assertFalse(missing, f'以下路由没有查询预算，请加入 VIEW_BUDGETS / WRITE_BUDGETS 或 UNBUDGETED_ROUTES：{sorted(missing)}')
+
+    def test_view_budgets(self):
+        for name, args, params, login, budget in VIEW_BUDGETS:
+            url = reverse(name, args=args(self.data) if args else None)
+            params = params(self.data) if callable(params) else params
+            with self.subTest(url=url, params=params):
+                if login:
+                    self.login()
+                else:
+                    self.client.logout()
+                # 预热一次 (模板编译等一次性开销不计入)，然后清空缓存按冷请求计数
+                self.client.get(url, params)
+                self.reset_cache()
+
+                response, count, elapsed_ms = self.measure(lambda: self.client.get(url, params))
+                self.check(url, response, count, elapsed_ms, budget)
+
+                # 缓存已填充的请求
+                response, count, elapsed_ms = self.measure(lambda: self.client.get(url, params))
+                self.check(url, response, count, elapsed_ms, budget)
+
+    def test_write_budgets(self):
+        self.login()
+        for name, args, data, budget in WRITE_BUDGETS:
+            url = reverse(name, args=args(self.data) if args else None)
+            data = data(self.data) if data else {}
+            with self.subTest(url=url):
+                self.reset_cache()
+                if isinstance(data, str):
+                    request = lambda: self.client.post(url, data, content_type='application/json')
+                else:
+                    request = lambda: self.client.post(url, data)
+                response, count, elapsed_ms = self.measure(request)
+                self.check(url, response, count, elapsed_ms, budget)
+
+
+class FragmentCacheTest(TestCase):
+    """首页 / 实验室介绍页片段缓存：命中时不查库，相关模型变化后版本号递增立即失效"""
+
+    def setUp(self):
+        cache.clear()
+        self.me = User.objects.create_user('frag_me', 'frag_me@test.com', 'pw')
+        self.other = User.objects.create_user('frag_other', 'frag_other@test.com', 'pw')
+        self.client.force_login(self.me)
+
+    def get_home(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'))
+        return response, ' '.join(query['sql'] for query in queries)
+
+    def test_home_regions_cached_until_model_changes(self):
+        from news.models import Announcement
+
+        self.get_home()
+        response, sql = self.get_home()
+        for table in ('news_announcement', 'community_post', 'tasks_taskparticipant'):
+            self.assertNotIn(table, sql)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(author=self.other, title='新帖子', content='正文')
+            Announcement.objects.create(title='新公告', content='内容')
+        response, _ = self.get_home()
+        self.assertContains(response, '新帖子')
+        self.assertContains(response, '新公告')
+        self.assertEqual(response.context['stats']['posts'], 1)
+
+    def test_todos_are_per_user(self):
+        from tasks.models import Task, TaskParticipant
+
+        task = Task.objects.create(
+            title='整理数据集', content='...', creator=self.other, deadline=timezone.now() + timedelta(days=1)
+        )
+        self.assertNotContains(self.client.get(reverse('home')), '整理数据集')
+        other_version = fragment_cache.versions(f'todos_{self.other.pk}')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskParticipant.objects.create(task=task, user=self.me, status='accepted')
+        self.assertContains(self.client.get(reverse('home')), '整理数据集')
+        self.assertEqual(fragment_cache.versions(f'todos_{self.other.pk}'), other_version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.title = '整理数据集 (第二版)'
+            task.save()
+        self.assertContains(self.client.get(reverse('home')), '整理数据集 (第二版)')
+
+    def test_untracked_user_fields_keep_cache(self):
+        """登录时间、金币等字段变化不影响页面片段，不递增版本号"""
+        before = fragment_cache.versions('users')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.earn_rewards(coins=5, growth=1)
+            self.other.last_login = timezone.now()
+            self.other.save(update_fields=['last_login'])
+        self.assertEqual(fragment_cache.versions('users'), before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.nickname = '新昵称'
+            self.other.save()
+        self.assertNotEqual(fragment_cache.versions('users'), before)
+
+    def test_lab_intro_invalidated_by_publication(self):
+        from .models import Publication
+
+        self.client.get(reverse('core:intro'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('core:intro'))
+        self.assertNotIn('core_publication', ' '.join(query['sql'] for query in queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Publication.objects.create(title='片段缓存论文', authors='Lab', venue='VLDB')
+        self.assertContains(self.client.get(reverse('core:intro')), '片段缓存论文')
+
+
+class UnifiedSearchTest(TestCase):
+    """全站搜索：分面统计、高亮摘要、单分类分页"""
+
+    def setUp(self):
+        haystack_connections['default'].get_backend().clear()
+        self.addCleanup(haystack_connections['default'].get_backend().clear)
+
+        self.member = User.objects.create_user(username='member', email='member@test.com', status='student')
+        expert = User.objects.create_user(username='expert', email='expert@test.com', bio='研究 graphene 薄膜')
+        posts = [
+            Post.objects.create(title=f'graphene 笔记 {i}', content='关于 graphene 的实验记录', author=self.member)
+            for i in range(12)
+        ]
+        task = Task.objects.create(
+            title='graphene 样品制备', content='内容', creator=self.member, deadline=timezone.now() + timedelta(days=3),
+        )
+        announcement = Announcement.objects.create(title='graphene 讲座', content='周五下午')
+        publication = Publication.objects.create(title='graphene transistors', authors='Zhang San', venue='CVPR')
+        word = Word.objects.create(word='graphene', meaning='石墨烯')
+
+        items = [('community.post', post.pk) for post in posts] + [
+            ('user_app.customuser', expert.pk), ('tasks.task', task.pk), ('news.announcement', announcement.pk),
+            ('core.publication', publication.pk), ('vocabulary.word', word.pk),
+        ]
+        update_search_index(items)
+
+    def test_facet_counts_and_previews(self):
+        """测试：每个分类的命中数一次统计出来，概览页每类只预览前几条"""
+        self.client.force_login(self.member)
+        response = self.client.get(reverse('haystack_search'), {'q': 'graphene'})
+
+        facets = {facet['key']: facet['count'] for facet in response.context['facets']}
+        self.assertEqual(facets, {'post': 12, 'user': 1, 'task': 1, 'announcement': 1, 'publication': 1, 'word': 1})
+        self.assertEqual(response.context['total_count'], 17)
+        sections = {section['key']: section for section in response.context['sections']}
+        self.assertEqual(len(sections['post']['results']), 5)
+        self.assertContains(response, '查看全部 12 条')
+
+    def test_anonymous_facets_skip_member_categories(self):
+        """测试：未登录时不统计、不展示用户和任务"""
+        response = self.client.get(reverse('haystack_search'), {'q': 'graphene'})
+        self.assertEqual(
+            [facet['key'] for facet in response.context['facets']], ['post', 'announcement', 'publication', 'word'],
+        )
+
+    def test_highlighted_snippet(self):
+        """测试：预览摘要带命中词高亮"""
+        response = self.client.get(reverse('haystack_search'), {'q': 'graphene', 'type': 'post'})
+        self.assertIn('<em>graphene</em> 笔记', response.content.decode())
+
+    def test_type_filter_paginates(self):
+        """测试：?type= 只看单个分类并分页，第二页是剩下的结果"""
+        url = reverse('haystack_search')
+        first = self.client.get(url, {'q': 'graphene', 'type': 'post'}).context['page']
+        second = self.client.get(url, {'q': 'graphene', 'type': 'post', 'page': 2}).context['page']
+
+        self.assertEqual((len(first.object_list), first.has_next()), (10, True))
+        self.assertEqual((second.number, len(second.object_list), second.has_next()), (2, 2, False))
+        seen = {result.pk for result in first.object_list} | {result.pk for result in second.object_list}
+        self.assertEqual(len(seen), 12)
+        self.assertTrue(all(result.category == 'post' for result in second.object_list))
+
+
+@tag('benchmark')
+class StartupImportTest(TestCase):
+    """
+    启动基准：在新的解释器里按 Web / Celery worker 的启动路径导入项目 (-X importtime)，
+    重依赖必须延迟到首次使用，导入总耗时不超过预算
+    """
+    STARTUP_BUDGET_MS = 2000
+
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     numpy.version\n"
+            "import time:       300 |        420 |   numpy\n"
+            "import time:        50 |        470 | npy_editor.utils\n"
+        )
+        records = parse_importtime(output)
+        self.assertEqual([(r.module, r.depth) for r in records], [('numpy.version', 2), ('numpy', 1), ('npy_editor.utils', 0)])
+        self.assertEqual(package_totals(records), {'numpy': 420, 'npy_editor': 50})
+
+    def test_startup_imports(self):
+        for target in TARGETS:
+            with self.subTest(target=target):
+                result = profile_startup(target)
+                self.assertEqual(result['deferred_loaded'], [], f'{target} 启动时导入了重依赖')
+                self.assertLess(result['total_ms'], self.STARTUP_BUDGET_MS, f'{target} 导入耗时 {result["total_ms"]:.0f}ms')
+
+
+class ServingProfileTest(TestCase):
+    def test_worker_and_thread_counts(self):
+        """测试：进程 / 线程数按 CPU 计算并封顶，WEB_CONCURRENCY 可以覆盖"""
+        with mock.patch.dict(os.environ):
+            for name in ('WEB_CONCURRENCY', 'GUNICORN_THREADS', 'WEB_MAX_WORKERS'):
+                os.environ.pop(name, None)
+            self.assertEqual(worker_count('asgi', cpus=4), 9)
+            self.assertEqual(worker_count('wsgi', cpus=4), 5)
+            self.assertEqual(worker_count('asgi', cpus=64), 12)
+            self.assertEqual(thread_count('wsgi', cpus=1), 4)
+            self.assertEqual(thread_count('asgi', cpus=4), 1)
+
+            os.environ['WEB_CONCURRENCY'] = '3'
+            self.assertEqual(worker_count('asgi', cpus=64), 3)
+
+    def test_serve_media(self):
+        """测试：非 DEBUG 下上传文件带缓存头返回，禁止目录穿越，可交给 Nginx X-Accel-Redirect"""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        os.makedirs(os.path.join(media_root, 'avatars'))
+        with open(os.path.join(media_root, 'avatars', 'a.png'), 'wb') as f:
+            f.write(b'png')
+
+        with override_settings(MEDIA_ROOT=media_root):
+            response = self.client.get('/media/avatars/a.png')
+            self.assertEqual(b''.join(response.streaming_content), b'png')
+            self.assertIn(f'max-age={settings.MEDIA_CACHE_MAX_AGE}', response['Cache-Control'])
+            self.assertEqual(self.client.get('/media/../manage.py').status_code, 400)
+
+            with override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/'):
+                response = self.client.get('/media/avatars/a.png')
+                self.assertEqual(response['X-Accel-Redirect'], '/protected-media/avatars/a.png')
+                self.assertEqual(response.content, b'')
+                self.assertEqual(self.client.get('/media/avatars/missing.png').status_code, 404)
+
+
+class CountingEmailBackend(LocmemEmailBackend):
+    """记录建了几个连接；收件人含 flaky / bad 时模拟断线 / 550 拒收"""
+    connections = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        CountingEmailBackend.connections += 1
+
+    def send_messages(self, messages):
+        for message in messages:
+            if 'flaky' in message.to[0]:
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+            if 'bad' in message.to[0]:
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b'Mailbox not found')})
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='core.tests.CountingEmailBackend', MAIL_RATE_PER_SECOND=0)
+class MailQueueTest(TestCase):
+    def setUp(self):
+        CountingEmailBackend.connections = 0
+
+    def test_batch_over_one_connection_by_priority(self):
+        """测试：一批邮件共用一个连接，高优先级 (激活邮件) 先发"""
+        for i in range(3):
+            mail_service.enqueue(f'邀请 {i}', '正文', [f'user{i}@test.com'], priority=OutboundEmail.PRIORITY_LOW)
+        mail_service.enqueue('激活', '正文', ['new@test.com'], priority=OutboundEmail.PRIORITY_HIGH)
+
+        self.assertEqual(flush_outbox(), {'sent': 4, 'retry': 0, 'failed': 0})
+        self.assertEqual(CountingEmailBackend.connections, 1)
+        self.assertEqual([m.subject for m in mail.outbox], ['激活', '邀请 0', '邀请 1', '邀请 2'])
+        self.assertFalse(OutboundEmail.objects.exclude(status='sent').exists())
+
+    def test_transient_errors_back_off_permanent_errors_fail(self):
+        """测试：断线的邮件退避后重试，达到上限才放弃；550 拒收直接失败，不影响同批其它邮件"""
+        flaky = mail_service.enqueue('a', '正文', ['flaky@test.com'])
+        bad = mail_service.enqueue('b', '正文', ['bad@test.com'])
+        good = mail_service.enqueue('c', '正文', ['good@test.com'])
+
+        self.assertEqual(mail_service.send_batch(), {'sent': 1, 'retry': 1, 'failed': 1})
+        flaky.refresh_from_db()
+        bad.refresh_from_db()
+        good.refresh_from_db()
+        self.assertEqual((flaky.status, flaky.attempts), ('pending', 1))
+        self.assertGreater(flaky.send_after, timezone.now())
+        self.assertIn('SMTPRecipientsRefused', bad.last_error)
+        self.assertEqual((bad.status, good.status), ('failed', 'sent'))
+
+        # 还没到重试时间不会被领取；到点后再失败且达到上限则放弃
+        self.assertEqual(mail_service.send_batch(), {'sent': 0, 'retry': 0, 'failed': 0})
+        OutboundEmail.objects.filter(pk=flaky.pk).update(send_after=timezone.now(), attempts=mail_service.max_attempts - 1)
+        self.assertEqual(mail_service.send_batch()['failed'], 1)
+
+    @override_settings(MAIL_BATCH_SIZE=2)
+    def test_full_batch_requeued_only_when_mail_went_out(self):
+        """测试：一批发满且有邮件发出时接着投递下一批；SMTP 连不上时不立即重投"""
+        for i in range(5):
+            mail_service.enqueue(f'邮件 {i}', '正文', [f'user{i}@test.com'])
+
+        with mock.patch('core.tasks.flush_outbox.apply_async') as apply_async:
+            self.assertEqual(flush_outbox()['sent'], 2)
+            self.assertEqual(apply_async.call_count, 1)
+
+            with mock.patch.object(CountingEmailBackend, 'open', side_effect=OSError('refused')):
+                self.assertEqual(flush_outbox(), {'sent': 0, 'retry': 2, 'failed': 0})
+            self.assertEqual(apply_async.call_count, 1)
+
+    def test_friend_request_does_not_wait_on_smtp(self):
+        """测试：加好友只写入发件箱，请求内不发邮件"""
+        me = User.objects.create_user(username='me', email='me@test.com', password='pass', status='student')
+        other = User.objects.create_user(username='other', email='other@test.com')
+        self.client.force_login(me)
+        self.client.get(reverse('user_app:add_friend', args=[other.pk]))
+
+        email = OutboundEmail.objects.get(category='friend_request')
+        self.assertEqual((email.to, email.status), (['other@test.com'], 'pending'))
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_task_invitations_written_with_task(self):
+        """测试：发布任务时邀请邮件随任务一起写入发件箱，Broker 不可用也能发布成功"""
+        me = User.objects.create_user(username='me', email='me@test.com', status='student', coins=10)
+        invitee = User.objects.create_user(username='invitee', email='invitee@test.com', status='student')
+        self.client.force_login(me)
+
+        with mock.patch('core.tasks.flush_outbox.apply_async', side_effect=OSError('refused')) as apply_async, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('tasks:task_create'), {
+                'title': '整理数据集', 'content': '内容', 'bounty': 5, 'task_type': 'bounty',
+                'deadline': (timezone.localtime() + timedelta(days=3)).strftime('%Y-%m-%dT%H:%M'),
+                'invitees': [invitee.pk],
+            })
+        self.assertRedirects(response, reverse('tasks:my_tasks'), fetch_redirect_response=False)
+        self.assertFalse(apply_async.call_args.kwargs['retry'])
+
+        email = OutboundEmail.objects.get(category='task_invitation')
+        self.assertEqual((email.to, email.status), (['invitee@test.com'], 'pending'))
+        self.assertIn('整理数据集', email.subject)
+
+
+class SingleThreadedLiveServer(LiveServerThread):
+    """内存 SQLite 测试库只有一个连接，多线程服务器并发处理请求会互相破坏事务状态"""
+
+    def _create_server(self, connections_override=None):
+        return WSGIServer((self.host, self.port), QuietWSGIRequestHandler, allow_reuse_address=False)
+
+
+@tag('benchmark')
+@override_settings(QUERY_PROFILER_ENABLED=False)
+class LoadTestHarnessTest(LiveServerTestCase):
+    """压测工具冒烟：对测试服务器短时间跑一遍全部场景，所有接口都有样本且没有错误"""
+    server_thread_class = SingleThreadedLiveServer
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_run_all_scenarios(self):
+        users = seed_load_users(3, posts_per_user=2, words=20)
+        self.assertEqual(len(seed_load_users(3, posts_per_user=2, words=20)), 3)  # 可重复执行
+
+        stats, elapsed, failed_logins = run_load(self.live_server_url, users, DEFAULT_PASSWORD, duration=3)
+        report = stats.report(elapsed)
+
+        self.assertEqual(failed_logins, 0)
+        self.assertGreater(report['TOTAL']['requests'], len(SCENARIO_WEIGHTS))
+        for name in ('post_list', 'feed', 'notification_poll', 'chat_poll'):
+            self.assertIn(name, report)
+        for name, row in report.items():
+            self.assertEqual(row['errors'], 0, name)
+            self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+            self.assertLessEqual(row['p95_ms'], row['p99_ms'])
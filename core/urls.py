@@ -11,4 +11,9 @@ urlpatterns = [
     path('console/classes/create/', views.class_create_or_edit, name='class_create'),
     path('console/classes/edit/<int:pk>/', views.class_create_or_edit, name='class_edit'),
     path('console/classes/delete/<int:pk>/', views.class_delete, name='class_delete'),
+
+    # 请求 SQL 剖析 (仅员工)
+    path('console/queries/', views.query_profile, name='query_profile'),
+    # 缓存命中率 (仅员工)
+    path('console/cache/', views.cache_stats, name='cache_stats'),
 ]
\ No newline at end of file
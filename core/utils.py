@@ -0,0 +1,13 @@
+from django.db.models import Case, IntegerField, When
+
+
+def preserve_order(queryset, ids):
+    """
+    按 ids 的顺序排序 (全文检索按相关度返回的主键列表)
+    pk__in 过滤后数据库不保证顺序，这里用 CASE WHEN 把相关度排名带进 ORDER BY，分页也不会打乱
+    """
+    ids = list(dict.fromkeys(int(pk) for pk in ids))  # 去重，保留第一次出现的位置
+    if not ids:
+        return queryset.none()
+    rank = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).alias(search_rank=rank).order_by('search_rank')
@@ -1,26 +1,45 @@
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
+from django.core.paginator import Paginator
+from django.db.models import Count
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.views.static import serve as static_serve
+from haystack.inputs import AutoQuery
+from haystack.query import SearchQuerySet, SQ
+
 from news.models import Announcement
 from community.models import Post
-from django.db.models import Count
-from django.contrib.auth import get_user_model
-from django.utils import timezone
-from datetime import timedelta
-from tasks.models import TaskParticipant # 👈 引入模型
+from tasks.models import Task, TaskParticipant # 👈 引入模型
+from user_app.services import presence
+from vocabulary.models import Word
 
 # 👇 引入新模型
-from .models import ResearchTopic, Publication
-
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
-from django.contrib import messages
-from .models import LabClass
+from .models import ResearchTopic, Publication, LabClass
 from .forms import LabClassForm
+from .cache import FAILOVER_ERRORS
+from .profiling import profile_buffer
+from .services import fragment_cache
 
 
 User = get_user_model()
 
 def index(request):
     """
-    实验室门户主页 (原有的 index 视图保持不变)
+    实验室门户主页
+    公告 / 最新讨论 / 待办日程在模板里按片段缓存 ({% cache %}，key 带数据版本号)，
+    命中时下面的惰性 QuerySet 不会被执行；统计数字走对象缓存
     """
     announcements = Announcement.objects.all().order_by('-is_top', '-created_at')[:5]
     
@@ -28,11 +47,18 @@ def index(request):
         comment_count=Count('comments')
     ).order_by('-created_at')[:6]
 
-    total_users = User.objects.count()
-    total_posts = Post.objects.count()
+    groups = ['announcements', 'posts', 'users']
+    if request.user.is_authenticated:
+        groups.append(f'todos_{request.user.pk}')
+    versions = fragment_cache.versions(*groups)
+
+    stats = fragment_cache.get_or_set('home_stats', ['users', 'posts'], lambda: {
+        'users': User.objects.count(),
+        'posts': Post.objects.count(),
+    })
     
-    time_threshold = timezone.now() - timedelta(minutes=30)
-    online_users = User.objects.filter(last_login__gte=time_threshold).count()
+    # 在线人数：消息轮询 / 推送的心跳，按时间桶计数 (不查库)
+    online_users = presence.online_count()
     if online_users == 0 and request.user.is_authenticated:
         online_users = 1
 
@@ -51,20 +77,98 @@ def index(request):
     context = {
         'announcements': announcements,
         'recent_posts': recent_posts,
-        'stats': {
-            'users': total_users,
-            'posts': total_posts,
-            'online': online_users
-        },
+        'stats': {**stats, 'online': online_users},
         'my_todos': my_todos, # 👈 把这个传给模板
+        # 片段缓存的超时和各分组版本号
+        'fragment_timeout': fragment_cache.timeout,
+        'fragment_versions': versions,
+        'todos_version': versions.get(f'todos_{request.user.pk}'),
     }
     
     return render(request, 'index.html', context)
 
+# 👇👇👇 全站统一搜索 👇👇👇
+# (分类标识, 显示名称, 模型, 是否需要登录)
+SEARCH_CATEGORIES = [
+    ('post', '帖子', Post, False),
+    ('user', '用户', User, True),
+    ('task', '任务', Task, True),
+    ('announcement', '公告', Announcement, False),
+    ('publication', '论文', Publication, False),
+    ('word', '单词', Word, False),
+]
+SEARCH_PREVIEW_SIZE = 5
+
+
+def get_search_categories(user):
+    """当前用户可搜索的分类 (用户搜索与 search_users 一致，新生不可用)"""
+    categories = []
+    for key, label, model, need_login in SEARCH_CATEGORIES:
+        if need_login and not user.is_authenticated:
+            continue
+        if key == 'user' and user.status not in ['student', 'alumni', 'faculty']:
+            continue
+        categories.append((key, label, model))
+    return categories
+
+
+def search(request):
+    """
+    全站统一搜索：帖子 / 用户 / 任务 / 公告 / 论文 / 单词
+    - 不带 type：每个分类各取前几条 + 各分类命中数 (分面统计)
+    - 带 type：只看该分类，分页展示
+    全部走全文索引，不在请求中做 icontains 扫表
+    """
+    query = request.GET.get('q', '').strip()
+    current_type = request.GET.get('type', '')
+    categories = get_search_categories(request.user)
+
+    context = {
+        'query': query,
+        'current_type': current_type,
+        'sections': [],
+        'facets': [],
+        'page': None,
+    }
+    if not query or not categories:
+        return render(request, 'search/search.html', context)
+
+    sqs = SearchQuerySet().models(*[model for _, _, model in categories]).filter(
+        SQ(content=AutoQuery(query)) | SQ(name_auto=query)
+    ).highlight()
+
+    # 1. 分面统计：一次查询拿到各分类命中数
+    facet_counts = dict(sqs.facet('category').facet_counts().get('fields', {}).get('category', []))
+    context['facets'] = [
+        {'key': key, 'label': label, 'count': facet_counts.get(key, 0)}
+        for key, label, _ in categories
+    ]
+    context['total_count'] = sum(item['count'] for item in context['facets'])
+
+    # 2. 单个分类：分页
+    category_map = {key: (label, model) for key, label, model in categories}
+    if current_type in category_map:
+        paginator = Paginator(sqs.filter(category=current_type).load_all(), 10)
+        context['page'] = paginator.get_page(request.GET.get('page'))
+        return render(request, 'search/search.html', context)
+
+    # 3. 全部分类：每类预览前几条
+    for key, label, model in categories:
+        if not facet_counts.get(key):
+            continue
+        results = sqs.filter(category=key).load_all()[:SEARCH_PREVIEW_SIZE]
+        context['sections'].append({
+            'key': key,
+            'label': label,
+            'count': facet_counts[key],
+            'results': results,
+        })
+    return render(request, 'search/search.html', context)
+
 # 👇👇👇 新增：实验室介绍视图 👇👇👇
 def lab_intro(request):
     """
-    实验室介绍页
+    实验室介绍页 (整页内容在模板里按 lab_intro / users 版本号片段缓存，命中时不查库)
     """
     topics = ResearchTopic.objects.all()
     
@@ -81,6 +185,8 @@ def lab_intro(request):
         'faculties': faculties, # 👈 传递新的导师列表
         'students': students,
         'publications': publications,
+        'fragment_timeout': fragment_cache.timeout,
+        'fragment_versions': fragment_cache.versions('lab_intro', 'users'),
     }
     return render(request, 'core/intro.html', context)
 
@@ -219,4 +325,77 @@ def class_delete(request, pk):
     lab_class.delete()
     
     messages.success(request, f"班级“{name}”已成功解散。")
-    return redirect('core:class_management')
\ No newline at end of file
+    return redirect('core:class_management')
+
+
+# 👇👇👇 请求 SQL 剖析 (仅员工) 👇👇👇
+@staff_member_required
+def query_profile(request):
+    """
+    按视图汇总最近请求的 SQL 条数 / 耗时 (数据来自 QueryProfilerMiddleware 的环形缓冲区)
+    ?recent=N 同时返回最近 N 条原始记录；POST ?clear=1 清空缓冲区
+    """
+    if request.method == 'POST' and request.POST.get('clear'):
+        profile_buffer.clear()
+
+    try:
+        recent = min(int(request.GET.get('recent', 20)), 500)
+    except ValueError:
+        recent = 20
+
+    records = profile_buffer.records()
+    return JsonResponse({
+        'buffered': len(records),
+        'views': profile_buffer.summary(),
+        'recent': records[-recent:][::-1] if recent > 0 else [],
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+# 👇👇👇 缓存命中率看板 (仅员工) 👇👇👇
+@staff_member_required
+def cache_stats(request):
+    """
+    共享缓存各 key 前缀的命中率 (所有进程累加)，以及当前是否已切到本机备用缓存
+    主后端是 Redis 时附带服务端 INFO stats 的命中 / 未命中 / 内存数据
+    """
+    if not hasattr(cache, 'read_stats'):
+        return JsonResponse({'backend': cache.__class__.__name__, 'groups': []})
+
+    data = {
+        'backend': cache.primary.__class__.__name__,
+        'using_fallback': cache.using_fallback,
+        'groups': cache.read_stats(),
+    }
+    if not cache.using_fallback and isinstance(cache.primary, RedisCache):
+        try:
+            client = cache.primary._cache.get_client()
+            info = {**client.info('stats'), **client.info('memory')}
+            data['redis'] = {
+                'keyspace_hits': info.get('keyspace_hits'),
+                'keyspace_misses': info.get('keyspace_misses'),
+                'evicted_keys': info.get('evicted_keys'),
+                'used_memory_human': info.get('used_memory_human'),
+            }
+        except FAILOVER_ERRORS:
+            data['redis'] = None
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+# 👇👇👇 生产环境 (DEBUG=False) 的上传文件访问 👇👇👇
+def serve_media(request, path):
+    """
+    /media/<path>：配置了 MEDIA_ACCEL_REDIRECT 时只返回 X-Accel-Redirect 头，由 Nginx sendfile 发送；
+    否则用 FileResponse 返回 (gunicorn 下走 wsgi.file_wrapper / sendfile，不在 Python 里逐块读)
+    上传文件名带 UUID / 内容哈希，不会原地修改，可以让浏览器缓存较长时间
+    """
+    if settings.MEDIA_ACCEL_REDIRECT:
+        full_path = safe_join(settings.MEDIA_ROOT, path)  # 目录穿越抛 SuspiciousFileOperation -> 400
+        if not os.path.isfile(full_path):
+            raise Http404
+        response = HttpResponse(content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT.rstrip('/') + '/' + quote(path)
+    else:
+        # 同样带 Last-Modified / If-Modified-Since 304 处理
+        response = static_serve(request, path, document_root=settings.MEDIA_ROOT)
+    patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
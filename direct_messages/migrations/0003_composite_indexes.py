@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('direct_messages', '0002_message_is_email_sent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'recipient', 'timestamp'], name='msg_pair_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_email_sent', False), ('is_read', False)), fields=['timestamp'], name='msg_unread_email_idx'),
+        ),
+    ]
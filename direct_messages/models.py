@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
 
 class Message(models.Model):
@@ -25,6 +26,13 @@ class Message(models.Model):
         ordering = ['timestamp']
         verbose_name = '私信'
         verbose_name_plural = verbose_name
+        indexes = [
+            # 聊天记录 / 轮询新消息 / 标记已读：WHERE sender = ? AND recipient = ? ORDER BY timestamp
+            models.Index(fields=['sender', 'recipient', 'timestamp'], name='msg_pair_time_idx'),
+            # 未读邮件提醒 (每分钟)：WHERE NOT is_read AND NOT is_email_sent AND timestamp <= ?
+            # SQLite 上布尔条件会编译成 NOT col，普通复合索引用不上，改用部分索引
+            models.Index(fields=['timestamp'], condition=Q(is_read=False, is_email_sent=False), name='msg_unread_email_idx'),
+        ]
 
     def __str__(self):
         # 修改这里以避免之前的弹窗格式问题，只返回简单描述
@@ -1,13 +1,12 @@
 # direct_messages/tasks.py
 
 from celery import shared_task
-from django.core.mail import send_mail
-from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth import get_user_model
 from django.db.models import Count
 from .models import Message
+from core.services import mail_service
 
 User = get_user_model()
 
@@ -105,13 +104,8 @@ def send_unread_message_reminders():
         """
         
         try:
-            send_mail(
-                subject,
-                email_body,
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                fail_silently=False
-            )
+            # 写入发件箱，由 mail 队列统一发送 (失败会自动退避重试)
+            mail_service.enqueue(subject, email_body, [user.email], category='message_reminder')
             
             # 4. 标记这些消息为已发送提醒
             # 收集所有消息ID
@@ -122,7 +116,7 @@ def send_unread_message_reminders():
             Message.objects.filter(id__in=all_msg_ids).update(is_email_sent=True)
             
             email_count += 1
-            print(f"✅ 已发送提醒邮件给 {user.username}，汇总 {total_msgs} 条消息，来自 {len(sender_list)} 位发送者")
+            print(f"✅ 已加入发件箱：提醒邮件给 {user.username}，汇总 {total_msgs} 条消息，来自 {len(sender_list)} 位发送者")
             
         except Exception as e:
             print(f"❌ 发送邮件给 {user.username} 失败: {e}")
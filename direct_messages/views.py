@@ -1,15 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
-from django.db.models import Q,Max
+from django.db.models import Q, Max, F, Case, When
 from .models import Message
 from django.urls import reverse
-from notifications.models import Notification
+from notifications.services import notifier
 from django.contrib import messages 
 from user_app.models import Friendship # 引用 Friendship
+from user_app.avatars import avatar_url # 按尺寸取头像
 from django.http import JsonResponse # 👈 新增引入
 from django.utils import timezone # 👈 用于格式化时间
 from django.urls import reverse
+from core.sqlite import retry_on_locked
+from user_app.services import presence
 User = get_user_model()
 
 
@@ -17,54 +20,41 @@ User = get_user_model()
 def inbox(request):
     user = request.user
     
-    # 1. 获取所有好友列表
+    # 1. 每个会话对象的最后一条消息：一条聚合查询按对方分组取最大 ID，再批量取出消息
+    #    (ID 随发送时间递增，最大 ID 即最新一条；避免逐个好友 / 会话查询)
+    last_ids = Message.objects.filter(Q(sender=user) | Q(recipient=user)).annotate(
+        other_id=Case(When(sender=user, then=F('recipient_id')), default=F('sender_id'))
+    ).values('other_id').annotate(last_id=Max('id')).values_list('other_id', 'last_id')
+    last_ids = dict(last_ids)
+    last_messages = Message.objects.in_bulk(last_ids.values())
+    last_msg_of = {other_id: last_messages.get(msg_id) for other_id, msg_id in last_ids.items()}
+
+    # 2. 获取所有好友列表
     # 查找所有 status='accepted' 的关系
     friend_relations = Friendship.objects.filter(
         Q(from_user=user) | Q(to_user=user),
         status='accepted'
-    )
+    ).select_related('from_user', 'to_user')
     
     friends_ids = set()
     friends_list = []
     
     for rel in friend_relations:
-        friend = rel.to_user if rel.from_user == user else rel.from_user
+        friend = rel.to_user if rel.from_user_id == user.id else rel.from_user
         friends_ids.add(friend.id)
-        # 顺便获取最后一条消息用于展示
-        last_msg = Message.objects.filter(
-            Q(sender=user, recipient=friend) | Q(sender=friend, recipient=user)
-        ).order_by('-timestamp').first()
-        
         friends_list.append({
             'user': friend,
-            'last_msg': last_msg
+            'last_msg': last_msg_of.get(friend.id)
         })
     
-    # 2. 获取临时聊天列表 (有过消息往来，但不是好友)
-    # 获取所有相关消息
-    all_conversations = Message.objects.filter(
-        Q(sender=user) | Q(recipient=user)
-    ).values('sender', 'recipient').annotate(last_time=Max('timestamp')).order_by('-last_time')
-    
-    temp_chat_ids = set()
-    temp_chat_list = []
-    
-    for convo in all_conversations:
-        other_id = convo['recipient'] if convo['sender'] == user.id else convo['sender']
-        
-        # 核心逻辑：如果这个人不在好友列表里，且没被处理过，加入临时聊天
-        if other_id not in friends_ids and other_id not in temp_chat_ids:
-            temp_chat_ids.add(other_id)
-            other_user = User.objects.get(pk=other_id)
-            
-            last_msg = Message.objects.filter(
-                Q(sender=user, recipient=other_user) | Q(sender=other_user, recipient=user)
-            ).order_by('-timestamp').first()
-            
-            temp_chat_list.append({
-                'user': other_user,
-                'last_msg': last_msg
-            })
+    # 3. 获取临时聊天列表 (有过消息往来，但不是好友)，按最后一条消息时间倒序
+    temp_ids = [other_id for other_id in last_msg_of if other_id not in friends_ids]
+    temp_users = User.objects.in_bulk(temp_ids)
+    temp_chat_list = sorted(
+        ({'user': temp_users[other_id], 'last_msg': last_msg_of[other_id]} for other_id in temp_ids if other_id in temp_users),
+        key=lambda item: item['last_msg'].timestamp,
+        reverse=True,
+    )
 
     # 处理选中聊天的逻辑 (和以前一样，或者是简单的 placeholder)
     active_user_id = request.GET.get('uid')
@@ -73,20 +63,45 @@ def inbox(request):
     
     if active_user_id:
         active_user = get_object_or_404(User, pk=active_user_id)
-        messages = Message.objects.filter(
+        messages = Message.objects.select_related('sender').filter(
             Q(sender=user, recipient=active_user) | Q(sender=active_user, recipient=user)
         ).order_by('timestamp')
         # 标记已读
         messages.filter(recipient=user, is_read=False).update(is_read=True)
 
+    # 在线状态：好友 / 临时会话 / 当前会话对象一次批量读取
+    online_ids = presence.online_ids(
+        [item['user'].id for item in friends_list + temp_chat_list] + ([active_user.id] if active_user else [])
+    )
+    for item in friends_list + temp_chat_list:
+        item['online'] = item['user'].id in online_ids
+
     context = {
         'friends_list': friends_list,
         'temp_chat_list': temp_chat_list,
         'active_user': active_user,
+        'active_user_online': active_user is not None and active_user.id in online_ids,
         'messages': messages
     }
     return render(request, 'direct_messages/inbox.html', context)
 
+@retry_on_locked
+def deliver_message(sender, recipient, content):
+    """
+    写入一条私信并通知对方 (聊天室和收件箱快速发送共用)
+    锁冲突时只重试这一段写入，页面渲染、消息框清理等不会跟着重跑
+    """
+    msg = Message.objects.create(sender=sender, recipient=recipient, content=content)
+    # 连续私信合并为一条通知 (“发来了 N 条私信”)；指向 Inbox 页面并带上 uid，打开就是分栏视图并选中对方
+    notifier.notify(
+        recipient=recipient,
+        actor=sender,
+        verb='message',
+        target_url=reverse('direct_messages:inbox') + f'?uid={sender.id}',
+        content=content[:30]
+    )
+    return msg
+
 @login_required
 def chat_room(request, user_id):
     """聊天室 (支持 AJAX)"""
@@ -110,26 +125,7 @@ def chat_room(request, user_id):
         # 👆👆👆 修改结束 👆👆👆
 
         if content and content.strip():
-            msg = Message.objects.create(
-                sender=current_user,
-                recipient=target_user,
-                content=content
-            )
-            
-            # 👇👇👇 【修改点 1】修复通知跳转链接 👇👇👇
-            Notification.objects.create(
-                recipient=target_user,
-                actor=current_user,
-                verb='system', 
-                # 🔴 原来是指向 chat_room (可能被你视为旧版)
-                # target_url=reverse('direct_messages:chat_room', args=[current_user.id]),
-                
-                # 🟢 改为：指向 Inbox 页面，并带上 uid 参数，这样打开就是分栏视图并选中对方
-                target_url=reverse('direct_messages:inbox') + f'?uid={current_user.id}',
-                
-                content=f"发来一条私信: {content[:30]}..."
-            )
-            # 👆👆👆 修改结束 👆👆👆
+            msg = deliver_message(current_user, target_user, content)
             # AJAX 请求返回 JSON
             if is_ajax:
                 return JsonResponse({
@@ -137,7 +133,7 @@ def chat_room(request, user_id):
                     'id': msg.id,
                     'content': msg.content,
                     'timestamp': timezone.localtime(msg.timestamp).strftime('%H:%M'),
-                    'avatar_url': current_user.avatar.url if current_user.avatar else None,
+                    'avatar_url': avatar_url(current_user, 64) or None,
                     'username_char': current_user.username[0].upper()
                 })
             
@@ -154,6 +150,7 @@ def chat_room(request, user_id):
     
     return render(request, 'direct_messages/chat_room.html', {
         'target_user': target_user,
+        'target_online': presence.is_online(target_user.pk),
         'messages': messages_history
     })
 
@@ -212,24 +209,8 @@ def send_message(request):
         if recipient_id and content:
             recipient = get_object_or_404(User, pk=recipient_id)
             
-            # 2. 创建消息记录
-            Message.objects.create(
-                sender=request.user,
-                recipient=recipient,
-                content=content
-            )
-            
-            # 👇👇👇 【修改点 2】修复通知跳转链接 👇👇👇
-            Notification.objects.create(
-                recipient=recipient,
-                actor=request.user,
-                verb='system', 
-                # 🟢 改为：指向 Inbox 页面，并自动选中发送者
-                target_url=reverse('direct_messages:inbox') + f'?uid={request.user.id}',
-                
-                content=f"发来一条私信: {content[:30]}..."
-            )
-            # 👆👆👆 修改结束 👆👆👆
+            # 2. 创建消息记录并通知对方
+            deliver_message(request.user, recipient, content)
             return redirect(f"{reverse('direct_messages:inbox')}?uid={recipient_id}")
             
     return redirect('direct_messages:inbox')
@@ -268,7 +249,7 @@ def get_new_messages(request, sender_id):
             'id': msg.id,
             'content': msg.content,
             'timestamp': timezone.localtime(msg.timestamp).strftime('%H:%M'),
-            'avatar_url': sender.avatar.url if sender.avatar else None,
+            'avatar_url': avatar_url(sender, 64) or None,
             'username_char': sender.username[0].upper()
         })
         
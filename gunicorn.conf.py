@@ -0,0 +1,56 @@
+"""
+生产环境启动配置：gunicorn -c gunicorn.conf.py
+
+- SERVER_MODE=asgi (默认)：uvicorn worker 跑 myweb.asgi，通知未读数走 SSE 推送
+- SERVER_MODE=wsgi       ：gthread worker 跑 myweb.wsgi，前端回退为 3 秒轮询
+- 进程 / 线程数按可用 CPU 计算 (myweb/serving.py)，WEB_CONCURRENCY / GUNICORN_THREADS 可覆盖
+- 静态文件由 WhiteNoise 直接返回 (启动前自动 collectstatic)；/media/ 见 core.views.serve_media
+
+对比测试: python manage.py benchmark_startup
+"""
+import os
+import subprocess
+import sys
+
+from myweb.serving import thread_count, worker_count
+
+# 生产默认关闭 DEBUG；必须在 worker 导入 settings 之前设置，settings 按这两个变量选择存储和推送方式
+os.environ.setdefault('DJANGO_DEBUG', 'false')
+server_mode = os.environ.setdefault('SERVER_MODE', 'asgi')
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '8218')}")
+workers = worker_count(server_mode)
+
+if server_mode == 'asgi':
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    wsgi_app = 'myweb.asgi:application'
+else:
+    worker_class = 'gthread'
+    threads = thread_count(server_mode)
+    wsgi_app = 'myweb.wsgi:application'
+
+# 每个 worker 处理一定请求后重启，释放进程内缓冲区 (SQL 剖析、本机缓存) 累积的内存；加抖动避免同时重启
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# 前面有 Nginx 时信任其 X-Forwarded-* 头
+forwarded_allow_ips = os.getenv('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None  # 设为空字符串关闭访问日志
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """
+    master 启动时收集静态文件 (manifest 带哈希文件名，WhiteNoise 对其返回一年缓存头)
+    不预加载应用 (preload_app=False)，所以 worker 导入 Django 时文件已经就绪
+    """
+    if os.environ['DJANGO_DEBUG'].lower() == 'true' or os.getenv('COLLECTSTATIC_ON_START', 'true').lower() != 'true':
+        return
+    manage = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'manage.py')
+    subprocess.run([sys.executable, manage, 'collectstatic', '--noinput', '-v', '0'], check=True)
+    server.log.info('collectstatic 完成，%s 模式 %s 个 worker', server_mode, workers)
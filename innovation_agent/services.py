@@ -1,5 +1,5 @@
-import fitz  # PyMuPDF
-from openai import OpenAI
+# fitz (PyMuPDF) / openai 导入较慢 (合计约 0.5 秒)，在首次解析 PDF / 调用模型时才导入，
+# 不拖慢每个 Web / Celery 进程的启动 (URL 加载时会导入本模块)
 from django.conf import settings
 from .models import LLMConfiguration, InnovationProject, ProjectChatHistory
 from .utils import EncryptionManager
@@ -12,6 +12,8 @@ logger = logging.getLogger(__name__)
 class PDFProcessor:
     @staticmethod
     def extract_text(file_path):
+        import fitz  # PyMuPDF
+
         try:
             doc = fitz.open(file_path)
             text = ""
@@ -35,6 +37,8 @@ class LLMService:
             raise ValueError("请先在个人中心配置 AI 模型 API Key")
 
     def _init_client(self):
+        from openai import OpenAI
+
         raw_key = EncryptionManager().decrypt(self.config.encrypted_api_key)
         if not raw_key:
             raise ValueError("API Key 解密失败或未配置")
@@ -1,4 +1,3 @@
-from cryptography.fernet import Fernet
 import base64
 from django.conf import settings
 
@@ -7,6 +6,8 @@ class EncryptionManager:
     使用 Django 的 SECRET_KEY 作为种子进行加密解密
     """
     def __init__(self):
+        from cryptography.fernet import Fernet  # 首次加解密时才导入
+
         # 确保 key 是 32 url-safe base64-encoded bytes
         key = settings.SECRET_KEY[:32].encode() 
         # 如果 SECRET_KEY 不够长，补齐 (仅作演示，生产环境建议配置专门的 ENCRYPT_KEY)
@@ -20,4 +20,20 @@ app.conf.beat_schedule = {
         'task': 'tasks.tasks.auto_settle_expired_tasks',
         'schedule': 60.0, # 每 60 秒运行一次
     },
+    'notification-retention-daily': {
+        'task': 'notifications.tasks.apply_notification_retention',
+        'schedule': crontab(hour=4, minute=0), # 每天凌晨 4 点归档过期通知
+    },
+    'flush-outbox-every-minute': {
+        'task': 'core.tasks.flush_outbox',
+        'schedule': 60.0, # 补发投递失败 / 到了重试时间的邮件
+    },
+    'prefetch-github-trends': {
+        'task': 'Github_trend.tasks.prefetch_trends',
+        'schedule': 600.0, # 每 10 分钟预抓取趋势页 (语言 × 时间范围)
+    },
+    'purge-expired-registrations-daily': {
+        'task': 'user_app.tasks.purge_expired_registrations',
+        'schedule': crontab(hour=4, minute=30),
+    },
 }
\ No newline at end of file
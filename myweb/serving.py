@@ -0,0 +1,42 @@
+"""
+生产部署的进程 / 线程规模 (gunicorn.conf.py 使用，也供 benchmark_startup 复用)
+
+SERVER_MODE=asgi (默认)：uvicorn worker，异步视图 (SSE 推送) 不占线程；
+                        同步视图在每个 worker 内串行进入线程池，并发主要靠多进程
+SERVER_MODE=wsgi       ：gthread worker，每个进程 N 个线程；长连接 (SSE) 会一直占住一个线程
+
+WEB_CONCURRENCY / GUNICORN_THREADS 环境变量可以直接覆盖计算结果
+"""
+import os
+
+
+def cpu_count():
+    """当前进程可用的 CPU 数 (容器 / taskset 限制后的数量，而不是整机核数)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS / Windows
+        return os.cpu_count() or 1
+
+
+def worker_count(mode='asgi', cpus=None, max_workers=None):
+    """
+    asgi：2 × CPU + 1 (同步视图在 worker 内串行，靠进程数撑并发)
+    wsgi：CPU + 1 (每个进程还有多个线程，进程数不用翻倍)
+    """
+    if os.getenv('WEB_CONCURRENCY'):
+        return max(int(os.environ['WEB_CONCURRENCY']), 1)
+    cpus = cpus or cpu_count()
+    workers = cpus * 2 + 1 if mode == 'asgi' else cpus + 1
+    # 每个进程都有自己的连接池 / 本机缓存，进程过多反而挤占数据库连接
+    max_workers = max_workers or int(os.getenv('WEB_MAX_WORKERS', 12))
+    return min(workers, max_workers)
+
+
+def thread_count(mode='asgi', cpus=None):
+    """wsgi 每个进程的线程数：IO 等待为主 (数据库、Redis、GitHub API)，按 2 × CPU，4 ~ 16 之间"""
+    if mode != 'wsgi':
+        return 1
+    if os.getenv('GUNICORN_THREADS'):
+        return max(int(os.environ['GUNICORN_THREADS']), 1)
+    cpus = cpus or cpu_count()
+    return min(max(cpus * 2, 4), 16)
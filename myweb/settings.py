@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 # 👈 加载 .env 文件中的环境变量
@@ -25,13 +26,20 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-=%xw9+le5$nbl*!+e27i9z2wfui+(#bos3!n^xx68a2%anw3=t'
+SECRET_KEY = os.getenv('DJANGO_SECRET_KEY', 'django-insecure-=%xw9+le5$nbl*!+e27i9z2wfui+(#bos3!n^xx68a2%anw3=t')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-# ⚠️ 注意：正式上线请改为 False
-DEBUG = True
+# ⚠️ 注意：正式上线请改为 False (gunicorn.conf.py 默认设置 DJANGO_DEBUG=false)
+DEBUG = os.getenv('DJANGO_DEBUG', 'true').lower() == 'true'
 
 ALLOWED_HOSTS = ['49.234.26.95', '127.0.0.1', 'localhost']
+ALLOWED_HOSTS += [host for host in os.getenv('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
+
+# python manage.py test 运行中
+TESTING = sys.argv[1:2] == ['test']
+
+# 部署方式：'' = runserver 开发；asgi / wsgi = gunicorn (见 gunicorn.conf.py)
+SERVER_MODE = os.getenv('SERVER_MODE', '')
 
 
 # Application definition
@@ -58,13 +66,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # 请求 SQL 剖析：放在最前面，统计包含其它中间件的查询和耗时
+    'core.middleware.QueryProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # 静态文件直接在这里返回 (gzip / brotli 预压缩 + 长缓存头)，不进入后面的中间件和视图
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # 请求内产生的通知合并后批量写入
+    'notifications.middleware.NotificationBufferMiddleware',
 ]
 
 ROOT_URLCONF = 'myweb.urls'
@@ -92,11 +106,52 @@ WSGI_APPLICATION = 'myweb.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (默认，单机) / postgres (多进程、多机部署)
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'web218'),
+            'USER': os.getenv('POSTGRES_USER', 'web218'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', '127.0.0.1'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,  # 复用连接前先检查是否已断开 (数据库重启后自动重连)
+            'OPTIONS': {},
+        }
+    }
+    if os.getenv('POSTGRES_POOL', 'false').lower() == 'true':
+        # psycopg 连接池：每个进程最多 max_size 个连接，请求结束归还 (与 CONN_MAX_AGE 互斥)
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('POSTGRES_POOL_MIN', 2)),
+            'max_size': int(os.getenv('POSTGRES_POOL_MAX', 10)),
+            'timeout': 10,
+        }
+    else:
+        # 持久连接：每个线程的连接保留 DB_CONN_MAX_AGE 秒，省去每个请求的建连开销
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 60))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # 事务开始即拿写锁 (BEGIN IMMEDIATE)，避免读后写的锁升级直接报 database is locked
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
+
+# 每个新 SQLite 连接执行的 PRAGMA (core.sqlite.configure_connection)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -20000,  # 约 20MB
+    'temp_store': 'memory',
 }
 
 
@@ -136,6 +191,17 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 # STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')] # 确保这一行存在
+STATIC_ROOT = BASE_DIR / 'staticfiles'  # collectstatic 输出目录
+
+# 生产环境：collectstatic 时生成带哈希的文件名和 .gz/.br，WhiteNoise 返回一年缓存头
+# 开发 / 测试不需要先 collectstatic
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG or TESTING
+        else 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 
 # 自定义用户模型
 AUTH_USER_MODEL = 'user_app.CustomUser'
@@ -143,6 +209,14 @@ AUTH_USER_MODEL = 'user_app.CustomUser'
 # 媒体文件配置 (用于存放头像)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# 非 DEBUG 时 /media/ 由 core.views.serve_media 返回；前面有 Nginx 时设为 internal location 前缀
+# (例如 /protected-media/)，视图只返回 X-Accel-Redirect 头，文件由 Nginx sendfile 发送
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', '')
+MEDIA_CACHE_MAX_AGE = 7 * 24 * 3600
+
+# 编辑器图片上传：大小上限、后台生成的变体宽度 (px，用于 srcset)
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
 
 # 登录相关跳转
 LOGIN_REDIRECT_URL = 'home'
@@ -173,15 +247,58 @@ EMAIL_USE_SSL = False  # 👈 关闭 SSL (这两个不能同时为 True)
 
 EMAIL_FROM = EMAIL_HOST_USER
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
-
-# 缓存配置 (开发环境使用内存缓存)
-CACHES = {
-    'default': {
+EMAIL_TIMEOUT = 20  # SMTP 连接 / 发送超时 (秒)
+
+# 邮件发件箱 (core.services.mail_service)：每批领取数、每秒最多发送数 (QQ 邮箱等有频率限制)、
+# 最多尝试次数、重试退避基数 (秒，按 2 的幂增长)
+MAIL_BATCH_SIZE = 50
+MAIL_RATE_PER_SECOND = float(os.getenv('MAIL_RATE_PER_SECOND', 5))
+MAIL_MAX_ATTEMPTS = 5
+MAIL_RETRY_BACKOFF = 60
+
+# 👇👇👇 缓存配置：多进程共享 👇👇👇
+# CACHE_BACKEND=redis (默认)：Redis 为主 (与 Celery 共用实例，单独用 2 号库)，连不上时自动切到本机文件缓存
+# CACHE_BACKEND=file：只用本机文件缓存 (单机多进程)
+# CACHE_BACKEND=locmem：进程内缓存，仅限单进程开发；跑测试时默认使用，避免 clear() 清掉共享缓存
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem' if TESTING else 'redis')
+REDIS_CACHE_URL = os.getenv('REDIS_CACHE_URL', 'redis://127.0.0.1:6379/2')
+CACHE_FILE_DIR = os.getenv('CACHE_FILE_DIR', str(BASE_DIR / 'cache'))
+
+_CACHE_TIERS = {
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_CACHE_URL,
+        # 连接超时要短：Redis 挂掉时尽快切到本机缓存，而不是卡住请求
+        'OPTIONS': {'socket_connect_timeout': 0.5, 'socket_timeout': 0.5},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_FILE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
+    },
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.ResilientCache',
+        'OPTIONS': {
+            'PRIMARY': _CACHE_TIERS[CACHE_BACKEND],
+            'FALLBACK': _CACHE_TIERS['file'] if CACHE_BACKEND == 'redis' else None,
+            'RETRY_AFTER': 30,  # 切到本机缓存后，30 秒后再试 Redis
+        },
     }
 }
 
+# 首页 / 实验室介绍页片段缓存 (core.services.fragment_cache)：数据变化时由信号递增版本号立即失效，
+# 超时只兜底相对时间 ("3 分钟前") 和未覆盖的字段
+FRAGMENT_CACHE_TIMEOUT = 300
+
+# 待激活的注册信息有效期 (秒)，存数据库 (PendingRegistration)，不依赖缓存
+REGISTRATION_TOKEN_TTL = 86400
+
 
 # ==================================
 # Celery 配置
@@ -191,17 +308,88 @@ CELERY_RESULT_BACKEND = 'redis://127.0.0.1:6379/1'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
+# 请求内投递任务时 Broker 连不上：只快速重试一次就报错，交给调用方降级 (同步执行 / 定时任务补发)
+# 默认会按 2 秒间隔反复重连，压测和线上都会把请求拖住；Worker 自身的重连不受这里影响
+CELERY_BROKER_CONNECTION_TIMEOUT = 2
+CELERY_BROKER_TRANSPORT_OPTIONS = {'max_retries': 1, 'interval_start': 0, 'interval_step': 0.2, 'interval_max': 0.5}
+# 邮件单独一个队列 (Procfile 的 mail 进程，-c 1)，批量邀请不会挤占其它任务，也不会并发打满 SMTP
+CELERY_TASK_ROUTES = {
+    'core.tasks.flush_outbox': {'queue': 'mail'},
+}
 
 # ==================================
 # Haystack + Whoosh 全文检索配置
 # ==================================
+WHOOSH_INDEX_PATH = os.path.join(BASE_DIR, 'whoosh_index')
+if TESTING:
+    # 测试写入临时目录 (进程退出时删除)，不改动本地的正式索引
+    import atexit, shutil, tempfile
+    WHOOSH_INDEX_PATH = tempfile.mkdtemp(prefix='whoosh_test_')
+    atexit.register(shutil.rmtree, WHOOSH_INDEX_PATH, ignore_errors=True)
+
 HAYSTACK_CONNECTIONS = {
     'default': {
         'ENGINE': 'haystack.backends.whoosh_backend.WhooshEngine',
-        'PATH': os.path.join(BASE_DIR, 'whoosh_index'),
+        'PATH': WHOOSH_INDEX_PATH,
     },
 }
-HAYSTACK_SIGNAL_PROCESSOR = 'haystack.signals.RealtimeSignalProcessor'
+# 排队式增量索引：save() 只投递 (model, pk)，由 Celery 任务合并去重后批量提交
+# 对比测试: python manage.py benchmark_search_index
+HAYSTACK_SIGNAL_PROCESSOR = 'community.signals.QueuedSignalProcessor'
+HAYSTACK_QUEUE_COUNTDOWN = 5  # 投递后延迟 N 秒执行，合并短时间内的连续修改
+# text 字段的分析器：默认中文二元切分；装了 jieba 可改为 'jieba.analyse.ChineseAnalyzer'
+# 修改后需要 rebuild_index；效果评估: python manage.py evaluate_search_analyzer
+SEARCH_TEXT_ANALYZER = 'community.analyzers.ChineseAnalyzer'
+
+# 社区帖子列表 ?q= 关键词筛选使用的检索后端：
+# 'whoosh' -> 上面的 Haystack 索引；'fts5' -> SQLite FTS5 虚拟表 (community/fts.py，同时检索评论)
+# 对比测试: python manage.py benchmark_fts
+COMMUNITY_SEARCH_BACKEND = os.getenv('COMMUNITY_SEARCH_BACKEND', 'whoosh')
+
+# 关注动态：粉丝数超过该值的作者不写扩散 (读取时实时合并)；关注时回填对方最近 N 篇帖子
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+FEED_BACKFILL_SIZE = 50
+
+# 通知保留策略 (notifications.tasks.apply_notification_retention，每天执行)
+# 过期通知追加到 NOTIFICATION_ARCHIVE_DIR 下按月分文件的 gzip JSONL 后从表中删除
+# 默认只清理已读通知；确需清理长期未读的通知时再显式加上：
+#     {'is_read': False, 'older_than_days': 180, 'action': 'archive'},
+NOTIFICATION_RETENTION_POLICIES = [
+    {'is_read': True, 'older_than_days': 30, 'action': 'archive'},
+]
+NOTIFICATION_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archive', 'notifications')
+
+# GitHub 趋势 (Github_trend.services)：页面只查本地库 (Repository / RepoSnapshot)，
+# 某个组合超过 FRESH 秒没抓取时投递后台刷新，ETag 保留 STALE 秒；预抓取的页数和请求间隔
+# (搜索接口限流：带 GITHUB_TOKEN 每分钟 30 次)
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com/search/repositories')
+TRENDS_FRESH_SECONDS = 600
+TRENDS_STALE_SECONDS = 86400
+TRENDS_PREFETCH_PAGES = 1
+TRENDS_REQUEST_INTERVAL = 2.5
+# 同一仓库最多每 SNAPSHOT_INTERVAL 秒记一次星标快照，保留 RETENTION_DAYS 天；
+# 增速 = 最近 VELOCITY_WINDOW_HOURS 小时内首末两次快照的星标差 / 天数
+TRENDS_SNAPSHOT_INTERVAL = 3600
+TRENDS_SNAPSHOT_RETENTION_DAYS = 30
+TRENDS_VELOCITY_WINDOW_HOURS = 24
+
+# 请求 SQL 剖析 (core.middleware.QueryProfilerMiddleware)
+# 最近 N 个请求保存在进程内环形缓冲区，员工访问 /lab/console/queries/ 查看按视图汇总
+# 默认跟随 DEBUG (生产环境不剖析)，线上排查时设置 QUERY_PROFILER_ENABLED=true 临时开启
+QUERY_PROFILER_ENABLED = os.getenv('QUERY_PROFILER_ENABLED', str(DEBUG)).lower() == 'true'
+QUERY_PROFILER_BUFFER_SIZE = 500
+# 同一条 SQL (字面量归一化后) 在一个请求内重复达到该次数时记 WARNING 日志 (疑似 N+1)
+QUERY_PROFILER_N_PLUS_ONE_THRESHOLD = 10
+
+# 导航栏未读数：ASGI 部署时通过 SSE 推送 (notifications:api_stream)，否则前端每 3 秒轮询
+NOTIFICATION_STREAM_ENABLED = SERVER_MODE == 'asgi'
+NOTIFICATION_STREAM_MAX_SECONDS = 300  # 单个连接最长保持时间，到时浏览器 EventSource 自动重连
+NOTIFICATION_STREAM_INTERVAL = 3  # 检查未读数的间隔 (秒，读缓存计数)
+
+# 在线状态 (user_app.services.presence)：未读数轮询 / 推送兼作心跳，
+# 最近 WINDOW 秒内有心跳即算在线，按 BUCKET 秒分桶计数
+PRESENCE_WINDOW_SECONDS = 300
+PRESENCE_BUCKET_SECONDS = 60
 
 # ==================================
 # 消息框架配置 (修复白底白字问题)
@@ -214,4 +402,4 @@ MESSAGE_TAGS = {
     messages.SUCCESS: 'success',
     messages.WARNING: 'warning',
     messages.ERROR: 'danger', # 👈 关键：把 error 映射为 danger (红色背景)
-}
\ No newline at end of file
+}
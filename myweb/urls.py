@@ -15,7 +15,7 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include # 👈 记得导入 include
+from django.urls import path, re_path, include # 👈 记得导入 include
 from django.conf import settings      # 👈 导入 settings
 from django.conf.urls.static import static # 👈 导入 static
 from core import views as core_views # 👈 导入我们刚写的 core 视图
@@ -29,8 +29,8 @@ urlpatterns = [
     path('trends/', include('Github_trend.urls')),
     path('community/', include('community.urls')), # 👈 新增
     path('notifications/', include('notifications.urls')),
-    # 👇 新增：搜索路由
-    path('search/', include('haystack.urls')),
+    # 👇 全站统一搜索 (帖子/用户/任务/公告/论文/单词)
+    path('search/', core_views.search, name='haystack_search'),
     path('messages/', include('direct_messages.urls')), # 👈 新增
     path('lab/', include('core.urls')),      # 👈 新增这行，前缀设为 lab/
     # 👇👇👇 必须新增这一行 👇👇👇
@@ -45,4 +45,9 @@ urlpatterns = [
 
 # 👇 这一段是让开发环境能访问上传的图片（头像）
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+else:
+    # 生产环境 (gunicorn)：缓存头 + sendfile / X-Accel-Redirect，见 core.views.serve_media
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), core_views.serve_media, name='media'),
+    ]
\ No newline at end of file
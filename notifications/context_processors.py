@@ -1,7 +1,12 @@
-from .models import Notification
+from django.conf import settings
+from .services import inbox_service
 
 def unread_count(request):
     if request.user.is_authenticated:
-        count = Notification.objects.filter(recipient=request.user, is_read=False).count()
-        return {'unread_notification_count': count}
-    return {}
\ No newline at end of file
+        # 每个页面都会调用：读缓存计数，避免每次请求 COUNT(*)
+        count = inbox_service.get_counts(request.user)['unread']
+        return {
+            'unread_notification_count': count,
+            'notification_stream_enabled': settings.NOTIFICATION_STREAM_ENABLED,
+        }
+    return {}
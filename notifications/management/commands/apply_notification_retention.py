@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from notifications.services import retention_service
+
+
+class Command(BaseCommand):
+    help = '按 NOTIFICATION_RETENTION_POLICIES 归档 / 删除过期通知'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计命中条数，不做修改')
+        parser.add_argument('--batch-size', type=int, default=None, help='每批处理的记录数')
+
+    def handle(self, *args, **options):
+        if options['batch_size']:
+            retention_service.batch_size = options['batch_size']
+
+        for item in retention_service.run(dry_run=options['dry_run']):
+            policy = item['policy']
+            label = f"{'已读' if policy['is_read'] else '未读'}且超过 {policy['older_than_days']} 天 ({policy['action']})"
+            if options['dry_run']:
+                self.stdout.write(f'{label}：命中 {item["matched"]} 条')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✅ {label}：已处理 {item["processed"]} 条'))
@@ -0,0 +1,15 @@
+from .services import notifier
+
+
+class NotificationBufferMiddleware:
+    """
+    把一次请求内产生的所有通知合并为一批写入
+    (例如批量邀请、连续操作触发的多条同类通知)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with notifier.batch():
+            return self.get_response(request)
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0008_notification_cursor_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notif_recipient_read_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notif_read_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', 'created_at'], name='notif_recipient_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['created_at'], name='notif_created_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
 
 class Notification(models.Model):
@@ -17,6 +18,9 @@ class Notification(models.Model):
         ('task_accept', '接受任务'),
         ('task_reject', '拒绝任务'),
         ('task_settle', '任务结算'), # 获得赏金
+        ('task_reward', '任务奖励'), # 自动结算分得金币
+        # 👇👇👇 新增：私信 (连续私信合并为一条) 👇👇👇
+        ('message', '私信'),
     )
     
     recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications', verbose_name='接收者')
@@ -25,10 +29,21 @@ class Notification(models.Model):
     target_url = models.CharField('跳转链接', max_length=255)
     content = models.TextField('消息摘要', blank=True, null=True)
     is_read = models.BooleanField('已读', default=False)
+    # 合并次数：同一触发者对同一对象的重复事件合并为一行 (见 notifications.services)
+    count = models.PositiveIntegerField('合并次数', default=1)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # 未读数 / 一键已读 / 合并未读通知：WHERE recipient = ? AND NOT is_read
+            # (布尔条件在 SQLite 上编译为 NOT col，用部分索引才能命中)
+            models.Index(fields=['recipient', 'created_at'], condition=Q(is_read=False), name='notif_recipient_unread_idx'),
+            # 列表页游标分页：WHERE recipient = ? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notif_recipient_time_idx'),
+            # 保留策略清理：WHERE created_at < ? AND [NOT] is_read，按时间范围扫描
+            models.Index(fields=['created_at'], name='notif_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.actor} {self.get_verb_display()} - {self.recipient}"
\ No newline at end of file
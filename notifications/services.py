@@ -0,0 +1,270 @@
+import gzip
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationDispatcher:
+    """
+    通知分发服务 (所有通知都经由 notifier.notify() 创建)
+
+    1. 缓冲：请求 (NotificationBufferMiddleware) 或 batch() 范围内的通知先放进缓冲区，
+       范围结束时一次性写入 (bulk_create + bulk_update)；
+    2. 合并：同一 (接收者, 触发者, 动作, 跳转链接) 的重复事件合并为一行并累加 count，
+       若库里已有同键的未读通知，则直接累加到那一行并刷新时间 (“X 发来了 30 条私信”)；
+    3. 事务安全：在事务中调用时，事务提交后才进入缓冲区，回滚的操作不会发出通知。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _buffer(self):
+        if not hasattr(self._local, 'buffer'):
+            self._local.buffer = {}
+        return self._local.buffer
+
+    def _depth(self):
+        return getattr(self._local, 'depth', 0)
+
+    def notify(self, recipient, actor, verb, target_url, content=''):
+        """
+        :param recipient / actor: 用户对象或用户 ID
+        """
+        key = (getattr(recipient, 'pk', recipient), getattr(actor, 'pk', actor), verb, target_url)
+        transaction.on_commit(lambda: self._enqueue(key, content or ''))
+
+    def _enqueue(self, key, content):
+        buffer = self._buffer()
+        if key in buffer:
+            buffer[key]['count'] += 1
+            buffer[key]['content'] = content
+        else:
+            buffer[key] = {'count': 1, 'content': content}
+        # 不在 batch 范围内 (例如管理命令、Shell)：立即写入
+        if self._depth() == 0:
+            self.flush()
+
+    @contextmanager
+    def batch(self):
+        """范围内的通知合并后一次写入；范围内抛出异常时丢弃缓冲"""
+        self._local.depth = self._depth() + 1
+        try:
+            yield
+        except BaseException:
+            if self._depth() == 1:
+                self._local.buffer = {}
+            raise
+        finally:
+            self._local.depth = self._depth() - 1
+        if self._depth() == 0:
+            self.flush()
+
+    def flush(self):
+        events = self._buffer()
+        if not events:
+            return 0
+        self._local.buffer = {}
+        return self.write(events)
+
+    def write(self, events):
+        """
+        :param events: {(recipient_id, actor_id, verb, target_url): {'count': n, 'content': str}}
+        :return: 涉及的通知行数
+        """
+        # 1. 查出可以合并的未读通知 (按 IN 条件粗筛，再在内存中精确匹配键)
+        existing = {}
+        candidates = Notification.objects.filter(
+            is_read=False,
+            recipient_id__in={key[0] for key in events},
+            actor_id__in={key[1] for key in events},
+            verb__in={key[2] for key in events},
+        ).order_by('created_at')
+        for notice in candidates:
+            key = (notice.recipient_id, notice.actor_id, notice.verb, notice.target_url)
+            if key in events:
+                existing[key] = notice  # 有多条时保留最新的一条
+
+        # 2. 已有的累加，没有的新建
+        now = timezone.now()
+        to_update, to_create = [], []
+        for key, event in events.items():
+            notice = existing.get(key)
+            if notice:
+                notice.count += event['count']
+                notice.content = event['content']
+                notice.created_at = now
+                to_update.append(notice)
+            else:
+                recipient_id, actor_id, verb, target_url = key
+                to_create.append(Notification(
+                    recipient_id=recipient_id, actor_id=actor_id, verb=verb,
+                    target_url=target_url, content=event['content'], count=event['count'],
+                ))
+
+        if to_update:
+            Notification.objects.bulk_update(to_update, ['count', 'content', 'created_at'])
+        if to_create:
+            Notification.objects.bulk_create(to_create)
+        inbox_service.invalidate(*{key[0] for key in events})
+        return len(to_update) + len(to_create)
+
+
+class NotificationInboxService:
+    """
+    消息中心读取服务
+    1. 计数：未读数 / 总数一条聚合 SQL 算出后按用户缓存，导航栏轮询和上下文处理器都读缓存；
+       通知写入、标记已读、保留策略清理时调用 invalidate() 使其失效；
+    2. 分页：按 (created_at, id) 游标向前翻页，每次只查下一页，不随点击次数增长。
+    """
+    PAGE_SIZE = 6
+    CACHE_TIMEOUT = 300
+
+    def _counts_key(self, user_id):
+        return f"notification_counts_{user_id}"
+
+    def get_counts(self, user):
+        """:return: {'unread': 未读数, 'total': 总数}"""
+        user_id = getattr(user, 'pk', user)
+        counts = cache.get(self._counts_key(user_id))
+        if counts is None:
+            counts = Notification.objects.filter(recipient_id=user_id).aggregate(
+                total=Count('id'),
+                unread=Count('id', filter=Q(is_read=False)),
+            )
+            cache.set(self._counts_key(user_id), counts, self.CACHE_TIMEOUT)
+        return counts
+
+    def invalidate(self, *user_ids):
+        cache.delete_many([self._counts_key(user_id) for user_id in user_ids])
+
+    def mark_all_read(self, user):
+        count = Notification.objects.filter(recipient=user, is_read=False).update(is_read=True)
+        self.invalidate(user.pk)
+        return count
+
+    def mark_read(self, notice):
+        if not notice.is_read:
+            Notification.objects.filter(pk=notice.pk).update(is_read=True)
+            notice.is_read = True
+            self.invalidate(notice.recipient_id)
+
+    # ---------- 游标分页 ----------
+
+    def encode_cursor(self, created_at, notice_id):
+        delta = created_at - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+        return f"{delta // timedelta(microseconds=1)}_{notice_id}"
+
+    def decode_cursor(self, cursor):
+        """游标格式: <微秒时间戳>_<通知ID>，无效时返回 None (从头开始)"""
+        try:
+            micros, notice_id = (int(part) for part in cursor.split('_'))
+        except (AttributeError, ValueError):
+            return None
+        return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=micros), notice_id
+
+    def get_page(self, user, before=None, limit=None):
+        """
+        :param before: 上一页最后一条的游标，为空时取第一页
+        :return: (通知列表 (新到旧), 下一页游标或 None)
+        """
+        limit = limit or self.PAGE_SIZE
+        queryset = Notification.objects.filter(recipient=user).select_related('actor')
+        position = self.decode_cursor(before) if before else None
+        if position:
+            queryset = queryset.filter(
+                Q(created_at__lt=position[0]) | Q(created_at=position[0], id__lt=position[1])
+            )
+        # 多取一条用于判断是否还有下一页
+        rows = list(queryset.order_by('-created_at', '-id')[:limit + 1])
+        page = rows[:limit]
+        next_cursor = self.encode_cursor(page[-1].created_at, page[-1].pk) if len(rows) > limit else None
+        return page, next_cursor
+
+
+class NotificationRetentionService:
+    """
+    通知保留策略 (由 Celery Beat 每天执行)
+
+    settings.NOTIFICATION_RETENTION_POLICIES 中的每条规则：
+        {'is_read': True, 'older_than_days': 30, 'action': 'archive'}
+    action 为 'archive' 时先把记录追加到按月分文件的 gzip JSONL 归档 (NOTIFICATION_ARCHIVE_DIR)，
+    再从表中删除；'delete' 直接删除。每批 batch_size 条，按 created_at 索引范围扫描，
+    单次运行最多处理 max_batches 批，避免长时间占用数据库写锁。
+    默认只清理已读通知；未读通知需要在配置里显式加一条 is_read=False 的规则才会被清理。
+    """
+    DEFAULT_POLICIES = [
+        {'is_read': True, 'older_than_days': 30, 'action': 'archive'},
+    ]
+    ARCHIVE_FIELDS = ('id', 'recipient_id', 'actor_id', 'verb', 'target_url', 'content', 'count', 'is_read', 'created_at')
+
+    def __init__(self, batch_size=1000, max_batches=50):
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+
+    @property
+    def policies(self):
+        return getattr(settings, 'NOTIFICATION_RETENTION_POLICIES', self.DEFAULT_POLICIES)
+
+    @property
+    def archive_dir(self):
+        return getattr(settings, 'NOTIFICATION_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive', 'notifications'))
+
+    def run(self, dry_run=False):
+        """
+        :return: [{'policy': 规则, 'matched': 命中条数 (dry_run) / 'processed': 处理条数}, ...]
+        """
+        report = []
+        for policy in self.policies:
+            cutoff = timezone.now() - timedelta(days=policy['older_than_days'])
+            queryset = Notification.objects.filter(is_read=policy['is_read'], created_at__lt=cutoff)
+            if dry_run:
+                report.append({'policy': policy, 'matched': queryset.count()})
+                continue
+            report.append({'policy': policy, 'processed': self.apply(queryset, policy['action'])})
+        return report
+
+    def apply(self, queryset, action):
+        processed = 0
+        for _ in range(self.max_batches):
+            rows = list(queryset.order_by('created_at').values(*self.ARCHIVE_FIELDS)[:self.batch_size])
+            if not rows:
+                break
+            if action == 'archive':
+                self.archive(rows)
+            Notification.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+            inbox_service.invalidate(*{row['recipient_id'] for row in rows})
+            processed += len(rows)
+        if processed:
+            logger.info('通知保留策略 %s：处理 %s 条', action, processed)
+        return processed
+
+    def archive(self, rows):
+        """按通知创建月份追加到 notifications-YYYY-MM.jsonl.gz (gzip 支持多段追加)"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row['created_at'].strftime('%Y-%m'), []).append(row)
+
+        for month, items in by_month.items():
+            path = os.path.join(self.archive_dir, f'notifications-{month}.jsonl.gz')
+            with gzip.open(path, 'at', encoding='utf-8') as f:
+                for item in items:
+                    f.write(json.dumps(item, ensure_ascii=False, default=str) + '\n')
+
+
+notifier = NotificationDispatcher()
+inbox_service = NotificationInboxService()
+retention_service = NotificationRetentionService()
@@ -1,5 +1,5 @@
 from celery import shared_task
-from .models import Notification
+from .services import notifier, retention_service
 from django.contrib.auth import get_user_model
 import time
 
@@ -16,7 +16,7 @@ def send_system_notification(user_id, message):
     
     try:
         user = User.objects.get(pk=user_id)
-        Notification.objects.create(
+        notifier.notify(
             recipient=user,
             actor=user, # 系统通知暂时用自己当触发者，或者专门建个系统账号
             verb='system', # 你需要在 Notification model 的 choices 里加一个 'system'
@@ -27,4 +27,15 @@ def send_system_notification(user_id, message):
         return "Success"
     except User.DoesNotExist:
         print("用户不存在")
-        return "Failed"
\ No newline at end of file
+        return "Failed"
+
+
+@shared_task
+def apply_notification_retention():
+    """按保留策略归档 / 删除过期通知 (Celery Beat 每天凌晨执行)"""
+    report = retention_service.run()
+    return ", ".join(
+        f"{item['policy']['action']} is_read={item['policy']['is_read']} "
+        f">{item['policy']['older_than_days']}d: {item['processed']}"
+        for item in report
+    )
@@ -1,3 +1,172 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from user_app.services import presence
+
+from .models import Notification
+from .services import NotificationRetentionService, inbox_service, notifier
+
+User = get_user_model()
+
+
+class NotificationDispatcherTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@test.com')
+        self.bob = User.objects.create_user(username='bob', email='bob@test.com')
+
+    def test_batch_coalesces_and_bulk_writes(self):
+        """测试：同一批次内的重复事件合并为一行，整批一次写入"""
+        with self.captureOnCommitCallbacks(execute=True):
+            with notifier.batch():
+                for i in range(30):
+                    notifier.notify(self.bob, self.alice, 'message', '/messages/?uid=1', f'第 {i} 条')
+                notifier.notify(self.alice, self.bob, 'follow', '/users/profile/2/', '关注了你')
+                self.assertFalse(Notification.objects.exists())
+
+        notice = Notification.objects.get(recipient=self.bob)
+        self.assertEqual(notice.count, 30)
+        self.assertEqual(notice.content, '第 29 条')
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_merge_into_existing_unread(self):
+        """测试：已有同键未读通知时累加；已读后重新开始计数"""
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                notifier.notify(self.bob, self.alice, 'like', '/community/post/1/', '赞了你的帖子')
+        self.assertEqual(Notification.objects.get().count, 2)
+
+        Notification.objects.update(is_read=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            notifier.notify(self.bob, self.alice, 'like', '/community/post/1/', '赞了你的帖子')
+        self.assertEqual(list(Notification.objects.order_by('pk').values_list('count', flat=True)), [2, 1])
+
+    def test_chat_burst_creates_single_row(self):
+        """测试：连续发送私信只产生一条通知"""
+        self.client.force_login(self.alice)
+        url = reverse('direct_messages:chat_room', args=[self.bob.pk])
+        for i in range(5):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(url, {'content': f'hello {i}'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        notice = Notification.objects.get(recipient=self.bob)
+        self.assertEqual((notice.verb, notice.count, notice.content), ('message', 5, 'hello 4'))
+
+
+class NotificationInboxTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', email='alice@test.com')
+        self.bob = User.objects.create_user(username='bob', email='bob@test.com')
+        now = timezone.now()
+        Notification.objects.bulk_create([
+            Notification(recipient=self.bob, actor=self.alice, verb='like', target_url=f'/post/{i}/',
+                         created_at=now - timedelta(minutes=i // 2))  # 两两同一时间，验证 id 作为次序键
+            for i in range(15)
+        ])
+
+    def test_cursor_pages_cover_all_without_overlap(self):
+        """测试：按游标逐页请求，每页只返回下一批，不重复、不遗漏"""
+        seen, before = [], None
+        while True:
+            page, before = inbox_service.get_page(self.bob, before=before, limit=4)
+            seen.extend(notice.pk for notice in page)
+            if not before:
+                break
+        expected = Notification.objects.filter(recipient=self.bob).order_by('-created_at', '-id')
+        self.assertEqual(seen, list(expected.values_list('pk', flat=True)))
+
+        self.client.force_login(self.bob)
+        cursor = inbox_service.get_page(self.bob, limit=12)[1]
+        data = self.client.get(reverse('notifications:api_list'), {'before': cursor}).json()
+        self.assertEqual((data['count'], data['next_cursor'], data['total_count']), (3, None, 15))
+
+    def test_counts_cached_until_invalidated(self):
+        """测试：未读数走缓存，一键已读后失效"""
+        self.assertEqual(inbox_service.get_counts(self.bob), {'total': 15, 'unread': 15})
+        with self.assertNumQueries(0):
+            inbox_service.get_counts(self.bob)
+
+        inbox_service.mark_all_read(self.bob)
+        self.assertEqual(inbox_service.get_counts(self.bob), {'total': 15, 'unread': 0})
+
+
+class NotificationRetentionTest(TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        self.alice = User.objects.create_user(username='alice', email='alice@test.com')
+        self.bob = User.objects.create_user(username='bob', email='bob@test.com')
+
+    def make_notice(self, days_ago, is_read):
+        notice = Notification.objects.create(
+            recipient=self.bob, actor=self.alice, verb='like', target_url='/', is_read=is_read
+        )
+        Notification.objects.filter(pk=notice.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return notice
+
+    def test_old_read_notifications_archived_in_batches(self):
+        """测试：过期的已读通知分批写入归档并删除，近期和未读的保留"""
+        old = [self.make_notice(40, True) for _ in range(5)]
+        recent = self.make_notice(1, True)
+        unread = self.make_notice(40, False)
+
+        policies = [{'is_read': True, 'older_than_days': 30, 'action': 'archive'}]
+        service = NotificationRetentionService(batch_size=2)
+        with override_settings(NOTIFICATION_RETENTION_POLICIES=policies, NOTIFICATION_ARCHIVE_DIR=self.archive_dir):
+            report = service.run()
+
+        self.assertEqual(report[0]['processed'], 5)
+        self.assertEqual(set(Notification.objects.values_list('pk', flat=True)), {recent.pk, unread.pk})
+
+        archived = []
+        for name in os.listdir(self.archive_dir):
+            with gzip.open(os.path.join(self.archive_dir, name), 'rt', encoding='utf-8') as f:
+                archived.extend(json.loads(line)['id'] for line in f)
+        self.assertEqual(sorted(archived), sorted(n.pk for n in old))
+
+    def test_default_policy_keeps_unread(self):
+        """测试：默认策略不清理未读通知，无论多旧"""
+        old_read = self.make_notice(400, True)
+        old_unread = self.make_notice(400, False)
+
+        self.assertTrue(all(policy['is_read'] for policy in NotificationRetentionService.DEFAULT_POLICIES))
+        with override_settings(NOTIFICATION_ARCHIVE_DIR=self.archive_dir):
+            NotificationRetentionService().run()
+
+        self.assertFalse(Notification.objects.filter(pk=old_read.pk).exists())
+        self.assertTrue(Notification.objects.filter(pk=old_unread.pk).exists())
+
+
+class UnreadCountStreamTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', email='alice@test.com')
+        self.bob = User.objects.create_user(username='bob', email='bob@test.com')
+
+    @override_settings(NOTIFICATION_STREAM_MAX_SECONDS=0)
+    async def test_stream_sends_current_count(self):
+        """测试：SSE 首个事件为当前未读数，匿名访问返回 401 而不是跳转登录页"""
+        await Notification.objects.acreate(recipient=self.bob, actor=self.alice, verb='like', target_url='/')
+        url = reverse('notifications:api_stream')
+
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 401)
+
+        await self.async_client.aforce_login(self.bob)
+        response = await self.async_client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn('data: {"count": 1}\n\n', body)
+        # 推送连接兼作在线心跳
+        self.assertTrue(presence.is_online(self.bob.pk))
+        self.assertFalse(presence.is_online(self.alice.pk))
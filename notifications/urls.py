@@ -8,4 +8,7 @@ urlpatterns = [
     path('read/<int:pk>/', views.mark_read_and_redirect, name='read_and_redirect'),
     # 👇 新增 API 路由
     path('api/unread-count/', views.get_unread_count, name='api_unread_count'),
+    path('api/list/', views.notification_page, name='api_list'),
+    # SSE 推送未读数 (ASGI 部署时前端使用，见 NOTIFICATION_STREAM_ENABLED)
+    path('api/stream/', views.unread_count_stream, name='api_stream'),
 ]
\ No newline at end of file
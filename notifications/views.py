@@ -1,53 +1,65 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.template.loader import render_to_string
 from .models import Notification
-from django.http import JsonResponse
+from .services import inbox_service
+from user_app.services import presence
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.conf import settings
+from asgiref.sync import sync_to_async
+import asyncio
+import json
+import time
 
 @login_required
 def notification_list(request):
-    """消息列表页 - 支持分页和一键已读"""
-    all_notifications = request.user.notifications.all()
-    total_count = all_notifications.count()
-
-    # 获取显示数量参数（支持GET和POST）
-    if request.method == 'POST' and 'current_limit' in request.POST:
-        limit = int(request.POST.get('current_limit', 6))
-    else:
-        limit = int(request.GET.get('limit', 6))  # 默认显示6条
-
+    """消息列表页 - 首屏只渲染第一页，"更多" 通过 api_list 按游标追加；支持一键已读"""
     # 处理一键已读
     if request.method == 'POST' and 'mark_all_read' in request.POST:
-        count = request.user.notifications.filter(is_read=False).update(is_read=True)
+        count = inbox_service.mark_all_read(request.user)
         messages.success(request, f"已将 {count} 条通知标记为已读")
         return redirect('notifications:list')
 
-    # 处理点击"更多"
-    if request.method == 'POST' and 'load_more' in request.POST:
-        limit = limit + 5  # 每次多加载5条
+    notifications, next_cursor = inbox_service.get_page(request.user)
 
-    # 确保limit不超过总数
-    if limit > total_count:
-        limit = total_count
-
-    # 分页显示
-    notifications = all_notifications[:limit]
-    has_more = limit < total_count
+    total_count = inbox_service.get_counts(request.user)['total']
 
     context = {
         'notifications': notifications,
-        'has_more': has_more,
-        'current_limit': limit,
-        'total_count': total_count
+        'next_cursor': next_cursor,
+        'total_count': total_count,
+        'remaining_count': max(total_count - len(notifications), 0),
     }
     return render(request, 'notifications/list.html', context)
 
+@login_required
+def notification_page(request):
+    """
+    游标分页 API：?before=<上一页最后一条的游标>
+    只返回下一页 (渲染好的 HTML 片段)，前端直接追加到列表末尾
+    """
+    try:
+        limit = min(int(request.GET.get('limit', inbox_service.PAGE_SIZE)), 50)
+    except ValueError:
+        limit = inbox_service.PAGE_SIZE
+
+    notifications, next_cursor = inbox_service.get_page(
+        request.user, before=request.GET.get('before'), limit=max(limit, 1)
+    )
+    html = render_to_string('notifications/includes/notice_item.html', {'notifications': notifications}, request=request)
+    return JsonResponse({
+        'html': html,
+        'count': len(notifications),
+        'next_cursor': next_cursor,
+        'total_count': inbox_service.get_counts(request.user)['total'],
+    })
+
 @login_required
 def mark_read_and_redirect(request, pk):
     """点击消息 -> 标记已读 -> 跳转"""
     notice = get_object_or_404(Notification, pk=pk, recipient=request.user)
-    notice.is_read = True
-    notice.save()
+    inbox_service.mark_read(notice)
     return redirect(notice.target_url)
 
 @login_required
@@ -59,5 +71,47 @@ def get_unread_count(request):
     if not request.user.is_authenticated:
         return JsonResponse({'count': 0})
         
-    count = Notification.objects.filter(recipient=request.user, is_read=False).count()
-    return JsonResponse({'count': count})
\ No newline at end of file
+    # 轮询兼作在线心跳
+    presence.touch(request.user.pk)
+
+    # 读缓存计数，通知写入 / 已读时失效
+    count = inbox_service.get_counts(request.user)['unread']
+    return JsonResponse({'count': count})
+
+
+async def unread_count_stream(request):
+    """
+    SSE 推送：未读数变化时发送 data: {"count": N}，未变化时发送注释行保活
+    ASGI 部署下替代前端轮询 —— 连接挂起时只占一个协程，不占 worker 线程
+    连接保持 NOTIFICATION_STREAM_MAX_SECONDS 后由服务端关闭，浏览器按 retry 自动重连
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        # 不跳转登录页：EventSource 收到 HTML 只会不停重连
+        return HttpResponse(status=401)
+
+    interval = settings.NOTIFICATION_STREAM_INTERVAL
+    get_unread = sync_to_async(lambda: inbox_service.get_counts(user.pk)['unread'])
+    heartbeat = sync_to_async(presence.touch)
+
+    async def events():
+        yield f'retry: {interval * 1000}\n\n'
+        last_count = None
+        deadline = time.monotonic() + settings.NOTIFICATION_STREAM_MAX_SECONDS
+        while True:
+            # 连接保持期间每轮都算一次在线心跳
+            await heartbeat(user.pk)
+            count = await get_unread()
+            if count != last_count:
+                yield f'data: {json.dumps({"count": count})}\n\n'
+                last_count = count
+            else:
+                yield ': keep-alive\n\n'
+            if time.monotonic() + interval > deadline:
+                break
+            await asyncio.sleep(interval)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # 关闭 Nginx 对该响应的缓冲
+    return response
@@ -1,13 +1,13 @@
 # npy_editor/views.py
 import os
 import json
-import numpy as np
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.contrib.auth.decorators import login_required
-from .utils import DataProxy
+
+# DataProxy (.utils) 依赖 NumPy：各视图内按需导入，URL 加载时不导入 NumPy
 
 @login_required
 def editor_page(request):
@@ -17,6 +17,8 @@ def editor_page(request):
 @login_required
 def upload_file(request):
     """处理文件上传（主文件或融合文件）"""
+    from .utils import DataProxy
+
     if request.method == 'POST' and request.FILES.get('file'):
         file = request.FILES['file']
         file_type = request.POST.get('type', 'main') # 'main' or 'fusion'
@@ -56,6 +58,8 @@ def upload_file(request):
 @login_required
 def get_chart_data(request):
     """获取绘图数据（包含主文件和所有融合文件）"""
+    from .utils import DataProxy
+
     main_path = request.session.get('main_npy_path')
     if not main_path:
         return JsonResponse({'status': 'error', 'msg': 'No main file loaded'})
@@ -123,6 +127,8 @@ def get_chart_data(request):
 @login_required
 def update_data(request):
     """处理数据修改 (单点拖拽 or 批量区域操作)"""
+    from .utils import DataProxy
+
     if request.method == 'POST':
         try:
             body = json.loads(request.body)
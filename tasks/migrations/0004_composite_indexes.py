@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_task_is_class_task'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'deadline'], name='task_status_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskparticipant',
+            index=models.Index(fields=['user', 'status'], name='participant_user_status_idx'),
+        ),
+    ]
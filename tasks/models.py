@@ -42,6 +42,10 @@ class Task(models.Model):
         verbose_name_plural = verbose_name
         # 👇 修改排序：导师任务优先，然后按时间倒序
         ordering = ['-task_type', '-created_at']
+        indexes = [
+            # 自动结算 (每分钟)：WHERE status IN (...) AND deadline <= ?
+            models.Index(fields=['status', 'deadline'], name='task_status_deadline_idx'),
+        ]
 
     def __str__(self):
         return f"[{self.get_status_display()}] {self.title}"
@@ -71,6 +75,10 @@ class TaskParticipant(models.Model):
         verbose_name = '参与记录'
         verbose_name_plural = verbose_name
         unique_together = ('task', 'user') # 一个人对一个任务只能有一条记录
+        indexes = [
+            # 首页日程 / 我参与的任务：WHERE user = ? AND status = ?
+            models.Index(fields=['user', 'status'], name='participant_user_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.get_status_display()}"
\ No newline at end of file
@@ -0,0 +1,19 @@
+from haystack import indexes
+from whoosh.analysis import KeywordAnalyzer
+from community.analyzers import get_text_analyzer
+from .models import Task
+
+class TaskIndex(indexes.SearchIndex, indexes.Indexable):
+    text = indexes.CharField(document=True, use_template=True, analyzer=get_text_analyzer())
+    status = indexes.CharField(model_attr='status')
+    pub_date = indexes.DateTimeField(model_attr='created_at')
+    # 统一搜索的分类 (用于分面统计)，不分词、不做词干化
+    category = indexes.CharField(default='task', analyzer=KeywordAnalyzer())
+
+    indexed_model_fields = ('title', 'content', 'creator', 'status', 'created_at')
+
+    def get_model(self):
+        return Task
+
+    def index_queryset(self, using=None):
+        return self.get_model().objects.select_related('creator')
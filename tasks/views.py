@@ -4,7 +4,7 @@ from django.contrib import messages
 from django.db import transaction
 from django.urls import reverse
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Q, Count
 from django.contrib.auth import get_user_model
 
 # 获取 User 模型
@@ -12,8 +12,36 @@ User = get_user_model()
 
 from .models import Task, TaskParticipant
 from .forms import TaskCreateForm
-from .tasks import send_task_invitation_emails
-from notifications.models import Notification
+from notifications.services import notifier
+from core.models import OutboundEmail
+from core.services import mail_service
+
+
+def build_invitation_emails(task, users):
+    """任务邀请邮件 (交给 mail_service.enqueue_many 写入发件箱)"""
+    subject = f"【Web 218 实验室】您收到一个新的悬赏任务邀请：{task.title}"
+    emails = []
+    for user in users:
+        if not user.email:
+            continue
+        message = f"""
+            你好 {user.nickname or user.username}：
+            
+            {task.creator.nickname or task.creator.username} 邀请你参加任务：
+            
+            ------------------------------------------------
+            任务标题：{task.title}
+            悬赏金币：🪙 {task.bounty}
+            截止时间：{task.deadline.strftime('%Y-%m-%d %H:%M')}
+            ------------------------------------------------
+            
+            请登录实验室查看详情并选择接受或拒绝。
+            """
+        emails.append({
+            'subject': subject, 'body': message, 'to': [user.email],
+            'category': 'task_invitation', 'priority': OutboundEmail.PRIORITY_LOW,
+        })
+    return emails
 
 # 1. 发布任务
 @login_required
@@ -88,15 +116,12 @@ def task_create(request):
 
                     # --- 3. 批量创建记录与通知 ---
                     participant_objs = []
-                    notification_objs = []
-                    recipient_ids_for_email = []
 
                     for user, status in final_participants.items():
                         # 创建参与记录对象
                         participant_objs.append(
                             TaskParticipant(task=task, user=user, status=status)
                         )
-                        recipient_ids_for_email.append(user.id)
                         
                         # 构建通知内容
                         if status == 'accepted':
@@ -109,24 +134,21 @@ def task_create(request):
                             content = f"邀请你参与悬赏任务：{task.title}"
                             notif_verb = 'task_invite'
 
-                        # 创建通知对象
-                        notification_objs.append(
-                            Notification(
-                                recipient=user,
-                                actor=request.user,
-                                verb=notif_verb,
-                                target_url=reverse('tasks:task_detail', args=[task.id]),
-                                content=content
-                            )
+                        # 通知 (请求结束时与其他通知一起批量写入)
+                        notifier.notify(
+                            recipient=user,
+                            actor=request.user,
+                            verb=notif_verb,
+                            target_url=reverse('tasks:task_detail', args=[task.id]),
+                            content=content
                         )
 
                     # 批量写入数据库 (性能优化)
                     # ignore_conflicts=True 在这里其实不需要了，因为我们用 dict 去重了，但留着保险
                     TaskParticipant.objects.bulk_create(participant_objs, ignore_conflicts=True)
-                    Notification.objects.bulk_create(notification_objs)
                     
-                    # 触发异步邮件任务
-                    send_task_invitation_emails.delay(task.id, recipient_ids_for_email)
+                    # 邀请邮件与任务同一事务写入发件箱，提交后才投递发送 (Broker 不可用也不影响发布)
+                    mail_service.enqueue_many(build_invitation_emails(task, final_participants))
 
                 # 成功提示
                 msg_type = "导师指令" if task.task_type == 'faculty' else "悬赏任务"
@@ -144,7 +166,9 @@ def task_create(request):
 @login_required
 def my_tasks(request):
     # Tab 1: 我发布的
-    created_tasks = Task.objects.filter(creator=request.user).order_by('-created_at')
+    created_tasks = Task.objects.filter(creator=request.user).annotate(
+        participant_count=Count('participants')
+    ).order_by('-created_at')
     
     # Tab 2: 我参与的 (被邀请 或 已接受)
     # 按更新时间排序，最近互动的排前面
@@ -204,7 +228,7 @@ def handle_invite(request, pk, action):
         messages.success(request, "您已接受该任务！它将出现在您的日程提醒中。")
         
         # 通知发起人
-        Notification.objects.create(
+        notifier.notify(
             recipient=task.creator,
             actor=request.user,
             verb='task_accept',
@@ -250,7 +274,7 @@ def settle_task(request, pk):
                     # 2. 发送获奖通知
                     content = f"恭喜！你在任务中被选为 MVP，获得 {task.bounty} 金币！" if task.bounty > 0 else "恭喜！你在导师任务中被选为 MVP！"
                     
-                    Notification.objects.create(
+                    notifier.notify(
                         recipient=winner,
                         actor=request.user,
                         verb='task_settle',
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class UserAppConfig(AppConfig):
     name = 'user_app'
+
+    def ready(self):
+        # 注册头像处理信号
+        from . import signals  # noqa: F401
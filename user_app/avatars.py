@@ -0,0 +1,96 @@
+"""
+头像多尺寸处理
+
+上传后按 AVATAR_SIZES 生成正方形居中裁剪的 WebP 版本 (avatars/<uuid>_<尺寸>.webp)，
+列表页、导航栏、聊天气泡按显示尺寸取对应版本，不再直接加载原图。
+更换头像时旧原图和旧尺寸版本一并删除。
+"""
+import io
+import logging
+import os
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+AVATAR_SIZES = (32, 64, 256)
+
+# 已确认存在的尺寸版本 (文件名带 UUID，换头像会换名字，“存在”的结果可以一直缓存)
+_existing_variants = set()
+
+# 确认不存在的尺寸版本 -> 过期时间 (历史头像可能随后在别的进程里被 rebuild_avatars 补齐，所以只短暂缓存)
+_missing_variants = {}
+MISSING_VARIANT_TTL = 300
+
+
+def variant_name(name, size):
+    stem, _ = os.path.splitext(name)
+    return f"{stem}_{size}.webp"
+
+
+def process_avatar(name):
+    """为头像原图生成全部尺寸版本，返回生成的文件名列表"""
+    try:
+        with default_storage.open(name, 'rb') as f:
+            image = Image.open(f)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (FileNotFoundError, UnidentifiedImageError, OSError) as e:
+        logger.warning(f"Avatar processing failed for {name}: {e}")
+        return []
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    created = []
+    for size in AVATAR_SIZES:
+        square = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        square.save(buffer, 'WEBP', quality=85)
+
+        target = variant_name(name, size)
+        if default_storage.exists(target):
+            default_storage.delete(target)
+        created.append(default_storage.save(target, ContentFile(buffer.getvalue())))
+        _existing_variants.add(target)
+        _missing_variants.pop(target, None)
+    return created
+
+
+def delete_avatar(name):
+    """删除头像原图及全部尺寸版本"""
+    if not name:
+        return
+    for target in [name] + [variant_name(name, size) for size in AVATAR_SIZES]:
+        _existing_variants.discard(target)
+        _missing_variants.pop(target, None)
+        if default_storage.exists(target):
+            default_storage.delete(target)
+
+
+def avatar_url(user, size=64):
+    """
+    取不小于 size 像素的最小尺寸版本的 URL
+    尺寸版本还不存在 (历史头像尚未处理) 时退回原图；没有头像返回空串
+    """
+    if not user or not user.avatar:
+        return ''
+    name = user.avatar.name
+    for candidate in AVATAR_SIZES:
+        if candidate >= size:
+            break
+    target = variant_name(name, candidate)
+    if target in _existing_variants:
+        return default_storage.url(target)
+    if _missing_variants.get(target, 0) > time.monotonic():
+        return user.avatar.url
+
+    if default_storage.exists(target):
+        _existing_variants.add(target)
+        _missing_variants.pop(target, None)
+        return default_storage.url(target)
+    _missing_variants[target] = time.monotonic() + MISSING_VARIANT_TTL
+    return user.avatar.url
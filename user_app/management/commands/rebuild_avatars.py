@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from user_app.avatars import process_avatar
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = '为已有头像补生成 32/64/256 尺寸版本'
+
+    def handle(self, *args, **options):
+        users = User.objects.exclude(avatar='').exclude(avatar__isnull=True).only('avatar')
+        done = failed = 0
+        for user in users.iterator():
+            if process_avatar(user.avatar.name):
+                done += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f'✅ 已处理 {done} 个头像，失败 {failed} 个'))
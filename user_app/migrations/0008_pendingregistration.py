@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_app', '0007_friendship'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingRegistration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32, unique=True, verbose_name='激活令牌')),
+                ('payload', models.JSONField(verbose_name='注册信息')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='过期时间')),
+            ],
+            options={
+                'verbose_name': '待激活注册',
+                'verbose_name_plural': '待激活注册',
+            },
+        ),
+    ]
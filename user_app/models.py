@@ -2,8 +2,10 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models, transaction
 from django.core.exceptions import ValidationError
 import uuid
+from datetime import timedelta
 import os
 from django.conf import settings
+from django.utils import timezone
 
 def user_avatar_path(instance, filename):
     # 使用 UUID 生成唯一文件名 (例如 550e8400-e29b....jpg)
@@ -84,7 +86,8 @@ class CustomUser(AbstractUser):
             self.level = new_level
             # 这里可以扩展升级通知逻辑
         
-        self.save()
+        # 只写回积分相关字段，避免触发资料字段的搜索索引更新
+        self.save(update_fields=['coins', 'growth', 'level'])
     # 👇👇👇 新增这个属性 👇👇👇
     @property
     def level_progress(self):
@@ -100,10 +103,10 @@ class CustomUser(AbstractUser):
         friendships = Friendship.objects.filter(
             models.Q(from_user=self) | models.Q(to_user=self),
             status='accepted'
-        )
+        ).select_related('from_user', 'to_user')
         friends = []
         for f in friendships:
-            if f.from_user == self:
+            if f.from_user_id == self.pk:
                 friends.append(f.to_user)
             else:
                 friends.append(f.from_user)
@@ -135,7 +138,7 @@ class CustomUser(AbstractUser):
             raise ValidationError(f"金币不足，当前余额: {user.coins}")
         
         user.coins -= amount
-        user.save()
+        user.save(update_fields=['coins'])
         
         # 更新当前内存对象的余额，避免显示滞后
         self.coins = user.coins
@@ -151,7 +154,7 @@ class CustomUser(AbstractUser):
             
         user = CustomUser.objects.select_for_update().get(pk=self.pk)
         user.coins += amount
-        user.save()
+        user.save(update_fields=['coins'])
         
         self.coins = user.coins
         return True
@@ -180,4 +183,38 @@ class Friendship(models.Model):
         verbose_name_plural = verbose_name
         
     def __str__(self):
-        return f"{self.from_user} -> {self.to_user} ({self.status})"
\ No newline at end of file
+        return f"{self.from_user} -> {self.to_user} ({self.status})"
+
+
+# 👇👇👇 新增：待激活的注册信息 (原先放在缓存里，多进程 / 重启后会丢) 👇👇👇
+class PendingRegistration(models.Model):
+    token = models.CharField('激活令牌', max_length=32, unique=True)
+    payload = models.JSONField('注册信息')  # 用户名、邮箱、已加密的密码等
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField('过期时间', db_index=True)
+
+    class Meta:
+        verbose_name = '待激活注册'
+        verbose_name_plural = verbose_name
+
+    def __str__(self):
+        return f"{self.payload.get('username')} ({self.token})"
+
+    @classmethod
+    def issue(cls, payload, ttl=None):
+        """保存注册信息，返回激活令牌"""
+        ttl = ttl or getattr(settings, 'REGISTRATION_TOKEN_TTL', 86400)
+        token = uuid.uuid4().hex
+        cls.objects.create(token=token, payload=payload, expires_at=timezone.now() + timedelta(seconds=ttl))
+        return token
+
+    @classmethod
+    def redeem(cls, token):
+        """
+        取出并删除注册信息 (一次性)，过期 / 无效 / 已被使用时返回 None
+        按删除行数判断，并发点击同一个链接只有一个请求能拿到数据
+        """
+        pending = cls.objects.filter(token=token, expires_at__gt=timezone.now()).first()
+        if pending is None or not cls.objects.filter(pk=pending.pk).delete()[0]:
+            return None
+        return pending.payload
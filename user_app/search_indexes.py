@@ -0,0 +1,23 @@
+from haystack import indexes
+from whoosh.analysis import KeywordAnalyzer
+from community.analyzers import get_text_analyzer
+from .models import CustomUser
+
+class UserIndex(indexes.SearchIndex, indexes.Indexable):
+    text = indexes.CharField(document=True, use_template=True, analyzer=get_text_analyzer())
+    # 用户名/昵称/学号的前缀匹配 (替代 icontains 扫表)
+    name_auto = indexes.EdgeNgramField()
+    status = indexes.CharField(model_attr='status')
+    # 统一搜索的分类 (用于分面统计)，不分词、不做词干化
+    category = indexes.CharField(default='user', analyzer=KeywordAnalyzer())
+
+    indexed_model_fields = ('username', 'nickname', 'bio', 'student_id', 'status', 'is_active')
+
+    def get_model(self):
+        return CustomUser
+
+    def prepare_name_auto(self, obj):
+        return " ".join(filter(None, [obj.username, obj.nickname, obj.student_id]))
+
+    def index_queryset(self, using=None):
+        return self.get_model().objects.filter(is_active=True)
@@ -0,0 +1,83 @@
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class PresenceService:
+    """
+    在线状态 (替代按 last_login 估算在线人数：last_login 只在登录时变化，且每次都要扫用户表)
+
+    心跳来自消息中心的未读数轮询 / SSE 推送 (打开任意页面的登录用户每隔几秒一次)，全部存在共享缓存，按时间分桶：
+    - presence_user_{用户ID}：该用户最近一次心跳所在的桶号，判断是否在线只读这一个 key；
+    - presence_count_{桶号}：最近一次心跳落在该桶的用户数。用户进入新桶时新桶 +1、旧桶 -1，
+      在线人数 = 窗口内各桶计数之和，固定读取 窗口 / 桶宽 个 key，与用户数无关；
+    - 同一桶内的重复心跳只有一次 cache.get。
+    """
+
+    @property
+    def bucket_seconds(self):
+        return getattr(settings, 'PRESENCE_BUCKET_SECONDS', 60)
+
+    @property
+    def window_buckets(self):
+        return math.ceil(getattr(settings, 'PRESENCE_WINDOW_SECONDS', 300) / self.bucket_seconds)
+
+    @property
+    def ttl(self):
+        return (self.window_buckets + 1) * self.bucket_seconds
+
+    def _bucket(self, now=None):
+        return int((now or time.time()) // self.bucket_seconds)
+
+    def _user_key(self, user_id):
+        return f"presence_user_{user_id}"
+
+    def _count_key(self, bucket):
+        return f"presence_count_{bucket}"
+
+    def touch(self, user_id, now=None):
+        """记录一次心跳；:return: 是否进入了新的桶"""
+        bucket = self._bucket(now)
+        last = cache.get(self._user_key(user_id))
+        if last == bucket:
+            return False
+        # 同一用户的并发心跳 (多个标签页) 只有一个计数
+        if not cache.add(f"presence_seen_{bucket}_{user_id}", 1, self.ttl):
+            return False
+
+        cache.set(self._user_key(user_id), bucket, self.ttl)
+        count_key = self._count_key(bucket)
+        cache.add(count_key, 0, self.ttl)
+        try:
+            cache.incr(count_key)
+        except ValueError:
+            cache.set(count_key, 1, self.ttl)
+        if last is not None and bucket - last < self.window_buckets:
+            try:
+                cache.decr(self._count_key(last))
+            except ValueError:
+                pass  # 旧桶已过期，本来就不再计入
+        return True
+
+    def online_count(self, now=None):
+        current = self._bucket(now)
+        keys = [self._count_key(bucket) for bucket in range(current - self.window_buckets + 1, current + 1)]
+        return max(sum(cache.get_many(keys).values()), 0)
+
+    def is_online(self, user_id, now=None):
+        last = cache.get(self._user_key(user_id))
+        return last is not None and self._bucket(now) - last < self.window_buckets
+
+    def online_ids(self, user_ids, now=None):
+        """批量判断：:return: 在线用户 ID 集合 (一次 get_many)"""
+        keys = {self._user_key(user_id): user_id for user_id in user_ids}
+        current = self._bucket(now)
+        return {
+            keys[key] for key, last in cache.get_many(list(keys)).items()
+            if current - last < self.window_buckets
+        }
+
+
+presence = PresenceService()
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .avatars import delete_avatar, process_avatar
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='avatar_remember_old')
+def remember_old_avatar(sender, instance, update_fields=None, raw=False, **kwargs):
+    """记录保存前的头像文件名 (只改积分、登录时间等字段时跳过，不多查一次库)"""
+    instance._old_avatar = None
+    if raw or not instance.pk:
+        return
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+    instance._old_avatar = sender.objects.filter(pk=instance.pk).values_list('avatar', flat=True).first() or ''
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='avatar_process_new')
+def process_new_avatar(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    old_name = getattr(instance, '_old_avatar', None)
+    new_name = instance.avatar.name if instance.avatar else ''
+    if old_name is None and not created:
+        return
+    if new_name == (old_name or ''):
+        return
+
+    if new_name:
+        process_avatar(new_name)
+    if old_name:
+        # 事务提交后再删旧文件，回滚时旧头像仍然可用
+        transaction.on_commit(lambda: delete_avatar(old_name))
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL, dispatch_uid='avatar_delete')
+def delete_user_avatar(sender, instance, **kwargs):
+    if instance.avatar:
+        name = instance.avatar.name
+        transaction.on_commit(lambda: delete_avatar(name))
@@ -0,0 +1,11 @@
+from celery import shared_task
+from django.utils import timezone
+
+from .models import PendingRegistration
+
+
+@shared_task
+def purge_expired_registrations():
+    """清理过期未激活的注册信息"""
+    deleted, _ = PendingRegistration.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
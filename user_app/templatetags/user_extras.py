@@ -0,0 +1,13 @@
+from django import template
+
+from user_app.avatars import avatar_url
+
+register = template.Library()
+
+@register.filter(name='avatar')
+def avatar(user, size=64):
+    """
+    按显示尺寸取头像 URL，用法: {{ user|avatar:64 }}
+    返回不小于 size 的最小尺寸版本 (32 / 64 / 256)，没有头像时返回空串
+    """
+    return avatar_url(user, int(size))
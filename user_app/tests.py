@@ -1,3 +1,169 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import avatars
+from .avatars import AVATAR_SIZES, avatar_url, variant_name
+from .models import PendingRegistration
+from .services import presence
+from .tasks import purge_expired_registrations
+from community.tasks import update_search_index
+
+User = get_user_model()
+
+
+class AvatarProcessingTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(username='avatar_user', email='avatar@test.com')
+
+    def make_upload(self, size=(800, 600)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (10, 120, 200)).save(buffer, 'JPEG')
+        return SimpleUploadedFile('me.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_square_variants_generated(self):
+        """测试：上传后生成 32/64/256 的正方形版本，按显示尺寸取对应文件"""
+        self.user.avatar = self.make_upload()
+        self.user.save()
+
+        for size in AVATAR_SIZES:
+            with default_storage.open(variant_name(self.user.avatar.name, size)) as f:
+                self.assertEqual(Image.open(f).size, (size, size))
+        self.assertTrue(avatar_url(self.user, 40).endswith('_64.webp'))
+        self.assertTrue(avatar_url(self.user, 200).endswith('_256.webp'))
+
+    def test_old_files_removed_on_replace(self):
+        """测试：更换头像后旧原图和旧尺寸版本被删除"""
+        self.user.avatar = self.make_upload()
+        self.user.save()
+        old_name = self.user.avatar.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.avatar = self.make_upload(size=(300, 300))
+            self.user.save()
+
+        self.assertNotEqual(self.user.avatar.name, old_name)
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertFalse(default_storage.exists(variant_name(old_name, 64)))
+        self.assertTrue(default_storage.exists(variant_name(self.user.avatar.name, 64)))
+
+    def test_missing_variant_check_cached(self):
+        """测试：尺寸版本不存在时退回原图，短时间内不再重复检查存储"""
+        self.user.avatar = self.make_upload()
+        self.user.save()
+        for size in AVATAR_SIZES:
+            default_storage.delete(variant_name(self.user.avatar.name, size))
+        avatars._existing_variants.clear()
+
+        with mock.patch.object(avatars.default_storage, 'exists', wraps=default_storage.exists) as exists:
+            self.assertEqual(avatar_url(self.user, 64), self.user.avatar.url)
+            self.assertEqual(avatar_url(self.user, 64), self.user.avatar.url)
+        self.assertEqual(exists.call_count, 1)
+
+        # 补齐尺寸版本后立即生效，不必等负缓存过期
+        avatars.process_avatar(self.user.avatar.name)
+        self.assertTrue(avatar_url(self.user, 64).endswith('_64.webp'))
+
+    def test_score_update_skips_avatar_check(self):
+        """测试：只更新积分字段时不额外查询头像"""
+        with self.assertNumQueries(1):
+            self.user.earn_rewards(coins=1)
+
+
+class PendingRegistrationTest(TestCase):
+    def setUp(self):
+        self.payload = {
+            'username': 'newcomer', 'email': 'newcomer@test.com', 'password': 'x',
+            'nickname': '', 'status': 'newbie', 'student_id': None,
+        }
+
+    def test_token_single_use(self):
+        token = PendingRegistration.issue(self.payload)
+        self.assertEqual(PendingRegistration.redeem(token)['username'], 'newcomer')
+        self.assertIsNone(PendingRegistration.redeem(token))
+
+    def test_expired_token_rejected(self):
+        token = PendingRegistration.issue(self.payload, ttl=60)
+        PendingRegistration.objects.filter(token=token).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(PendingRegistration.redeem(token))
+
+        purge_expired_registrations()
+        self.assertFalse(PendingRegistration.objects.exists())
+
+    def test_activation_survives_cache_clear(self):
+        """测试：注册信息存数据库，缓存被清空 (或换了进程) 后激活链接依然有效"""
+        token = PendingRegistration.issue(self.payload)
+        cache.clear()
+        response = self.client.get(reverse('user_app:activate', args=[token]))
+        self.assertRedirects(response, reverse('user_app:profile'), fetch_redirect_response=False)
+        self.assertTrue(User.objects.filter(username='newcomer', email_verified=True).exists())
+
+
+@override_settings(PRESENCE_WINDOW_SECONDS=300, PRESENCE_BUCKET_SECONDS=60)
+class PresenceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1_800_000_000  # 桶边界对齐的时间戳
+
+    def test_bucketed_online_count(self):
+        """测试：同一用户跨桶心跳只计一次；超过窗口没有心跳即离线"""
+        presence.touch(1, now=self.now)
+        presence.touch(1, now=self.now + 5)  # 同一桶：不重复计数
+        presence.touch(2, now=self.now + 10)
+        self.assertEqual(presence.online_count(now=self.now + 10), 2)
+
+        presence.touch(1, now=self.now + 130)  # 用户 1 进入新桶：旧桶 -1，新桶 +1
+        self.assertEqual(presence.online_count(now=self.now + 130), 2)
+        self.assertEqual(presence.online_ids([1, 2, 3], now=self.now + 130), {1, 2})
+
+        # 用户 2 最后一次心跳在第 0 个桶，5 个桶之后离线
+        later = self.now + 300
+        self.assertEqual(presence.online_count(now=later), 1)
+        self.assertFalse(presence.is_online(2, now=later))
+        self.assertTrue(presence.is_online(1, now=later))
+
+    def test_poll_heartbeat_and_home_count(self):
+        """测试：未读数轮询记录心跳，首页在线人数不再依据 last_login"""
+        users = [User.objects.create_user(f'presence{i}', f'presence{i}@test.com', 'pw') for i in range(3)]
+        for user in users[:2]:
+            self.client.force_login(user)
+            self.client.get(reverse('notifications:api_unread_count'))
+
+        self.assertEqual(presence.online_ids([user.pk for user in users]), {users[0].pk, users[1].pk})
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['stats']['online'], 2)
+
+        response = self.client.get(reverse('user_app:public_profile', args=[users[0].pk]))
+        self.assertTrue(response.context['is_online'])
+        response = self.client.get(reverse('user_app:public_profile', args=[users[2].pk]))
+        self.assertFalse(response.context['is_online'])
+
+
+class UserSearchTest(TestCase):
+    def test_results_keep_relevance_order(self):
+        """测试：用户搜索按索引相关度排序 (完整命中的排在只命中前缀的前面)"""
+        me = User.objects.create_user('searcher', 'searcher@test.com', 'pw', status='student')
+        prefix_hit = User.objects.create_user('wangfangzhou', 'wfz@test.com', 'pw')
+        exact_hit = User.objects.create_user('wangfang', 'wf@test.com', 'pw', bio='wangfang')
+        update_search_index([('user_app.customuser', user.pk) for user in (me, prefix_hit, exact_hit)])
+
+        self.client.force_login(me)
+        response = self.client.get(reverse('user_app:search_users'), {'q': 'wangfang'})
+        self.assertEqual([user.pk for user in response.context['users']], [exact_hit.pk, prefix_hit.pk])
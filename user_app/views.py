@@ -4,23 +4,24 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import get_user_model, login
 from django.http import HttpResponseRedirect
 from django.urls import reverse
-from django.core.mail import send_mail
-from django.conf import settings
-import threading
 from django.db.models import Q
-import uuid # 👈 用于生成随机Token
-from django.core.cache import cache # 👈 引入缓存
 from django.contrib.auth.hashers import make_password # 👈 用于手动加密密码
-from django.core.mail import send_mail # 👈 引入发邮件模块
-from django.conf import settings         # 👈 引入设置
-from django.db.models import Count # 👈 确保文件头部导入了 Count
+from core.models import OutboundEmail
+from core.services import mail_service # 👈 邮件统一进发件箱，由 Celery mail 队列发送
+from django.db.models import Count, Prefetch # 👈 确保文件头部导入了 Count
 from django.contrib.sites.shortcuts import get_current_site
 from .forms import RegisterForm, ProfileUpdateForm
-from notifications.models import Notification
+from notifications.services import notifier
+from community.models import Post
+from community.services import interaction_service
+from haystack.inputs import AutoQuery
+from haystack.query import SearchQuerySet, SQ
+from core.utils import preserve_order
 # 👇👇👇 必须补全这一行导入 👇👇👇
 from .models import CustomUser, Friendship 
 # 👆👆👆 之前可能漏了 CustomUser 👆👆👆
-from .models import CustomUser, Friendship
+from .models import CustomUser, Friendship, PendingRegistration
+from .services import presence
 
 User = get_user_model()
 
@@ -28,18 +29,6 @@ User = get_user_model()
 # 📧 邮件发送辅助函数
 # ==========================================
 
-def send_email_thread(subject, message, recipient_list):
-    try:
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            recipient_list,
-            fail_silently=False,
-        )
-    except Exception as e:
-        print(f"邮件发送失败: {e}")
-
 def send_activation_email(request, email, token, username):
     """
     发送账户激活邮件
@@ -63,10 +52,9 @@ def send_activation_email(request, email, token, username):
     (链接 24 小时内有效)
     """
     
-    threading.Thread(
-        target=send_email_thread,
-        args=(email_subject, email_message, [email])
-    ).start()
+    # 激活邮件优先发送，不排在批量邀请邮件后面
+    mail_service.enqueue(email_subject, email_message, [email], category='activation',
+                         priority=OutboundEmail.PRIORITY_HIGH)
 
 def send_welcome_email(user):
     """发送欢迎邮件 (写入数据库成功后触发)"""
@@ -81,10 +69,7 @@ def send_welcome_email(user):
     祝好，
     Web 218 团队
     """
-    threading.Thread(
-        target=send_email_thread,
-        args=(subject, message, [user.email])
-    ).start()
+    mail_service.enqueue(subject, message, [user.email], category='welcome')
 
 # ==========================================
 # 👤 视图函数
@@ -112,10 +97,7 @@ def register(request):
                 messages.error(request, '该用户名已被占用。')
                 return render(request, 'user_app/register.html', {'form': form})
 
-            # 3. 生成随机 Token
-            token = uuid.uuid4().hex
-
-            # 4. 打包用户数据
+            # 3. 打包用户数据
             user_data = {
                 'username': username,
                 'email': email,
@@ -128,10 +110,10 @@ def register(request):
                 'email_verified': True
             }
 
-            # 5. 存入缓存
-            cache.set(f'reg_token_{token}', user_data, 86400)
+            # 4. 存入数据库，生成随机 Token (多进程部署时任何进程都能激活)
+            token = PendingRegistration.issue(user_data)
 
-            # 6. 发送验证邮件
+            # 5. 发送验证邮件
             send_activation_email(request, email, token, username)
             
             return redirect('user_app:activation_sent')
@@ -147,11 +129,10 @@ def activation_sent(request):
 def activate(request, token):
     """
     处理激活链接
-    逻辑：从缓存读取数据 -> 写入数据库 -> 自动登录
+    逻辑：取出待激活的注册信息 (一次性) -> 写入数据库 -> 自动登录
     """
-    # 1. 从缓存获取数据
-    cache_key = f'reg_token_{token}'
-    user_data = cache.get(cache_key)
+    # 1. 取出注册信息 (同时删除，防止二次点击重复注册)
+    user_data = PendingRegistration.redeem(token)
 
     if user_data:
         # 再次检查用户名是否在等待期间被抢注 (虽然概率极低)
@@ -171,20 +152,17 @@ def activate(request, token):
             is_active=True,
             email_verified=True
         )
-        
-        # 3. 删除缓存，防止二次点击报错
-        cache.delete(cache_key)
 
-        # 4. 自动登录
+        # 3. 自动登录
         login(request, user, backend='user_app.authentication.EmailBackend')
         
-        # 5. 发送欢迎邮件
+        # 4. 发送欢迎邮件
         send_welcome_email(user)
         
         messages.success(request, '账号验证成功！欢迎加入。')
         return redirect('user_app:profile')
     else:
-        # 缓存中找不到 (过期或无效)
+        # 找不到 (过期、无效或已使用)
         return render(request, 'user_app/activation_invalid.html')
 
 @login_required
@@ -208,10 +186,15 @@ def profile(request):
 def public_profile(request, pk):
     target_user = get_object_or_404(User, pk=pk)
     if request.user == target_user:
-        user_posts = target_user.posts.all().order_by('-created_at')
+        user_posts = target_user.posts.all()
     else:
-        user_posts = target_user.posts.filter(visibility='public').order_by('-created_at')
-    user_posts = target_user.posts.all().order_by('-created_at')
+        # 看别人：私密贴不展示
+        user_posts = target_user.posts.filter(visibility='public')
+    # 点赞数 / 评论数 / 标签一次带出，列表里不再逐篇查询
+    user_posts = user_posts.annotate(
+        like_count=Count('likes', distinct=True),
+        comment_count=Count('comments', distinct=True),
+    ).select_related('author').prefetch_related('tags').order_by('-created_at')
     
     # 2. 👇👇👇 新增：获取收藏夹列表 👇👇👇
     if request.user == target_user:
@@ -220,6 +203,7 @@ def public_profile(request, pk):
     else:
         # 看别人：只显示公开的收藏夹
         collections = target_user.collections.filter(is_public=True).annotate(post_count=Count('posts')).order_by('-updated_at')
+    collections = collections.prefetch_related(Prefetch('posts', queryset=Post.objects.select_related('author')))
     
     is_following = False
     if request.user.is_authenticated and request.user != target_user:
@@ -233,6 +217,7 @@ def public_profile(request, pk):
         'is_following': is_following,
         'followers_count': target_user.followers.count(),
         'following_count': target_user.following.count(),
+        'is_online': presence.is_online(target_user.pk),
     }
     return render(request, 'user_app/public_profile.html', context)
 
@@ -249,7 +234,7 @@ def follow_user(request, pk):
         # 取消关注不发通知
     else:
         request.user.following.add(target_user)
-        Notification.objects.create(
+        notifier.notify(
             recipient=target_user,
             actor=request.user,
             verb='follow', 
@@ -257,6 +242,8 @@ def follow_user(request, pk):
             content='关注了你'
         )
 
+    interaction_service.invalidate(request.user)
+
     # 👇👇👇 核心修复：尝试跳回上一页 👇👇👇
     # 获取 HTTP 请求头中的 Referer (来源页面)
     next_url = request.META.get('HTTP_REFERER')
@@ -299,13 +286,13 @@ def search_users(request):
     users = []
     
     if query:
-        # 搜索逻辑：排除自己，搜索用户名、昵称或学号
+        # 搜索逻辑：排除自己，搜索用户名、昵称或学号 (走全文索引 + 前缀匹配，不做 icontains 扫表)
         # 注意：这里我们允许搜到任何人，但只有特定身份的人能发起搜索
-        users = CustomUser.objects.filter(
-            Q(username__icontains=query) | 
-            Q(nickname__icontains=query) |
-            Q(student_id__icontains=query)
-        ).exclude(pk=request.user.pk)
+        matched_ids = SearchQuerySet().models(CustomUser).filter(
+            SQ(content=AutoQuery(query)) | SQ(name_auto=query)
+        ).values_list('pk', flat=True)[:50]
+        # 保持索引返回的相关度顺序
+        users = preserve_order(CustomUser.objects.exclude(pk=request.user.pk), matched_ids)
 
     return render(request, 'user_app/search_users.html', {'users': users, 'query': query})
 
@@ -334,7 +321,7 @@ def add_friend(request, user_id):
         messages.success(request, f"已向 {target_user.nickname or target_user.username} 发送好友请求。")
         
         # 👇👇👇 修改通知逻辑：使用 'friend_request' 👇👇👇
-        Notification.objects.create(
+        notifier.notify(
             recipient=target_user,
             actor=request.user,
             verb='friend_request', # 使用新类型
@@ -364,13 +351,8 @@ def add_friend(request, user_id):
                 218 大王发
                 """
                 
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [target_user.email],
-                    fail_silently=True, # 如果发不出去不报错，防止影响页面跳转
-                )
+                # 只写入发件箱，不在请求内连接 SMTP
+                mail_service.enqueue(subject, message, [target_user.email], category='friend_request')
             except Exception as e:
                 print(f"邮件发送失败: {e}")
         # 👆👆👆 邮件发送结束 👆👆👆
@@ -381,7 +363,7 @@ def add_friend(request, user_id):
 @login_required
 def friend_requests(request):
     # 我收到的所有 pending 请求
-    requests = Friendship.objects.filter(to_user=request.user, status='pending')
+    requests = Friendship.objects.filter(to_user=request.user, status='pending').select_related('from_user')
     return render(request, 'user_app/friend_requests.html', {'requests': requests})
 
 # 4. 处理请求 (接受/拒绝)
@@ -399,12 +381,14 @@ def handle_friend_request(request, request_id, action):
         request.user.following.add(friendship.from_user)
         # 2. 他关注我
         friendship.from_user.following.add(request.user)
+        interaction_service.invalidate(request.user)
+        interaction_service.invalidate(friendship.from_user)
         # 👆👆👆 新增结束 👆👆👆
         
         messages.success(request, f"已添加 {friendship.from_user.nickname} 为好友，并已互相关注！")
         
         # 发送通知
-        Notification.objects.create(
+        notifier.notify(
             recipient=friendship.from_user,
             actor=request.user,
             verb='friend_accept',
@@ -416,7 +400,7 @@ def handle_friend_request(request, request_id, action):
         friendship.delete()
         messages.info(request, "已拒绝该请求。")
         
-        Notification.objects.create(
+        notifier.notify(
             recipient=friendship.from_user,
             actor=request.user,
             verb='friend_reject',
@@ -441,6 +425,8 @@ def delete_friend(request, user_id):
     # 通常逻辑是：删好友 = 绝交 = 互相取关
     request.user.following.remove(target_user)
     target_user.following.remove(request.user)
+    interaction_service.invalidate(request.user)
+    interaction_service.invalidate(target_user)
     
     messages.success(request, f"已解除与 {target_user.nickname or target_user.username} 的好友关系。")
     
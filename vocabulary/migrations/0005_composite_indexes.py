@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-19 15:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vocabulary', '0004_alter_word_level'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userwordprogress',
+            index=models.Index(condition=models.Q(('is_mistake', True)), fields=['user', '-mistake_count'], name='progress_user_mistake_idx'),
+        ),
+    ]
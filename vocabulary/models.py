@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
 
 class Word(models.Model):
@@ -36,4 +37,9 @@ class UserWordProgress(models.Model):
 
     class Meta:
         unique_together = ('user', 'word')
-        ordering = ['-last_reviewed']
\ No newline at end of file
+        ordering = ['-last_reviewed']
+        indexes = [
+            # 错题本 / 错题复习：WHERE user = ? AND is_mistake ORDER BY mistake_count DESC
+            # (布尔条件用部分索引，SQLite 上 is_mistake 编译为裸列名，无法走复合索引的第二列)
+            models.Index(fields=['user', '-mistake_count'], condition=Q(is_mistake=True), name='progress_user_mistake_idx'),
+        ]
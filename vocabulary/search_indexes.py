@@ -0,0 +1,19 @@
+from haystack import indexes
+from whoosh.analysis import KeywordAnalyzer
+from community.analyzers import get_text_analyzer
+from .models import Word
+
+class WordIndex(indexes.SearchIndex, indexes.Indexable):
+    text = indexes.CharField(document=True, use_template=True, analyzer=get_text_analyzer())
+    level = indexes.CharField(model_attr='level')
+    # 统一搜索的分类 (用于分面统计)，不分词、不做词干化
+    category = indexes.CharField(default='word', analyzer=KeywordAnalyzer())
+
+    indexed_model_fields = ('word', 'meaning', 'example_en', 'example_cn', 'level')
+
+    def get_model(self):
+        return Word
+
+    def index_queryset(self, using=None):
+        # 单词由 import_words 批量导入 (不触发信号)，导入后需执行 rebuild_index
+        return self.get_model().objects.all()
@@ -1,3 +1,49 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import UserWordProgress, Word
+
+User = get_user_model()
+
+
+class RandomWordsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='learner', email='learner@test.com')
+        self.words = Word.objects.bulk_create([
+            Word(word=f'word{i}', meaning=f'释义{i}', level='CET4') for i in range(20)
+        ])
+        self.client.force_login(self.user)
+
+    def fetch_ids(self, count=10):
+        response = self.client.get(reverse('vocabulary:api_get_words'), {'level': 'CET4', 'count': count})
+        return [word['id'] for word in response.json()['data']]
+
+    def test_new_words_exclude_learned(self):
+        learned = {word.pk for word in self.words[:15]}
+        UserWordProgress.objects.bulk_create([UserWordProgress(user=self.user, word_id=pk) for pk in learned])
+
+        ids = self.fetch_ids()
+        self.assertEqual(len(ids), 5)
+        self.assertFalse(learned & set(ids))
+
+    def test_falls_back_to_review_when_all_learned(self):
+        UserWordProgress.objects.bulk_create([UserWordProgress(user=self.user, word=word) for word in self.words])
+        ids = self.fetch_ids(count=8)
+        self.assertEqual(len(set(ids)), 8)
+
+    def test_sparse_candidates_still_filled(self):
+        """测试：候选词稀疏 (夹在大量其他等级的词中间) 时也能取满且不重复"""
+        Word.objects.bulk_create([Word(word=f'other{i}', meaning='释义', level='TOEFL') for i in range(400)])
+        tail = Word.objects.bulk_create([Word(word=f'tail{i}', meaning='释义', level='CET4') for i in range(3)])
+        UserWordProgress.objects.bulk_create([UserWordProgress(user=self.user, word=word) for word in self.words[:17]])
+        expected = {word.pk for word in self.words[17:] + tail}
+
+        for _ in range(5):
+            ids = self.fetch_ids(count=6)
+            self.assertEqual(set(ids), expected)
+            self.assertEqual(len(ids), 6)
+
+    def test_count_is_clamped(self):
+        self.assertEqual(len(self.fetch_ids(count=100)), 20)
+        self.assertEqual(self.fetch_ids(count=-3), [])
@@ -2,10 +2,11 @@ from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
-from django.db.models import Count, Q 
+from django.db.models import Count, Max, Min, Q
 from .models import Word, UserWordProgress
 import json
 import random
+from core.sqlite import retry_on_locked
 
 # ---------------------------------------------------
 # 1. 页面视图
@@ -20,22 +21,24 @@ def index(request):
     # 🔥 修改点：扩充这里，支持所有 5 个等级
     ALL_LEVELS = ['CET4', 'CET6', 'KaoYan', 'TOEFL', 'IELTS']
     
+    # 两条分组查询取全部等级的统计 (原来每个等级 3 条 COUNT)
+    totals = dict(Word.objects.filter(level__in=ALL_LEVELS).values_list('level').annotate(n=Count('id')))
+    progress_counts = {
+        row['word__level']: row
+        for row in UserWordProgress.objects.filter(user=user, word__level__in=ALL_LEVELS)
+            .values('word__level')
+            .annotate(
+                # 统计已学 (status > 0, 包含学习中和已掌握)
+                learned=Count('id', filter=Q(status__gt=0)),
+                # 统计已斩 (status = 2)
+                mastered=Count('id', filter=Q(status=2)),
+            )
+    }
+
     for level in ALL_LEVELS:
-        total = Word.objects.filter(level=level).count()
-        
-        # 统计已学 (status > 0, 包含学习中和已掌握)
-        learned_count = UserWordProgress.objects.filter(
-            user=user, 
-            word__level=level, 
-            status__gt=0 
-        ).count()
-        
-        # 统计已斩 (status = 2)
-        mastered_count = UserWordProgress.objects.filter(
-            user=user, 
-            word__level=level, 
-            status=2
-        ).count()
+        total = totals.get(level, 0)
+        learned_count = progress_counts.get(level, {}).get('learned', 0)
+        mastered_count = progress_counts.get(level, {}).get('mastered', 0)
         
         # 计算进度 (保留1位小数)
         if total > 0:
@@ -106,19 +109,59 @@ def api_get_words(request):
     else:
         # 学习新词
         learned_ids = UserWordProgress.objects.filter(user=user).values_list('word_id', flat=True)
-        new_words = Word.objects.filter(level=level).exclude(id__in=learned_ids).order_by('?')[:count]
+        new_words = random_words(Word.objects.filter(level=level).exclude(id__in=learned_ids), count)
         
-        if new_words.exists():
+        if new_words:
             for w in new_words:
                 words_data.append(serialize_word(w))
         else:
             # 没新词了，随机复习
-            random_old = Word.objects.filter(level=level).order_by('?')[:count]
+            random_old = random_words(Word.objects.filter(level=level), count)
             for w in random_old:
                 words_data.append(serialize_word(w))
 
     return JsonResponse({'status': 'ok', 'data': words_data})
 
+def random_words(queryset, count, attempts=3):
+    """
+    随机取 count 个单词 (替代 order_by('?'))
+    order_by('?') 在 SQLite / PostgreSQL 上都要给每一行生成随机数再整体排序；
+    这里先取符合条件的主键范围 (MIN / MAX)，在范围内随机抽主键，in_bulk 按主键取回命中的行
+    (不再把全部候选主键读进内存)。等级混排、已学过的词会让部分主键落空，
+    所以按命中率多抽，几轮后仍不够时从随机位置起按主键顺序补齐。
+    """
+    if count <= 0:
+        return []
+    bounds = queryset.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+    low, high = bounds['low'], bounds['high']
+
+    picked = {}
+    hit_rate = 0.25
+    for _ in range(attempts):
+        need = count - len(picked)
+        # 按上一轮的命中率估算这一轮要抽多少个主键 (留足余量，缺得少时也不至于一个都抽不中)
+        size = min(high - low + 1, int((need * 1.5 + 4) / max(hit_rate, 0.02)) + 1)
+        probes = random.sample(range(low, high + 1), size)
+        found = queryset.in_bulk([pk for pk in probes if pk not in picked])
+        hit_rate = len(found) / size
+        for pk in probes:
+            if pk in found and len(picked) < count:
+                picked[pk] = found[pk]
+        if len(picked) == count or size == high - low + 1:
+            return list(picked.values())
+
+    # 候选很稀疏：从随机主键起向后取，不够再从头取 (都走主键索引的范围扫描)
+    pivot = random.randint(low, high)
+    rest = queryset.exclude(pk__in=list(picked))
+    for part in (rest.filter(pk__gte=pivot), rest.filter(pk__lt=pivot)):
+        need = count - len(picked)
+        if need <= 0:
+            break
+        picked.update((w.pk, w) for w in part.order_by('pk')[:need])
+    return list(picked.values())
+
 def serialize_word(w):
     return {
         'id': w.id,
@@ -132,6 +175,7 @@ def serialize_word(w):
 
 @login_required
 @require_POST
+@retry_on_locked
 def api_submit_result(request):
     """提交结果"""
     data = json.loads(request.body)
@@ -152,6 +196,7 @@ def api_submit_result(request):
 
 @login_required
 @require_POST
+@retry_on_locked
 def api_kill_word(request):
     """斩单词"""
     data = json.loads(request.body)